@@ -37,6 +37,9 @@ class NextReq(BaseModel):
     )
     target_p: Optional[float] = Field(0.7, description="Target probability (0-1)")
     exclude_last_n: Optional[int] = Field(20, description="How many recent Qs to exclude")
+    cluster_id: Optional[int] = Field(
+        None, description="Only pick from this embedding cluster (see GET /questions/clusters)"
+    )
 
 
 class NextResp(BaseModel):
@@ -100,6 +103,7 @@ def next_question(req: NextReq):
             allowed_ids=req.allowed_question_ids,
             target_p=float(req.target_p) if req.target_p is not None else 0.7,
             exclude_last_n=int(req.exclude_last_n) if req.exclude_last_n is not None else 20,
+            cluster_id=req.cluster_id,
         )
         if out is None:
             raise HTTPException(status_code=404, detail="No questions available")
@@ -1,10 +1,15 @@
 # app/routers/asr.py
 from fastapi import APIRouter, UploadFile, File, HTTPException
 import whisper
-import tempfile, os
+import os
+
+from app.services.uploads import UPLOAD_MAX_BYTES, spool_upload
 
 router = APIRouter()
 
+# recordings can be longer than documents; separate limit for audio uploads
+ASR_UPLOAD_MAX_BYTES = int(os.getenv("ASR_UPLOAD_MAX_BYTES", str(UPLOAD_MAX_BYTES)))
+
 # WARNING: whisper model load can be heavy. Use small model or cloud ASR in production.
 try:
     model = whisper.load_model("small")
@@ -15,13 +20,7 @@ except Exception:
 async def transcribe(file: UploadFile = File(...)):
     if model is None:
         raise HTTPException(status_code=503, detail="ASR model not available")
-    # save to temp
-    tmpfd, tmppath = tempfile.mkstemp(suffix=".wav")
-    with os.fdopen(tmpfd, "wb") as f:
-        f.write(await file.read())
-    try:
-        res = model.transcribe(tmppath)
+    suffix = os.path.splitext(file.filename or "")[1] or ".wav"
+    async with spool_upload(file, suffix=suffix, max_bytes=ASR_UPLOAD_MAX_BYTES) as upload:
+        res = model.transcribe(upload.path)
         return {"text": res.get("text"), "language": res.get("language")}
-    finally:
-        try: os.remove(tmppath)
-        except: pass
@@ -1,10 +1,13 @@
 # app/routers/difficulty.py
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from app.services.difficulty_service import DifficultyService
+from app.services.log_sink import get_sink
 from app.config import LOG_PATH
-import json, os
-from datetime import datetime
+from collections import Counter
+from typing import List
+import asyncio, json, os, tempfile, time
 
 router = APIRouter()
 svc = DifficultyService()
@@ -15,13 +18,8 @@ class QRequest(BaseModel):
     session_id: str | None = None
 
 def _log(entry: dict):
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    entry["ts"] = datetime.utcnow().isoformat() + "Z"
-    try:
-        with open(LOG_PATH, "a", encoding="utf8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-    except Exception:
-        pass
+    # queued; written, rotated and compressed by the sink's background thread
+    get_sink(LOG_PATH).emit(entry)
 
 @router.post("/difficulty")
 def predict(req: QRequest):
@@ -39,3 +37,129 @@ def predict(req: QRequest):
         "session_id": req.session_id
     })
     return out
+
+
+# -----------------------
+# /difficulty/batch: many stems per request
+# -----------------------
+BATCH_MAX_QUESTIONS = int(os.getenv("DIFFICULTY_BATCH_MAX_QUESTIONS", "10000"))
+# NDJSON input is classified in chunks of this many lines while it streams in
+NDJSON_CHUNK = 1000
+
+class BatchRequest(BaseModel):
+    questions: List[str] = Field(..., description="Question stems, results come back in the same order")
+    user_hash: str | None = None
+    session_id: str | None = None
+
+def _log_batch(results: List[dict], started: float, user_hash=None, session_id=None, errors: int = 0):
+    """One consolidated record per batch instead of one per question."""
+    _log({
+        "event": "difficulty_batch",
+        "count": len(results),
+        "errors": errors,
+        "label_counts": dict(Counter(r["difficulty"] for r in results)),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "user_hash": user_hash,
+        "session_id": session_id,
+    })
+
+def _ndjson_question(line: bytes) -> str:
+    item = json.loads(line)
+    if isinstance(item, dict):
+        item = item.get("question")
+    if not isinstance(item, str):
+        raise ValueError("each line must be a JSON string or an object with a 'question' string")
+    return item
+
+async def _classify_ndjson(request: Request, out) -> None:
+    """
+    Classify NDJSON input chunk by chunk while it is still being uploaded and write
+    one NDJSON result line per input line to `out`. The whole body is consumed here,
+    before the response starts: StreamingResponse's disconnect listener would
+    otherwise compete with request.stream() for the incoming messages.
+    """
+    started = time.perf_counter()
+    all_results, errors = [], 0
+    buf, pending, line_no = b"", [], 0
+
+    def error_line(n, e):
+        out.write((json.dumps({"line": n, "error": str(e)}) + "\n").encode("utf8"))
+
+    async def flush():
+        results = await asyncio.to_thread(svc.predict_many, [q for _, q in pending])
+        all_results.extend(results)
+        out.write("".join(json.dumps({"line": n, **r}) + "\n" for (n, _), r in zip(pending, results)).encode("utf8"))
+        pending.clear()
+
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                pending.append((line_no, _ndjson_question(line)))
+            except ValueError as e:  # includes JSONDecodeError
+                errors += 1
+                error_line(line_no, e)
+            if len(pending) >= NDJSON_CHUNK:
+                await flush()
+    if buf.strip():
+        line_no += 1
+        try:
+            pending.append((line_no, _ndjson_question(buf)))
+        except ValueError as e:
+            errors += 1
+            error_line(line_no, e)
+    if pending:
+        await flush()
+    _log_batch(all_results, started, request.headers.get("x-user-hash"), request.headers.get("x-session-id"), errors)
+
+def _iter_file(f, chunk_size: int = 64 * 1024):
+    try:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        f.close()
+
+@router.post("/difficulty/batch")
+async def predict_batch(request: Request):
+    """
+    Labels and class probabilities for many questions, in input order.
+
+    - JSON body: {"questions": [...], "user_hash"?, "session_id"?} (or a bare list),
+      answered with {"results": [...], "count": n}
+    - Content-Type application/x-ndjson: one question per line (a JSON string or
+      {"question": ...}), classified in chunks as it arrives and answered with one
+      NDJSON result line per input line (user/session via X-User-Hash /
+      X-Session-Id headers); results are spooled to disk past 8 MB
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() in ("application/x-ndjson", "application/jsonl"):
+        out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        try:
+            await _classify_ndjson(request, out)
+        except Exception as e:
+            out.close()
+            raise HTTPException(status_code=503, detail=str(e))
+        out.seek(0)
+        return StreamingResponse(_iter_file(out), media_type="application/x-ndjson")
+
+    try:
+        payload = await request.json()
+        req = BatchRequest(questions=payload) if isinstance(payload, list) else BatchRequest(**payload)
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid batch request: {e}")
+    if len(req.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUESTIONS} questions per JSON batch; use NDJSON for more.")
+
+    started = time.perf_counter()
+    try:
+        results = await asyncio.to_thread(svc.predict_many, req.questions)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    _log_batch(results, started, req.user_hash, req.session_id)
+    return {"results": results, "count": len(results)}
@@ -1,9 +1,10 @@
 ﻿# app/routers/generate.py
 import os
 import json
+import asyncio
 import logging
-import tempfile
-from typing import List, Dict, Any, Optional
+from contextlib import AsyncExitStack
+from typing import List, Dict, Any, Literal, Optional, Tuple
 
 from pydantic import BaseModel, Field
 from fastapi import Body
@@ -11,9 +12,13 @@ from fastapi.responses import JSONResponse
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from dotenv import load_dotenv
 
-from app.services.pdf_extract import extract_text_from_pdf
-from src.train.predict_difficulty import predict_difficulty
-from src.adaptive.engine import get_connection
+from app.services.extractive_mcq import generate_extractive_mcqs
+from app.services.passage_select import select_passages
+from app.services.pdf_cache import extract_cached, extract_cached_in_pool
+from app.services.gemini_client import gemini_client
+from app.services.log_sink import event_sink
+from app.services.uploads import spool_upload
+from src.adaptive.question_bank import insert_questions
 
 # Gemini SDK
 from google import generativeai as genai
@@ -25,7 +30,6 @@ logger = logging.getLogger("uvicorn.error")
 
 # Required env vars
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")  # or "gemini-2.5-flash"
 
 if not GEMINI_API_KEY:
     logger.warning("GEMINI_API_KEY not set. Endpoint will fail until set.")
@@ -65,22 +69,9 @@ def _find_json_array(raw: str) -> str:
     raise ValueError("Unbalanced brackets in model output; couldn't extract JSON array.")
 
 
-async def generate_mcq_from_text_gemini(text: str, num_questions: int = 5) -> List[Dict[str, Any]]:
-    """
-    Use Gemini to generate a JSON array of MCQs from the extracted text.
-    Output format expected: a JSON array of objects, each with keys:
-    question, distractors (3), answer, difficulty (easy|medium|hard), explanation (opt), topic (opt)
-    """
-    if not GEMINI_API_KEY:
-        raise RuntimeError("GEMINI_API_KEY not configured in environment.")
-
-    if not isinstance(num_questions, int) or not (1 <= num_questions <= 50):
-        raise ValueError("num_questions must be an integer between 1 and 50.")
-
-    # Keep the source snippet size-restricted to avoid huge prompts; prefer salient extraction upstream
-    src = text[:20000]
-
-    prompt = f"""
+def _mcq_prompt(src: str, num_questions: int) -> str:
+    """Prompt asking Gemini for a JSON array of `num_questions` MCQs grounded in `src`."""
+    return f"""
 You are an assistant that converts source text into {num_questions} high-quality multiple-choice questions (MCQs).
 Rules:
 - Return ONLY valid JSON (no extra commentary).
@@ -95,10 +86,30 @@ Source text:
 Return only the JSON array.
 """
 
+
+async def generate_mcq_from_text_gemini(text: str, num_questions: int = 5,
+                                        pages: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Use Gemini to generate a JSON array of MCQs from the extracted text.
+    Output format expected: a JSON array of objects, each with keys:
+    question, distractors (3), answer, difficulty (easy|medium|hard), explanation (opt), topic (opt)
+    """
+    if not GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY not configured in environment.")
+
+    if not isinstance(num_questions, int) or not (1 <= num_questions <= 50):
+        raise ValueError("num_questions must be an integer between 1 and 50.")
+
+    # Keep the prompt within the token budget by selecting the most informative passages
+    # (PDF page texts let it drop running headers/footers)
+    src, _ = select_passages(text, pages=pages)
+
+    prompt = _mcq_prompt(src, num_questions)
+
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
-        # Use generate_content; tune temperature/other params as needed
-        response = model.generate_content(prompt)
+        # Pooled model handle, size-based routing, shared rate limit, optional hedging and
+        # circuit breaker all live in the client manager; the SDK call runs off the event loop
+        response = await gemini_client.generate_async(prompt)
         # response may expose .text or may need str()
         raw = ""
         try:
@@ -173,6 +184,30 @@ Return only the JSON array.
         raise RuntimeError(f"LLM generation error: {e}")
 
 
+# "auto": Gemini, degrading to the local extractive generator when the LLM is unavailable
+GeneratorChoice = Literal["auto", "llm", "extractive"]
+
+
+async def generate_mcqs(text: str, num_questions: int, generator: GeneratorChoice = "auto",
+                        pages: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Dispatch to the requested MCQ generator. Returns (mcqs, generator_used).
+    `pages` are the page texts when `text` was extracted from a PDF.
+    """
+    if generator == "extractive":
+        return generate_extractive_mcqs(text, num_questions), "extractive"
+    try:
+        return await generate_mcq_from_text_gemini(text, num_questions, pages=pages), "llm"
+    except Exception as e:
+        if generator == "llm":
+            raise
+        logger.warning("LLM generation unavailable (%s); using local extractive generator.", e)
+        mcqs = generate_extractive_mcqs(text, num_questions)
+        if not mcqs:
+            raise
+        return mcqs, "extractive"
+
+
 # -----------------------
 # DB helper: save MCQs (usable by /from_pdf and /from_text)
 # -----------------------
@@ -180,85 +215,52 @@ def save_mcqs_to_db(mcqs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Insert normalized MCQ dicts into the questions table.
     Each item in mcqs must contain keys: question, distractors, answer, difficulty, explanation, topic
+    Difficulty is re-labelled by the ML predictor in one batched call and all rows
+    are written with executemany in a single transaction (see src/adaptive/question_bank.py).
+    Near-duplicates of questions already in the bank are not re-inserted; they come back
+    with the existing question's 'id' and a 'duplicate_of' key.
     Returns list of saved items with database-assigned 'id'.
     """
-    con = get_connection()
-    cur = con.cursor()
-    saved = []
     try:
-        for item in mcqs:
-            # Normalize difficulty via ML predictor (optional override)
-            try:
-                ml_label, _ = predict_difficulty(item["question"])
-                difficulty = ml_label or item.get("difficulty", "medium")
-            except Exception:
-                difficulty = item.get("difficulty", "medium")
-
-            distractors_json = json.dumps(item.get("distractors", []), ensure_ascii=False)
-
-            cur.execute(
-                "INSERT INTO questions (question, text, difficulty, answer, distractors, topic, explanation, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    item["question"],
-                    item.get("text", item["question"]),
-                    difficulty,
-                    item["answer"],
-                    distractors_json,
-                    item.get("topic", "general"),
-                    item.get("explanation", ""),
-                    json.dumps(item, ensure_ascii=False),
-                ),
-            )
-            qid = cur.lastrowid
-            saved.append({"id": qid, **item, "difficulty": difficulty})
-
-        con.commit()
-        return saved
+        return insert_questions(mcqs)
     except Exception:
-        con.rollback()
         logger.exception("DB insert error in save_mcqs_to_db:")
         raise
-    finally:
-        con.close()
+
+
+def _log_generation(source: str, generator: str, saved: List[Dict[str, Any]]):
+    event_sink("generation").emit({
+        "event": source,
+        "generator": generator,
+        "count": len(saved),
+        "duplicates": sum(1 for item in saved if "duplicate_of" in item),
+    })
 
 
 @router.post("/from_pdf")
-async def generate_from_pdf(file: UploadFile = File(...), num_questions: int = 5):
+async def generate_from_pdf(file: UploadFile = File(...), num_questions: int = 5, generator: GeneratorChoice = "auto"):
     # Validate file
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files allowed.")
 
-    # Save to a secure temporary file
-    tmp_file = None
+    # Spool to a temporary file in chunks (size-limited, removed afterwards)
     try:
-        suffix = os.path.splitext(file.filename)[1] or ".pdf"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp_file = tmp.name
-            tmp.write(await file.read())
-
-        # Extract text
-        text = extract_text_from_pdf(tmp_file)
-
+        async with spool_upload(file, suffix=".pdf") as upload:
+            # repeat uploads of the same file skip extraction
+            extracted, _ = extract_cached(upload.path, upload.sha256)
+            text = extracted.text
     except HTTPException:
         raise
     except Exception as e:
         logger.exception("PDF processing error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {e}")
 
-    finally:
-        # Clean up temp file
-        try:
-            if tmp_file and os.path.exists(tmp_file):
-                os.remove(tmp_file)
-        except Exception:
-            pass
-
     if not text or not text.strip():
         raise HTTPException(status_code=400, detail="PDF contained no extractable text.")
 
-    # Generate MCQs: use Gemini-based generator
+    # Generate MCQs: Gemini-based generator, or the local extractive one
     try:
-        mcqs = await generate_mcq_from_text_gemini(text, num_questions)
+        mcqs, used_generator = await generate_mcqs(text, num_questions, generator, pages=extracted.pages())
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
@@ -272,7 +274,80 @@ async def generate_from_pdf(file: UploadFile = File(...), num_questions: int = 5
         logger.exception("DB insert error after generation: %s", e)
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
-    return {"generated": saved}
+    _log_generation("from_pdf", used_generator, saved)
+    return {"generated": saved, "generator": used_generator}
+
+
+# -----------------------
+# /from_pdf_batch: many lecture PDFs in one request
+# -----------------------
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+
+
+async def _process_batch_file(upload, num_questions: int, generator: GeneratorChoice) -> Dict[str, Any]:
+    """Extract (process pool, cached), generate (bounded by the Gemini client) and save one spooled PDF."""
+    extracted, cached = await extract_cached_in_pool(upload.path, upload.sha256)
+    if not extracted.text.strip():
+        raise ValueError("PDF contained no extractable text.")
+    mcqs, used_generator = await generate_mcqs(extracted.text, num_questions, generator, pages=extracted.pages())
+    saved = await asyncio.to_thread(save_mcqs_to_db, mcqs)
+    return {
+        "status": "ok",
+        "generator": used_generator,
+        "extraction_cached": cached,
+        "question_ids": [item["id"] for item in saved],
+        "duplicates": sum(1 for item in saved if "duplicate_of" in item),
+    }
+
+
+@router.post("/from_pdf_batch")
+async def generate_from_pdf_batch(
+    files: List[UploadFile] = File(...), num_questions: int = 5, generator: GeneratorChoice = "auto"
+):
+    """
+    Generate and save MCQs for up to BATCH_MAX_FILES PDFs. Files are extracted
+    concurrently in the PDF process pool and generation fans out under the
+    Gemini client's concurrency limit. Every file gets its own status entry;
+    a failing file does not fail the batch.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded.")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_FILES} files per batch.")
+    if not (1 <= num_questions <= 50):
+        raise HTTPException(status_code=400, detail="num_questions must be between 1 and 50.")
+
+    results: List[Dict[str, Any]] = [{"filename": f.filename} for f in files]
+    async with AsyncExitStack() as stack:
+        # spool every file first (sequential: the request body is read in order anyway)
+        jobs = []
+        for i, f in enumerate(files):
+            if not (f.filename or "").lower().endswith(".pdf"):
+                results[i].update(status="error", error="Only PDF files allowed.")
+                continue
+            try:
+                upload = await stack.enter_async_context(spool_upload(f, suffix=".pdf"))
+            except HTTPException as e:
+                results[i].update(status="error", error=e.detail)
+                continue
+            jobs.append((i, upload))
+
+        outcomes = await asyncio.gather(
+            *(_process_batch_file(upload, num_questions, generator) for _, upload in jobs), return_exceptions=True
+        )
+
+    for (i, _), outcome in zip(jobs, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning("Batch generation failed for %s: %s", results[i]["filename"], outcome)
+            results[i].update(status="error", error=str(outcome))
+        else:
+            results[i].update(outcome)
+
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    event_sink("generation").emit({
+        "event": "from_pdf_batch", "files": len(results), "succeeded": succeeded, "generator_requested": generator,
+    })
+    return {"files": results, "succeeded": succeeded, "failed": len(results) - succeeded}
 
 
 # -----------------------
@@ -282,6 +357,7 @@ class GenerateTextRequest(BaseModel):
     text: str = Field(..., description="Source text to generate MCQs from")
     num_questions: int = Field(5, ge=1, le=50, description="Number of MCQs to generate (1-50)")
     use_structured: bool = Field(False, description="If true, prefer Gemini structured output mode (if supported)")
+    generator: GeneratorChoice = Field("auto", description="llm | extractive | auto (LLM with offline extractive fallback)")
 
 
 class MCQItem(BaseModel):
@@ -305,7 +381,8 @@ async def generate_from_text(payload: GenerateTextRequest = Body(...)):
     """
     text = payload.text
     num_questions = payload.num_questions
-    use_structured = payload.use_structured
+    use_structured = payload.use_structured and payload.generator != "extractive" and bool(GEMINI_API_KEY)
+    used_generator = "llm"
 
     if not text or not text.strip():
         raise HTTPException(status_code=400, detail="Empty text provided.")
@@ -315,14 +392,14 @@ async def generate_from_text(payload: GenerateTextRequest = Body(...)):
     # Try structured output mode first if requested and the SDK supports it
     if use_structured:
         try:
-            model = genai.GenerativeModel(GEMINI_MODEL)
-            # Many Gemini SDKs support a `response_format`/`structured_output` param.
-            # We try a best-effort call; if it fails (TypeError/AttributeError) we fallback.
+            src, _ = select_passages(text)
+            # JSON mode via generation_config; like every Gemini call it goes through the shared
+            # manager (rate limiter, circuit breaker, concurrency slots). If the SDK rejects the
+            # config (TypeError) or the output isn't a JSON array we fall back.
             try:
-                # Replace the response_format arg below with your SDK-specific structured output config
-                response = model.generate_content(
-                    prompt=f"Generate {num_questions} MCQs from the source text. Return only JSON array.",
-                    # example: response_format={"type":"json_schema","json_schema": {...}}
+                response = await gemini_client.generate_async(
+                    _mcq_prompt(src, num_questions),
+                    generation_config={"response_mime_type": "application/json"},
                 )
                 raw = getattr(response, "text", None) or str(response)
                 json_str = _find_json_array(raw)
@@ -336,7 +413,10 @@ async def generate_from_text(payload: GenerateTextRequest = Body(...)):
 
     # If no structured result, call the normal generator
     if mcqs_raw is None:
-        mcqs = await generate_mcq_from_text_gemini(text, num_questions)
+        try:
+            mcqs, used_generator = await generate_mcqs(text, num_questions, payload.generator)
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
     else:
         # we still normalize using the same routine for consistency
         try:
@@ -373,7 +453,7 @@ async def generate_from_text(payload: GenerateTextRequest = Body(...)):
         except Exception as e:
             logger.exception("Failed to normalize structured output: %s", e)
             # fallback to normal generation
-            mcqs = await generate_mcq_from_text_gemini(text, num_questions)
+            mcqs, used_generator = await generate_mcqs(text, num_questions, payload.generator)
 
     # Persist to DB using the shared helper (same behavior as /from_pdf)
     try:
@@ -382,4 +462,5 @@ async def generate_from_text(payload: GenerateTextRequest = Body(...)):
         logger.exception("Failed to save generated MCQs to DB: %s", e)
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
-    return JSONResponse({"generated": saved})
+    _log_generation("from_text", used_generator, saved)
+    return JSONResponse({"generated": saved, "generator": used_generator})
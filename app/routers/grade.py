@@ -1,7 +1,12 @@
 from fastapi import APIRouter, Request, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Any
-import difflib
+import asyncio
+import time
+
+from app.services import metrics
+from app.services.log_sink import event_sink
+from app.services.text_scorers import SCORERS, score_batch
 
 router = APIRouter()
 
@@ -16,6 +21,9 @@ class StudentAnswer(BaseModel):
 
 class GradeRequest(BaseModel):
     answers: List[StudentAnswer]
+    scorer: str | None = Field(
+        None, description="Free-text similarity scorer: difflib | token_set | tfidf (default: GRADE_SCORER)"
+    )
 
 
 class GradedAnswer(BaseModel):
@@ -32,16 +40,14 @@ class GradeResponse(BaseModel):
     finalScore: float
 
 
-def _score_text_answer(student: str, reference: str) -> (float, str):
-    if not reference:
-        return 0.0, "No reference answer available."
-    s = str(student or "").strip()
-    r = str(reference or "").strip()
-    ratio = difflib.SequenceMatcher(a=s.lower(), b=r.lower()).ratio()
-    # Map ratio [0,1] to score out of 10
-    score = round(ratio * 10.0, 2)
-    justification = f"Similarity {ratio:.2f} vs reference."
-    return score, justification
+def _score_text_answers(students: List[str], references: List[str], scorer: str | None) -> List[tuple]:
+    """(score out of 10, justification) per answer, from one batch call to the scorer."""
+    ratios = score_batch(students, references, scorer) if students else []
+    return [
+        (round(ratio * 10.0, 2), f"Similarity {ratio:.2f} vs reference.") if ref.strip()
+        else (0.0, "No reference answer available.")
+        for ratio, ref in zip(ratios, references)
+    ]
 
 
 @router.post('/grade', response_model=GradeResponse)
@@ -51,9 +57,14 @@ async def grade_submission(req: GradeRequest):
     This is a Python-only fallback grader that avoids requiring the LLM.
     It permits the frontend to rely on the Python backend for grading
     even when Node/Genkit AI flows are removed.
+
+    Free-text answers are scored together in a worker thread, so long
+    answers don't block the event loop (see app/services/text_scorers.py).
     """
-    graded: List[GradedAnswer] = []
-    total = 0.0
+    if req.scorer is not None and req.scorer not in SCORERS:
+        raise HTTPException(status_code=400, detail=f"Unknown scorer {req.scorer!r}; choose from {sorted(SCORERS)}")
+    results: List[tuple | None] = []
+    free_text = []  # indexes into results still to be scored by similarity
     for ans in req.answers:
         # Normalize answer types
         stud = ans.answer
@@ -71,10 +82,30 @@ async def grade_submission(req: GradeRequest):
                 score = 10.0 if is_correct else 0.0
                 justification = "Exact match" if is_correct else f"Expected: {ref}"
             else:
-                # Text grading by similarity
-                score, justification = _score_text_answer(str(stud), str(ref))
-                is_correct = score >= 7.0
+                # Text grading by similarity, below
+                free_text.append(len(results))
+                results.append(None)
+                continue
+        results.append((is_correct, score, justification))
+
+    if free_text:
+        started = time.perf_counter()
+        try:
+            scored = await asyncio.to_thread(
+                _score_text_answers,
+                [str(req.answers[i].answer) for i in free_text],
+                [str(req.answers[i].correctAnswer or "") for i in free_text],
+                req.scorer,
+            )
+        except (FileNotFoundError, RuntimeError) as e:  # tfidf scorer without a trained model
+            raise HTTPException(status_code=503, detail=f"Scorer {req.scorer!r} unavailable: {e}")
+        metrics.observe("grade.scoring_seconds", time.perf_counter() - started)
+        for i, (score, justification) in zip(free_text, scored):
+            results[i] = (score >= 7.0, score, justification)
 
+    graded: List[GradedAnswer] = []
+    total = 0.0
+    for ans, (is_correct, score, justification) in zip(req.answers, results):
         graded.append(GradedAnswer(
             questionId=ans.questionId,
             questionContent=ans.questionContent,
@@ -85,4 +116,10 @@ async def grade_submission(req: GradeRequest):
         ))
         total += score
 
+    event_sink("grading").emit({
+        "event": "grade",
+        "answers": len(graded),
+        "correct": sum(1 for g in graded if g.isCorrect),
+        "final_score": round(total, 2),
+    })
     return GradeResponse(gradedAnswers=graded, finalScore=round(total, 2))
@@ -1,13 +1,29 @@
 # app/routers/health.py
 from fastapi import APIRouter
 from app.config import LOG_PATH
+from app.services import metrics as metrics_registry
+from app.services.embeddings_service import embedding_stats
+from app.services.gemini_client import gemini_client
+from app.services.rate_limiter import gemini_limiter
+from src.train.model_registry import difficulty_registry
+from src.train.prediction_cache import prediction_cache
 
 router = APIRouter()
 
 @router.get("/health")
 def health():
-    return {"status": "ok", "log_path": str(LOG_PATH)}
+    return {"status": "ok", "log_path": str(LOG_PATH), "difficulty_model": difficulty_registry.state()}
 
 @router.get("/version")
 def version():
     return {"app": "Quizierra", "version": "v1.0.0"}
+
+@router.get("/metrics")
+def metrics():
+    return {
+        "metrics": metrics_registry.snapshot(),
+        "rate_limits": {"gemini": gemini_limiter.state()},
+        "gemini": gemini_client.state(),
+        "prediction_cache": prediction_cache.stats(),
+        "embeddings": embedding_stats(),
+    }
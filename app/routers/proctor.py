@@ -2,6 +2,7 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 from app.services.proctor_service import analyze_frame_meta
+from app.services.log_sink import event_sink
 
 router = APIRouter()
 
@@ -15,4 +16,11 @@ class FrameMeta(BaseModel):
 @router.post("/frame_event")
 def frame_event(meta: FrameMeta):
     events = analyze_frame_meta(meta.dict())
+    if events:  # only flagged frames are logged, not the per-frame stream
+        event_sink("proctor").emit({
+            "event": "proctor_flags",
+            "flags": events,
+            "user_hash": meta.user_hash,
+            "session_id": meta.session_id,
+        })
     return {"events": events}
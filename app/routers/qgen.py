@@ -2,9 +2,8 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from pydantic import BaseModel
 from app.services.qgen_service import generate_question_from_text
-from app.services.pdf_service import extract_text_from_pdf
-from pathlib import Path
-import uuid, os
+from app.services.pdf_cache import extract_cached
+from app.services.uploads import spool_upload
 
 router = APIRouter()
 
@@ -18,20 +17,16 @@ def from_text(req: GenRequest):
 
 @router.post("/from_pdf")
 async def from_pdf(file: UploadFile = File(...)):
-    # save temp
-    tmp_dir = Path("data/temp")
-    tmp_dir.mkdir(parents=True, exist_ok=True)
-    tmp_path = tmp_dir / f"{uuid.uuid4().hex}_{file.filename}"
-    with open(tmp_path, "wb") as f:
-        f.write(await file.read())
+    # spool to a temp file (removed on success and on errors)
     try:
-        text = extract_text_from_pdf(str(tmp_path))
+        async with spool_upload(file, suffix=".pdf") as upload:
+            # extract once per distinct file; re-uploads (here or via /ai/from_pdf) hit the cache
+            extracted, _ = extract_cached(upload.path, upload.sha256)
         # chunk first N chars for a quick call
-        preview = text[:2000]
+        preview = extracted.text[:2000]
         out = generate_question_from_text(preview)
-        # optionally delete tmp
-        try: os.remove(tmp_path)
-        except: pass
         return {"generated": out}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,128 @@
+# app/routers/questions.py
+import logging
+import time
+from typing import List, Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+
+from app.services.embeddings_service import get_embedding_service
+from src.adaptive.engine import get_connection
+from src.adaptive.similarity_index import get_index
+from src.adaptive.topic_clusters import cluster_summaries
+from src.train.model_registry import difficulty_registry
+
+logger = logging.getLogger("uvicorn.error")
+router = APIRouter(prefix="/questions", tags=["questions"])
+
+
+class SimilarItem(BaseModel):
+    question_id: int
+    score: float
+    question: Optional[str] = None
+    topic: Optional[str] = None
+    difficulty: Optional[str] = None
+
+
+class SimilarResp(BaseModel):
+    results: List[SimilarItem]
+    indexed: int
+    took_ms: float
+
+
+class ClusterItem(BaseModel):
+    cluster_id: int
+    size: int
+    label: Optional[str] = None
+    top_topics: List[str]
+    representative_ids: List[int]
+    fitted_at: Optional[str] = None
+
+
+def _embed_text(text: str, backend: Optional[str], dim: int) -> np.ndarray:
+    """Embed free text with the backend the index was built from; ValueError if it isn't `dim`-dimensional."""
+    if backend == "sbert":
+        return get_embedding_service().encode([text])[0]
+    X = difficulty_registry.current().vectorizer.transform([text])
+    if X.shape[1] != dim:  # checked while still sparse: a hashed vectorizer would expand to 2**20 floats
+        raise ValueError(f"query dimension {X.shape[1]} does not match index dimension {dim}")
+    if hasattr(X, "toarray"):
+        return X.toarray()[0]
+    dense = np.zeros(X.shape[1], dtype=np.float32)  # compact model's SparseRows
+    dense[X.indices] = X.data
+    return dense
+
+
+def _question_rows(ids: List[int]) -> dict:
+    if not ids:
+        return {}
+    con = get_connection()
+    try:
+        rows = con.execute(
+            f"SELECT id, question, topic, difficulty FROM questions WHERE id IN ({','.join('?' * len(ids))})", ids
+        ).fetchall()
+    finally:
+        con.close()
+    return {r[0]: r for r in rows}
+
+
+@router.get("/similar", response_model=SimilarResp)
+def similar_questions(
+    question_id: Optional[int] = Query(None, description="Find questions similar to this stored question"),
+    text: Optional[str] = Query(None, description="...or to this free text"),
+    k: int = Query(10, ge=1, le=100),
+    topic: Optional[str] = Query(None, description="Only return questions with this topic"),
+):
+    """
+    Nearest questions by embedding cosine similarity (memory-mapped index, see
+    src/adaptive/similarity_index.py). The query question itself is excluded.
+    """
+    if (question_id is None) == (text is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of question_id or text.")
+    started = time.perf_counter()
+    index = get_index()
+    index.refresh()
+    if not len(index):
+        raise HTTPException(status_code=503, detail="Similarity index is empty; run `python -m src.adaptive.similarity_index build`.")
+
+    if question_id is not None:
+        query = index.vector(question_id)
+        if query is None:
+            raise HTTPException(status_code=404, detail=f"Question {question_id} is not in the similarity index.")
+        exclude = [question_id]
+    else:
+        try:
+            query = _embed_text(text, index.backend, index.dim)
+        except ValueError as e:  # vectorizer retrained since the index was built
+            raise HTTPException(status_code=409, detail=str(e))
+        except Exception as e:
+            logger.exception("Failed to embed similarity query: %s", e)
+            raise HTTPException(status_code=503, detail=f"Embedding model unavailable: {e}")
+        exclude = []
+    try:
+        (hits,) = index.search(query, k=k, topic=topic, exclude_ids=exclude)
+    except ValueError as e:  # dimension mismatch: vectorizer retrained since the index was built
+        raise HTTPException(status_code=409, detail=str(e))
+
+    # questions deleted since indexing (e.g. by a dedupe pass) are dropped
+    rows = _question_rows([qid for qid, _ in hits])
+    results = [
+        SimilarItem(question_id=qid, score=round(score, 6), question=rows[qid][1], topic=rows[qid][2],
+                    difficulty=rows[qid][3])
+        for qid, score in hits if qid in rows
+    ]
+    return SimilarResp(results=results, indexed=len(index), took_ms=round((time.perf_counter() - started) * 1000, 2))
+
+
+@router.get("/clusters", response_model=List[ClusterItem])
+def clusters():
+    """
+    Embedding clusters (src/adaptive/topic_clusters.py), largest first. Pass a
+    cluster_id to /adaptive/next_question to pick within one.
+    """
+    con = get_connection()
+    try:
+        return [ClusterItem(**s) for s in cluster_summaries(con)]
+    finally:
+        con.close()
@@ -0,0 +1,104 @@
+# app/services/batching.py
+"""
+Generic micro-batcher: coalesce concurrent single-item calls into one batch call.
+
+Callers submit one item and block (or await) on its result. A background
+thread takes the first queued item, keeps collecting for up to `max_wait_ms`
+or until `max_batch` items are queued, runs `fn(batch)` once and scatters the
+results back in order. If `fn` raises, every caller of that batch gets the
+exception. Items whose future was cancelled while queued (e.g. an awaiting
+request whose client disconnected) are dropped before the batch runs.
+
+Exposed metrics (app.services.metrics):
+    <name>.batch_size          histogram of items per batch
+    <name>.queue_wait_seconds  histogram of submit -> batch start time per item
+    <name>.latency_seconds     histogram of submit -> result time per item
+
+Works for sync callers (FastAPI threadpool endpoints) via __call__ and for
+async callers via submit_async().
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Generic, List, Optional, Sequence, TypeVar
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class MicroBatcher(Generic[T, R]):
+    def __init__(self, fn: Callable[[List[T]], Sequence[R]], max_batch: int = 64, max_wait_ms: float = 2.0,
+                 name: str = "batch"):
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, item: T) -> "Future[R]":
+        self._ensure_worker()
+        fut: "Future[R]" = Future()
+        self._queue.put((item, fut, time.perf_counter()))
+        return fut
+
+    def __call__(self, item: T) -> R:
+        return self.submit(item).result()
+
+    async def submit_async(self, item: T) -> R:
+        return await asyncio.wrap_future(self.submit(item))
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # running futures can no longer be cancelled, so set_result below cannot fail
+            batch = [entry for entry in self._collect() if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            metrics.observe(f"{self.name}.batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS)
+            started = time.perf_counter()
+            for _, _, t0 in batch:
+                metrics.observe(f"{self.name}.queue_wait_seconds", started - t0)
+            try:
+                results = self.fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: batch function returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                logger.exception("%s batch of %d failed", self.name, len(batch))
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            now = time.perf_counter()
+            for (_, fut, t0), res in zip(batch, results):
+                metrics.observe(f"{self.name}.latency_seconds", now - t0)
+                fut.set_result(res)
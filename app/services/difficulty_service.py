@@ -1,33 +1,50 @@
 # app/services/difficulty_service.py
-from pathlib import Path
-import joblib
-from app.config import MODEL_DIR
+import os
+from typing import Dict, List, Sequence
 
-VEC_PATH = Path(MODEL_DIR) / "tfidf_vectorizer.joblib"
-MODEL_PATH = Path(MODEL_DIR) / "difficulty_model.joblib"
+from app.services.batching import MicroBatcher
+from src.train.model_registry import MODEL_PATH, VEC_PATH, difficulty_registry  # noqa: F401 (paths re-exported)
+from src.train.prediction_cache import predict_with_cache
+
+# how long a /difficulty request may wait for others to share its sklearn call
+DIFFICULTY_BATCH_WAIT_MS = float(os.getenv("DIFFICULTY_BATCH_WAIT_MS", "2"))
+DIFFICULTY_MAX_BATCH = int(os.getenv("DIFFICULTY_MAX_BATCH", "64"))
 
 class DifficultyService:
-    def __init__(self):
-        self.vec = None
-        self.model = None
+    """
+    Difficulty predictions on top of the shared, hot-reloadable model registry
+    (src/train/model_registry.py). Single predictions from concurrent requests
+    are micro-batched into one transform + predict_proba call.
+    """
+
+    def __init__(self, registry=difficulty_registry, max_wait_ms: float = DIFFICULTY_BATCH_WAIT_MS,
+                 max_batch: int = DIFFICULTY_MAX_BATCH):
+        self.registry = registry
+        self.batcher = MicroBatcher(self.predict_many, max_batch=max_batch, max_wait_ms=max_wait_ms, name="difficulty")
         self.load()
 
     def load(self):
+        # warm the registry at startup; a missing model is reported by predict()
         try:
-            self.vec = joblib.load(VEC_PATH)
-            self.model = joblib.load(MODEL_PATH)
+            self.registry.current()
+            self.load_err = None
         except Exception as e:
-            # leave as None if not found
-            self.vec = None
-            self.model = None
             self.load_err = str(e)
 
+    def predict_many(self, questions: Sequence[str]) -> List[Dict]:
+        """One vectorizer transform and one predict_proba for all uncached questions; results in input order."""
+        try:
+            m = self.registry.current()
+        except Exception as e:
+            raise RuntimeError(f"Model not loaded: {e}")
+        texts = [q if isinstance(q, str) else str(q) for q in questions]
+        if not texts:
+            return []
+        # cached predictions are immutable tuples; build fresh dicts/lists per caller
+        return [
+            {"difficulty": p.label, "probs": list(p.probs), "classes": list(p.classes)}
+            for p in predict_with_cache(texts, m)
+        ]
+
     def predict(self, question: str):
-        if self.model is None or self.vec is None:
-            raise RuntimeError(f"Model not loaded: {getattr(self,'load_err', 'missing')}")
-        q = question if isinstance(question, str) else str(question)
-        qv = self.vec.transform([q])
-        pred = self.model.predict(qv)[0]
-        probs = self.model.predict_proba(qv).tolist()[0] if hasattr(self.model, "predict_proba") else None
-        classes = self.model.classes_.tolist() if hasattr(self.model, "classes_") else None
-        return {"difficulty": pred, "probs": probs, "classes": classes}
+        return self.batcher(question)
@@ -1,14 +1,182 @@
 # app/services/embeddings_service.py
-from sentence_transformers import SentenceTransformer
-import joblib
+"""
+Sentence embeddings (all-MiniLM-L6-v2 by default), loaded lazily and shared.
+
+- the SentenceTransformer is loaded on the first encode(), not at import or
+  construction, so processes that never embed never pay for it
+- texts from concurrent encode() calls are coalesced by a MicroBatcher into
+  one model.encode() of up to EMBEDDING_BATCH_SIZE texts
+- every embedding is kept in an on-disk SQLite cache keyed by (model name,
+  BLAKE2b of the text), so unchanged questions are never re-encoded, across
+  restarts and processes; values use the binary format of
+  src/adaptive/embedding_codec.py
+
+Metrics (app.services.metrics): embeddings.cache_hits / embeddings.cache_misses
+counters, and the batcher's embeddings.batch_size, embeddings.queue_wait_seconds
+and embeddings.latency_seconds histograms. stats() adds the hit rate.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
 from pathlib import Path
-from app.config import MODEL_DIR
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import DATA_DIR
+from app.services import metrics
+from app.services.batching import MicroBatcher
+from src.adaptive.embedding_codec import decode, encode_dense
 
 EMB_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", DATA_DIR / "embedding_cache.db"))
+LOOKUP_CHUNK = 500  # keys per SELECT ... IN (...)
+
+
+class EmbeddingCache:
+    """Persistent text-hash -> embedding store (one SQLite connection per thread)."""
+
+    def __init__(self, path: Path = EMBEDDING_CACHE_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    model TEXT NOT NULL,
+                    text_hash BLOB NOT NULL,
+                    embedding BLOB NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                ) WITHOUT ROWID
+            """)
+            self._local.con = con
+        return con
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf8"), digest_size=16).digest()
+
+    def get_many(self, model: str, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        con = self._con()
+        found = {}
+        for i in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = list(keys[i : i + LOOKUP_CHUNK])
+            rows = con.execute(
+                f"SELECT text_hash, embedding FROM embedding_cache WHERE model = ? "
+                f"AND text_hash IN ({','.join('?' * len(chunk))})",
+                [model, *chunk],
+            ).fetchall()
+            found.update((k, decode(blob)) for k, blob in rows)
+        return found
+
+    def put_many(self, model: str, items: Sequence[tuple]):
+        """items: (key, vector) pairs."""
+        con = self._con()
+        with con:
+            con.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (model, text_hash, embedding) VALUES (?, ?, ?)",
+                [(model, k, encode_dense(v)) for k, v in items],
+            )
+
 
 class EmbeddingService:
-    def __init__(self, model_name=EMB_NAME):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name=EMB_NAME, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_wait_ms: float = EMBEDDING_BATCH_WAIT_MS, cache: Optional[EmbeddingCache] = None):
+        self.model_name = model_name
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.batcher = MicroBatcher(self._encode_batch, max_batch=batch_size, max_wait_ms=max_wait_ms,
+                                    name="embeddings")
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._stats_lock = threading.Lock()  # encode() runs on request and batcher threads
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model(self):
+        """The SentenceTransformer, loaded on first access."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _encode_batch(self, texts: List[str], show_progress: bool = False) -> List[np.ndarray]:
+        """Batcher worker: one model call for the batch, then write-through to the disk cache."""
+        vectors = np.asarray(self.model.encode(texts, show_progress_bar=show_progress), dtype=np.float32)
+        self.cache.put_many(self.model_name, [(EmbeddingCache.key(t), v) for t, v in zip(texts, vectors)])
+        return list(vectors)
 
     def encode(self, texts, show_progress=False):
-        return self.model.encode(texts, show_progress_bar=show_progress)
+        """
+        (n, dim) float32 array for a list of texts (a single string gives a 1-d vector).
+        show_progress=True (bulk jobs) encodes the cache misses in one direct model call with
+        the encoder's progress bar instead of through the shared batcher.
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else [t if isinstance(t, str) else str(t) for t in texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [EmbeddingCache.key(t) for t in texts]
+        found = self.cache.get_many(self.model_name, list(dict.fromkeys(keys)))
+
+        missing = {}  # key -> text, deduplicated
+        for text, key in zip(texts, keys):
+            if key not in found and key not in missing:
+                missing[key] = text
+        hits = len(texts) - sum(1 for k in keys if k in missing)
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += len(texts) - hits
+        metrics.inc("embeddings.cache_hits", hits)
+        metrics.inc("embeddings.cache_misses", len(texts) - hits)
+        if show_progress and missing:
+            found.update(zip(missing, self._encode_batch(list(missing.values()), show_progress=True)))
+        else:
+            # through the shared batcher, which may merge them with other callers' misses
+            futures = {key: self.batcher.submit(text) for key, text in missing.items()}
+            for key, fut in futures.items():
+                found[key] = fut.result()
+
+        out = np.stack([found[k] for k in keys])
+        return out[0] if single else out
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "model": self.model_name,
+            "loaded": self._model is not None,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None,
+        }
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide service (cheap to create: the model loads on first encode)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+        return _service
+
+
+def embedding_stats() -> Optional[dict]:
+    """stats() of the shared service, or None if nothing has used it in this process."""
+    return _service.stats() if _service is not None else None
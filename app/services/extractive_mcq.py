@@ -0,0 +1,229 @@
+# app/services/extractive_mcq.py
+"""
+Offline extractive MCQ generator (no network, tens of milliseconds).
+
+Used when a request asks for generator="extractive", and as the automatic
+degraded mode when Gemini is unavailable or out of quota.
+
+Pipeline:
+  1. split the source into sentences and weight every term by
+     term frequency x IDF (IDF from the trained TF-IDF vectorizer, via the model
+     registry; terms it has never seen are treated as rare, i.e. salient),
+     damped for terms that appear in most sentences of the document
+  2. rank sentences by the salience of the terms they contain
+  3. turn each top sentence into a definition MCQ ("X is Y" -> "Which term is
+     described as: Y?") or a cloze MCQ (most salient term blanked out)
+  4. pick distractors among the document's other salient terms (and recent
+     answers in the question bank) that look most like the answer
+"""
+import logging
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from src.train.model_registry import difficulty_registry
+
+logger = logging.getLogger(__name__)
+
+# hard cap on the text scanned, keeps worst-case latency bounded for huge uploads
+MAX_SOURCE_CHARS = 200_000
+BLANK = "_____"
+
+_SENT_SPLIT = re.compile(r"(?<=[.?!])\s+|\n{2,}")
+_TOKEN = re.compile(r"(?u)\b\w\w+\b")  # same token pattern as TfidfVectorizer
+_DEFINITION = re.compile(
+    r"^(?P<term>(?:[A-Za-z][\w\-]*\s){0,3}[A-Za-z][\w\-]*)\s+(?:is|are|was|were|refers to|means)\s+(?P<body>.{15,})$"
+)
+_NUMBER = re.compile(r"^\d+(?:\.\d+)?$")
+
+_idf: Optional[Dict[str, float]] = None
+_default_idf = 1.0
+_idf_version: Optional[str] = None
+
+
+def _load_idf():
+    """Global IDF weights from the trained vectorizer (empty if it's not trained yet); follows hot reloads."""
+    global _idf, _default_idf, _idf_version
+    try:
+        bundle = difficulty_registry.current()
+    except Exception as e:
+        if _idf is None:
+            logger.warning("TF-IDF vectorizer unavailable for extractive MCQs, using uniform IDF: %s", e)
+            _idf, _default_idf = {}, 1.0
+        return
+    if bundle.version == _idf_version:
+        return
+    vec = bundle.vectorizer
+    if hasattr(vec, "vocabulary_") and hasattr(vec, "idf_"):
+        idf = {term: float(vec.idf_[i]) for term, i in vec.vocabulary_.items()}
+    else:  # hashed-feature model (train_streaming.py): no per-term IDF available
+        idf = {}
+    _idf, _default_idf, _idf_version = idf, (max(idf.values()) if idf else 1.0), bundle.version
+
+
+def _split_sentences(text: str) -> List[str]:
+    """Unique, reasonably sized sentences in document order."""
+    seen = set()
+    out = []
+    for s in _SENT_SPLIT.split(text):
+        s = " ".join(s.split())
+        if 40 <= len(s) <= 400 and s.lower() not in seen:
+            seen.add(s.lower())
+            out.append(s)
+    return out
+
+
+def _is_candidate(word: str) -> bool:
+    w = word.lower()
+    return w not in ENGLISH_STOP_WORDS and (len(w) >= 4 or _NUMBER.match(w) is not None)
+
+
+def _shape(term: str) -> str:
+    if _NUMBER.match(term):
+        return "num"
+    if term[:1].isupper():
+        return "cap"
+    return "low"
+
+
+def _trigrams(term: str) -> set:
+    t = f"  {term.lower()} "
+    return {t[i : i + 3] for i in range(len(t) - 2)}
+
+
+def _similarity(a: str, b: str) -> float:
+    """How plausible `b` looks as a distractor for answer `a` (0..1)."""
+    ta, tb = _trigrams(a), _trigrams(b)
+    jaccard = len(ta & tb) / max(1, len(ta | tb))
+    length = 1.0 - abs(len(a) - len(b)) / max(len(a), len(b))
+    return 0.5 * (_shape(a) == _shape(b)) + 0.3 * length + 0.2 * jaccard
+
+
+def _numeric_distractors(answer: str, k: int) -> List[str]:
+    value = float(answer)
+    is_int = "." not in answer
+    out = []
+    for delta in (1, -1, 10, -10, 5, -5, 2):
+        cand = value + delta if is_int else round(value * (1 + delta / 20.0), 2)
+        s = str(int(cand)) if is_int else str(cand)
+        if s != answer and s not in out and cand >= 0:
+            out.append(s)
+        if len(out) == k:
+            break
+    return out
+
+
+def _bank_terms(limit: int = 1000) -> List[str]:
+    """Short answers of recent bank questions, used when the document has too few terms."""
+    try:
+        from src.adaptive.engine import get_connection
+
+        con = get_connection()
+        try:
+            rows = con.execute(
+                "SELECT answer FROM questions WHERE answer IS NOT NULL AND length(answer) BETWEEN 2 AND 40 "
+                "ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        finally:
+            con.close()
+        return [r[0].strip() for r in rows if r[0] and len(r[0].split()) <= 3]
+    except Exception as e:
+        logger.debug("Question bank unavailable for distractors: %s", e)
+        return []
+
+
+def _pick_distractors(answer: str, pool: List[str], sentence: str, k: int = 3) -> List[str]:
+    if _NUMBER.match(answer):
+        return _numeric_distractors(answer, k)
+    low_answer = answer.lower()
+    low_sentence = sentence.lower()
+    seen = {low_answer}
+    scored = []
+    for term in pool:
+        low = term.lower()
+        if low in seen or low in low_answer or low_answer in low or low in low_sentence:
+            continue
+        seen.add(low)
+        scored.append((_similarity(answer, term), term))
+    scored.sort(key=lambda x: -x[0])
+    return [t for _, t in scored[:k]]
+
+
+def generate_extractive_mcqs(text: str, num_questions: int = 5, use_bank: bool = True) -> List[Dict[str, Any]]:
+    """
+    Build up to `num_questions` MCQs from `text` without any LLM call.
+    Returns dicts with the same keys as the Gemini generators:
+    question, answer, distractors (3), explanation, difficulty, topic.
+    """
+    _load_idf()
+    sentences = _split_sentences((text or "")[:MAX_SOURCE_CHARS])
+    if not sentences:
+        return []
+
+    # term salience: document term frequency x global IDF x in-document specificity
+    sent_terms = []
+    tf = Counter()
+    df = Counter()
+    surface = {}  # lowercased term -> first surface form seen (keeps capitalization)
+    for s in sentences:
+        words = [w for w in _TOKEN.findall(s) if _is_candidate(w)]
+        sent_terms.append(words)
+        for w in words:
+            lw = w.lower()
+            tf[lw] += 1
+            surface.setdefault(lw, w)
+        df.update({w.lower() for w in words})
+    n = len(sentences)
+    salience = {t: c * _idf.get(t, _default_idf) * math.log(1 + n / df[t]) for t, c in tf.items()}
+
+    def sentence_score(i):
+        uniq = {w.lower() for w in sent_terms[i]}
+        return sum(salience[t] for t in uniq) / math.sqrt(1 + len(sentences[i].split()))
+
+    ranked = sorted(range(len(sentences)), key=sentence_score, reverse=True)
+    pool = [surface[t] for t, _ in sorted(salience.items(), key=lambda x: -x[1])[:300]]
+    topic = pool[0].lower() if pool else "general"
+    bank_pool = None
+
+    out = []
+    used_answers = set()
+    for i in ranked:
+        if len(out) >= num_questions:
+            break
+        sentence = sentences[i]
+        m = _DEFINITION.match(sentence.rstrip("."))
+        if m and m.group("term").lower() not in used_answers and m.group("term").split()[0].lower() not in ENGLISH_STOP_WORDS:
+            answer = m.group("term")
+            question = f'Which term is described as: "{m.group("body").rstrip(".")}"?'
+        else:
+            terms = [w for w in sent_terms[i] if w.lower() not in used_answers]
+            if not terms:
+                continue
+            answer = max(terms, key=lambda w: salience[w.lower()])
+            blanked = re.sub(rf"\b{re.escape(answer)}\b", BLANK, sentence, count=1)
+            question = f"Fill in the blank: {blanked}"
+
+        distractors = _pick_distractors(answer, pool, sentence)
+        if len(distractors) < 3 and use_bank:
+            if bank_pool is None:
+                bank_pool = _bank_terms()
+            distractors += _pick_distractors(answer, bank_pool, sentence + " " + " ".join(distractors), 3 - len(distractors))
+        if len(distractors) < 3:
+            continue  # not enough plausible options; try the next sentence
+
+        used_answers.add(answer.lower())
+        out.append(
+            {
+                "question": question,
+                "answer": answer,
+                "distractors": distractors[:3],
+                "explanation": f"From the source text: \"{sentence}\"",
+                "difficulty": "medium",
+                "topic": topic,
+            }
+        )
+    return out
@@ -0,0 +1,294 @@
+# app/services/gemini_client.py
+"""
+Shared Gemini client manager.
+
+- reuses one `GenerativeModel` handle per model name instead of building a new
+  one for every attempt
+- routes by request size: prompts up to GEMINI_FAST_MAX_TOKENS go to
+  GEMINI_FAST_MODEL (when configured), larger ones to the quality GEMINI_MODEL
+- optional hedging (GEMINI_HEDGE=1): if the primary call has not answered
+  within that model's observed p95 latency, a backup request is sent and the
+  first successful answer wins
+- circuit breaker: after GEMINI_BREAKER_FAILURES consecutive provider errors,
+  calls fail fast with CircuitOpenError for GEMINI_BREAKER_COOLDOWN seconds,
+  then a single trial call decides whether to close it again
+- every call is paced by the process-shared rate limiter, and at most
+  GEMINI_MAX_CONCURRENCY provider calls run at once per event loop (bounds
+  fan-out from batch endpoints). Async callers queue on an asyncio.Semaphore
+  before reserving limiter tokens, so a fan-out never parks executor threads;
+  the sync generate() path uses a threading semaphore of the same size
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Optional
+
+# Gemini SDK
+from google import generativeai as genai
+
+from app.services import metrics
+from app.services.rate_limiter import gemini_limiter, estimate_tokens, is_rate_limit_error, retry_after_from_error
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro-latest")
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL")  # e.g. "gemini-2.5-flash"; unset disables routing
+GEMINI_FAST_MAX_TOKENS = int(os.getenv("GEMINI_FAST_MAX_TOKENS", "2000"))
+GEMINI_HEDGE = os.getenv("GEMINI_HEDGE", "0") == "1"
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+
+# latency samples needed before p95 is trusted for hedging
+MIN_LATENCY_SAMPLES = 20
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._trial_in_flight):
+                raise CircuitOpenError("Gemini circuit breaker is open: provider recently unhealthy, failing fast.")
+            if state == "half_open":
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_neutral(self):
+        """Call finished without telling us anything about provider health (e.g. a 429)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.error("Gemini circuit breaker opened after %d consecutive failures.", self._failures)
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class GeminiClientManager:
+    def __init__(self, quality_model: str = GEMINI_MODEL, fast_model: Optional[str] = GEMINI_FAST_MODEL,
+                 fast_max_tokens: int = GEMINI_FAST_MAX_TOKENS, hedge: bool = GEMINI_HEDGE, limiter=gemini_limiter,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY):
+        self.quality_model = quality_model
+        self.fast_model = fast_model
+        self.fast_max_tokens = fast_max_tokens
+        self.hedge = hedge
+        self.limiter = limiter
+        self.breaker = CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_COOLDOWN)
+        # async callers wait for a slot on the event loop, before the limiter and before taking a
+        # worker thread; sync generate() callers are already on their own thread and block there
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+        self.max_concurrency = max_concurrency
+        self._models = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def model(self, name: Optional[str] = None):
+        """Cached model handle. Keyed on the SDK factory too, so a patched GenerativeModel (tests) is honoured."""
+        name = name or self.quality_model
+        key = (genai.GenerativeModel, name)
+        with self._lock:
+            handle = self._models.get(key)
+            if handle is None:
+                handle = self._models[key] = genai.GenerativeModel(name)
+            return handle
+
+    def route(self, prompt: str) -> str:
+        if self.fast_model and estimate_tokens(prompt) <= self.fast_max_tokens:
+            return self.fast_model
+        return self.quality_model
+
+    def _tracker(self, name: str) -> LatencyTracker:
+        with self._lock:
+            return self._latency.setdefault(name, LatencyTracker())
+
+    def _call(self, name: str, prompt: str, generation_config: Optional[dict] = None):
+        """One provider call with breaker/limiter bookkeeping (runs in a worker thread for async callers)."""
+        t0 = time.perf_counter()
+        try:
+            if generation_config:
+                response = self.model(name).generate_content(prompt, generation_config=generation_config)
+            else:
+                response = self.model(name).generate_content(prompt)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                # quota pressure is handled by the limiter; it says nothing about provider health
+                self.limiter.record_throttled(retry_after_from_error(e))
+                self.breaker.record_neutral()
+            else:
+                self.breaker.record_failure()
+                metrics.inc(f"gemini.{name}.errors")
+            raise
+        elapsed = time.perf_counter() - t0
+        self._tracker(name).record(elapsed)
+        metrics.observe(f"gemini.{name}.latency_seconds", elapsed)
+        self.breaker.record_success()
+        self.limiter.record_success()
+        return response
+
+    def _loop_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._async_slots.get(loop)
+            if slots is None:
+                slots = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+            return slots
+
+    async def _acquire_slot(self, tokens: int) -> asyncio.Semaphore:
+        """Concurrency slot first, then the rate limiter, so waiting requests hold neither threads nor tokens."""
+        slots = self._loop_slots()
+        await slots.acquire()
+        try:
+            await self.limiter.acquire_async(tokens)
+        except BaseException:
+            slots.release()
+            raise
+        return slots
+
+    def _dispatch(self, name: str, prompt: str, slots: asyncio.Semaphore,
+                  generation_config: Optional[dict] = None) -> asyncio.Future:
+        """
+        Submit _call to the default executor. Once submitted it always runs, even if the
+        awaiting task is cancelled, and it frees its slot only when the thread is done.
+        """
+        loop = asyncio.get_running_loop()
+
+        def run():
+            try:
+                return self._call(name, prompt, generation_config)
+            finally:
+                try:
+                    loop.call_soon_threadsafe(slots.release)
+                except RuntimeError:  # loop already closed
+                    pass
+
+        return loop.run_in_executor(None, run)
+
+    def generate(self, prompt: str, model_name: Optional[str] = None, generation_config: Optional[dict] = None):
+        """Blocking call for synchronous callers (no hedging). generation_config goes to the SDK as is."""
+        self.breaker.before_call()
+        name = model_name or self.route(prompt)
+        slot = False
+        try:
+            slot = self._slots.acquire()
+            self.limiter.acquire(estimate_tokens(prompt))
+        except BaseException:
+            # _call never ran: release a half-open trial slot, or the breaker stays stuck
+            if slot:
+                self._slots.release()
+            self.breaker.record_neutral()
+            raise
+        try:
+            return self._call(name, prompt, generation_config)
+        finally:
+            self._slots.release()
+
+    async def generate_async(self, prompt: str, model_name: Optional[str] = None, hedge: Optional[bool] = None,
+                             generation_config: Optional[dict] = None):
+        """Non-blocking call: the SDK request runs in a worker thread, optionally hedged."""
+        self.breaker.before_call()
+        try:
+            name = model_name or self.route(prompt)
+            tokens = estimate_tokens(prompt)
+            slots = await self._acquire_slot(tokens)
+        except BaseException:  # includes cancellation (client disconnect, cancelled gather)
+            self.breaker.record_neutral()
+            raise
+        primary = self._dispatch(name, prompt, slots, generation_config)
+
+        p95 = self._tracker(name).p95()
+        if not (self.hedge if hedge is None else hedge) or p95 is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=p95)
+        if done:
+            return primary.result()
+
+        # primary is slower than usual: race a backup (other model if routing is enabled)
+        backup_name = self.quality_model if name != self.quality_model else (self.fast_model or name)
+        slots = await self._acquire_slot(tokens)
+        if primary.done():  # answered while we waited for a slot / the limiter: no backup needed
+            slots.release()
+            return primary.result()
+        metrics.inc("gemini.hedges_sent")
+        backup = self._dispatch(backup_name, prompt, slots, generation_config)
+        pending = {primary, backup}
+        last_exc = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        metrics.inc("gemini.hedges_won")
+                    for other in pending:
+                        # the losing thread can't be interrupted; just drop its result
+                        other.add_done_callback(lambda t: t.exception())
+                    return task.result()
+                last_exc = task.exception()
+        raise last_exc
+
+    def state(self) -> dict:
+        with self._lock:
+            latency = {name: t.p95() for name, t in self._latency.items()}
+        return {
+            "quality_model": self.quality_model,
+            "fast_model": self.fast_model,
+            "hedging": self.hedge,
+            "max_concurrency": self.max_concurrency,
+            "breaker": self.breaker.state,
+            "p95_latency_s": latency,
+        }
+
+
+# Shared manager for all Gemini traffic (generate router + llm_openai service)
+gemini_client = GeminiClientManager()
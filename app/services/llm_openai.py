@@ -1,11 +1,15 @@
 ﻿# app/services/llm_openai.py  (replace existing generate_mcq_from_text with this)
 import os
-import time
 import json
 import logging
 import re
 from fastapi import HTTPException
 
+from app.services.extractive_mcq import generate_extractive_mcqs
+from app.services.passage_select import select_passages
+from app.services.gemini_client import gemini_client
+from app.services.rate_limiter import is_rate_limit_error
+
 # Gemini SDK
 from google import generativeai as genai
 
@@ -13,7 +17,6 @@ logger = logging.getLogger(__name__)
 
 # Environment config
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro-latest")  # or "gemini-2.5-flash"
 
 if GEMINI_API_KEY:
     try:
@@ -86,21 +89,32 @@ def _parse_and_normalize_mcq_list(raw_text: str):
     return out
 
 
-def generate_mcq_from_text(text: str, num_questions: int = 10, max_retries: int = 3, backoff_base: float = 1.0):
+def generate_mcq_from_text(text: str, num_questions: int = 10, max_retries: int = 3, backoff_base: float = 1.0,
+                           allow_fallback: bool = True):
     """
-    Generate MCQs via Gemini with simple retry/backoff and graceful error handling.
-    On quota / rate-limit failures this raises HTTPException(503, ...).
+    Generate MCQs via Gemini with retry and graceful error handling.
+    Calls go through the shared `gemini_client` (pooled model handles, process-shared
+    rate limiter, circuit breaker); a rate-limit error throttles the limiter for every
+    worker instead of sleeping only this thread, and the next attempt waits it out.
+    The model is chosen by the manager's size-based routing. `backoff_base` is kept for
+    backward compatibility; pacing now comes from the shared limiter.
+    When the LLM is unavailable (no key, quota exhausted, provider errors) and
+    allow_fallback is True, returns MCQs from the local extractive generator;
+    otherwise raises HTTPException(503, ...).
     """
     if not GEMINI_API_KEY:
+        if allow_fallback:
+            logger.warning("GEMINI_API_KEY not configured; using local extractive MCQ generator.")
+            return local_fallback_mcq(text, num_questions)
         raise HTTPException(status_code=503, detail="GEMINI_API_KEY not configured. Please set GEMINI_API_KEY in environment.")
 
-    prompt = JSON_PROMPT_TEMPLATE.format(n=num_questions, content=text[:20000])
+    content, _ = select_passages(text)
+    prompt = JSON_PROMPT_TEMPLATE.format(n=num_questions, content=content)
 
     last_exc = None
     for attempt in range(1, max_retries + 1):
         try:
-            model = genai.GenerativeModel(GEMINI_MODEL)
-            response = model.generate_content(prompt)
+            response = gemini_client.generate(prompt)
             # Most SDK responses expose .text
             try:
                 raw = response.text
@@ -121,11 +135,10 @@ def generate_mcq_from_text(text: str, num_questions: int = 10, max_retries: int
             last_exc = e
             err_text = str(e).lower()
 
-            # transient rate-limit / quota errors: retry with exponential backoff
-            if any(tok in err_text for tok in ("rate", "quota", "429", "insufficient_quota", "quota_exceeded")):
-                wait = backoff_base * (2 ** (attempt - 1))
-                logger.warning("Gemini rate/quota error (attempt %d/%d): %s. Retrying in %.1fs.", attempt, max_retries, e, wait)
-                time.sleep(wait)
+            # transient rate-limit / quota errors: throttle the shared limiter (all workers back off
+            # together) and retry; the next acquire() waits out the pause
+            if is_rate_limit_error(e):
+                logger.warning("Gemini rate/quota error (attempt %d/%d): %s. Retrying after limiter pause.", attempt, max_retries, e)
                 continue
 
             # If JSON parsing failed, attempt to salvage JSON from exception message or response string (no retry)
@@ -160,17 +173,22 @@ def generate_mcq_from_text(text: str, num_questions: int = 10, max_retries: int
     msg = "LLM request failed."
     if last_exc is not None:
         s = str(last_exc)
-        if "quota" in s.lower() or "insufficient_quota" in s.lower() or "quota_exceeded" in s.lower():
-            msg = "Gemini quota exhausted or billing not enabled. Please check your Google AI Studio billing/quotas and set a valid key in .env."
-        elif "rate" in s.lower() or "429" in s.lower():
-            msg = "Gemini rate limit exceeded. Try again later."
+        if is_rate_limit_error(last_exc):
+            # a 429 either way; the provider's message says whether it is the quota or the rate
+            if "quota" in s.lower():
+                msg = "Gemini quota exhausted or billing not enabled. Please check your Google AI Studio billing/quotas and set a valid key in .env."
+            else:
+                msg = "Gemini rate limit exceeded. Try again later."
         else:
             msg = f"LLM call failed: {s}"
 
     logger.exception("LLM generation failed after retries: %s", last_exc)
 
-    # Optionally: return a small local fallback instead of erroring out
-    # return local_fallback_mcq(text, min(3, num_questions))
+    # Degraded mode: keep the service usable with the local extractive generator
+    if allow_fallback:
+        fallback = local_fallback_mcq(text, num_questions)
+        if fallback:
+            return fallback
 
     # Otherwise raise an HTTPException so the API returns a 503
     raise HTTPException(status_code=503, detail=msg)
@@ -178,29 +196,8 @@ def generate_mcq_from_text(text: str, num_questions: int = 10, max_retries: int
 
 def local_fallback_mcq(text: str, num_questions: int = 3):
     """
-    Very small fallback: extract sentences from text and make simple QA pairs.
-    Not as good as LLM, but ensures service remains usable offline.
+    Offline fallback: extractive cloze/definition MCQs built from the text itself
+    (see app/services/extractive_mcq.py). Not as good as the LLM, but runs in
+    milliseconds with no network so the service remains usable offline.
     """
-    import random
-
-    sents = re.split(r'(?<=[\.\?\!])\s+', text)
-    sents = [s.strip() for s in sents if len(s.strip()) > 30]
-    if not sents:
-        sents = [text[:120]] if text else ["No content available."]
-    out = []
-    for i in range(min(num_questions, max(1, len(sents)))):
-        src = sents[i % len(sents)]
-        q = f"According to the text: summarize the main idea of: \"{src[:80]}...\""
-        a = src[:120]  # naive
-        distractors = [a[::-1][:60], "Not mentioned in the text", "Partly true"]  # placeholders
-        out.append(
-            {
-                "question": q,
-                "answer": a,
-                "distractors": distractors,
-                "explanation": "Fallback auto-generated summary.",
-                "difficulty": "medium",
-                "topic": "general",
-            }
-        )
-    return out
+    return generate_extractive_mcqs(text, num_questions)
@@ -0,0 +1,274 @@
+# app/services/log_sink.py
+"""
+Buffered, rotating JSONL sink for structured event logs.
+
+emit(record) only stamps `ts` and puts the record on an in-memory queue; a
+background thread drains the queue and appends each batch with a single
+write, so request handlers never touch the disk. If the queue is full
+(LOG_QUEUE_MAX) the record is dropped and counted, rather than blocking.
+
+Rotation: when the file reaches LOG_ROTATE_BYTES, or its first record is
+older than LOG_ROTATE_SECONDS, it is renamed to
+`<stem>.<UTC timestamp>.<pid>.jsonl` and gzip-compressed in the background.
+Only the newest LOG_KEEP_ROTATED rotated files are kept (0 = keep all).
+
+Multiple worker processes can share one file: every batch write and
+rotation check runs under an exclusive lock on `<file>.lock` (fcntl.flock,
+msvcrt.locking on Windows), and the file is opened in append mode per batch,
+so no process keeps writing into a file another process has rotated away.
+
+Streams:
+    get_sink(LOG_PATH)      difficulty predictions (data/interactions/log.jsonl)
+    event_sink("generation") / event_sink("grading") / event_sink("proctor")
+                            <LOG_PATH dir>/<name>.jsonl
+
+Metrics: log_sink.written, log_sink.dropped, log_sink.errors,
+log_sink.rotations (counters) and log_sink.batch_size (histogram).
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from app.config import LOG_PATH
+from app.services import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+LOG_ROTATE_BYTES = int(os.getenv("LOG_ROTATE_BYTES", str(100 * 1024 * 1024)))
+LOG_ROTATE_SECONDS = float(os.getenv("LOG_ROTATE_SECONDS", "86400"))
+LOG_KEEP_ROTATED = int(os.getenv("LOG_KEEP_ROTATED", "30"))
+LOG_FLUSH_MS = float(os.getenv("LOG_FLUSH_MS", "200"))
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "100000"))
+LOG_WRITE_BATCH = 1000
+
+BATCH_SIZE_BUCKETS = (1, 4, 16, 64, 256, 1024)
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f") + "Z"
+
+
+def _lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _first_ts(path: Path) -> Optional[float]:
+    """Epoch seconds of the first record's `ts`, or None."""
+    try:
+        with open(path, "rb") as f:
+            ts = json.loads(f.readline()).get("ts")
+        return datetime.fromisoformat(ts.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+    except Exception:
+        return None
+
+
+def compress_file(path: Path) -> Path:
+    """Gzip `path` to `path.gz` (via a temp name) and remove the original."""
+    gz = path.with_name(path.name + ".gz")
+    tmp = gz.with_name(gz.name + ".tmp")
+    with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp, gz)
+    path.unlink()
+    return gz
+
+
+class JsonlSink:
+    def __init__(self, path: Union[str, Path], rotate_bytes: int = LOG_ROTATE_BYTES,
+                 rotate_seconds: float = LOG_ROTATE_SECONDS, keep_rotated: int = LOG_KEEP_ROTATED,
+                 flush_ms: float = LOG_FLUSH_MS, max_queue: int = LOG_QUEUE_MAX):
+        self.path = Path(path)
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.keep_rotated = keep_rotated
+        self.flush_interval = max(flush_ms, 1.0) / 1000.0
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+
+    # ---- producer side ----
+    def emit(self, record: dict) -> bool:
+        """Queue a record for writing (adds `ts` if missing). Never blocks; False if it was dropped."""
+        if self._stopped:
+            return False
+        record.setdefault("ts", utc_now_iso())
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            metrics.inc("log_sink.dropped")
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything emitted so far is on disk (tests, shutdown). True if drained in time."""
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        if self._stopped:
+            return
+        self._stopped = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    # ---- writer side ----
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"log-sink-{self.path.stem}", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch, stop = [], first is None
+            if first is not None:
+                batch.append(first)
+            while len(batch) < LOG_WRITE_BATCH and not stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            try:
+                if batch:
+                    self._write(batch)
+            except Exception:
+                metrics.inc("log_sink.errors")
+                logger.exception("Failed to write %d log records to %s", len(batch), self.path)
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch).encode("utf8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        rotated = None
+        with open(self.path.with_name(self.path.name + ".lock"), "a+b") as lock_file:
+            _lock(lock_file)
+            try:
+                rotated = self._maybe_rotate()
+                with open(self.path, "ab") as f:
+                    f.write(data)
+            finally:
+                _unlock(lock_file)
+        metrics.inc("log_sink.written", len(batch))
+        metrics.observe("log_sink.batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS)
+        if rotated is not None:
+            # compression and retention run outside the lock; other writers are not held up
+            compress_file(rotated)
+            self._prune()
+
+    def _maybe_rotate(self) -> Optional[Path]:
+        """Rename the live file if it is too big or too old (caller holds the lock)."""
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return None
+        if size == 0:
+            return None
+        too_big = self.rotate_bytes and size >= self.rotate_bytes
+        too_old = False
+        if self.rotate_seconds and not too_big:
+            started = _first_ts(self.path)
+            too_old = started is not None and time.time() - started >= self.rotate_seconds
+        if not (too_big or too_old):
+            return None
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        target = self.path.with_name(f"{self.path.stem}.{stamp}.{os.getpid()}{self.path.suffix}")
+        os.replace(self.path, target)
+        metrics.inc("log_sink.rotations")
+        return target
+
+    def rotated_files(self):
+        """Rotated files for this sink, oldest first."""
+        pattern = f"{self.path.stem}.*{self.path.suffix}*"
+        files = [p for p in self.path.parent.glob(pattern) if p != self.path and not p.name.endswith((".lock", ".tmp"))]
+        return sorted(files, key=lambda p: p.name)
+
+    def _prune(self):
+        if self.keep_rotated <= 0:
+            return
+        for old in self.rotated_files()[: -self.keep_rotated]:
+            try:
+                old.unlink()
+            except FileNotFoundError:
+                pass
+
+
+_sinks: Dict[Path, JsonlSink] = {}
+_sinks_lock = threading.Lock()
+
+
+def get_sink(path: Union[str, Path]) -> JsonlSink:
+    """The process-wide sink for `path` (created on first use)."""
+    key = Path(path).resolve()
+    sink = _sinks.get(key)
+    if sink is None:
+        with _sinks_lock:
+            sink = _sinks.get(key)
+            if sink is None:
+                sink = _sinks[key] = JsonlSink(key)
+    return sink
+
+
+def event_sink(name: str) -> JsonlSink:
+    """Sink for an event stream next to the prediction log, e.g. event_sink("grading")."""
+    return get_sink(Path(LOG_PATH).parent / f"{name}.jsonl")
+
+
+def flush_all(timeout: float = 5.0):
+    for sink in list(_sinks.values()):
+        sink.flush(timeout)
+
+
+@atexit.register
+def close_all():
+    for sink in list(_sinks.values()):
+        sink.close()
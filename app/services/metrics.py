@@ -0,0 +1,66 @@
+# app/services/metrics.py
+"""
+Tiny in-process metrics registry (counters, gauges, histograms).
+
+Values are per worker process; `snapshot()` is served by the /metrics
+endpoint in app/routers/health.py.
+"""
+import bisect
+import threading
+from collections import defaultdict
+
+# seconds-oriented default buckets (1ms .. 60s)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_histograms = {}
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def to_dict(self):
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+def inc(name: str, value: float = 1.0):
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float, buckets=DEFAULT_BUCKETS):
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = Histogram(buckets)
+        h.observe(value)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "histograms": {k: h.to_dict() for k, h in _histograms.items()},
+        }
@@ -0,0 +1,180 @@
+# app/services/passage_select.py
+"""
+Pre-prompt passage selection: fit the most informative parts of a document
+into a token budget instead of truncating it.
+
+1. for PDFs (page texts passed in), drop boilerplate at the top and bottom of
+   each page: page-number lines and short lines that repeat across pages
+   (running headers / footers). Plain text is never stripped.
+2. split into passages (paragraphs, long ones cut into sentence groups; text
+   without sentence breaks is cut by token count)
+3. score passages by TF-IDF centrality (cosine to the document centroid), with
+   an MMR redundancy penalty so long documents are covered rather than
+   sampled from one dense section
+4. greedily keep passages that fit the budget, then restore document order
+"""
+import logging
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.services import metrics
+from app.services.rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "5000"))
+MAX_PASSAGE_TOKENS = 200
+MMR_LAMBDA = 0.7
+EDGE_LINES = 2  # header/footer candidates: first and last non-empty lines of a page
+
+_PAGE_NUMBER = re.compile(r"^\s*(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?\s*$", re.I)
+_SENT_SPLIT = re.compile(r"(?<=[.?!])\s+")
+_PAGE_REF = re.compile(r"\b(?:page|p\.)\s*\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?\b", re.I)
+_TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+
+def strip_boilerplate(pages: Sequence[str], min_repeats: int = 3, max_len: int = 80,
+                      edge_lines: int = EDGE_LINES) -> Tuple[str, int]:
+    """
+    Join PDF page texts, removing page numbers and running headers / footers.
+    Only the first and last `edge_lines` non-empty lines of a page are candidates;
+    a short one is dropped if it recurs at the edge of `min_repeats` pages. Lines
+    are compared exactly, except that "page 14" matches "page 15".
+    Returns (text, lines_removed).
+    """
+    split = []
+    for page in pages:
+        lines = page.splitlines()
+        filled = [i for i, ln in enumerate(lines) if ln.strip()]
+        split.append((lines, set(filled[:edge_lines] + filled[-edge_lines:])))
+
+    def key(line: str) -> str:
+        return _PAGE_REF.sub("page #", line.strip().lower())
+
+    counts = Counter()
+    for lines, edges in split:
+        counts.update({key(lines[i]) for i in edges if len(lines[i].strip()) <= max_len})
+    kept_pages, removed = [], 0
+    for lines, edges in split:
+        kept = []
+        for i, ln in enumerate(lines):
+            if i in edges and (_PAGE_NUMBER.match(ln) or (len(ln.strip()) <= max_len and counts[key(ln)] >= min_repeats)):
+                removed += 1
+                continue
+            kept.append(ln)
+        kept_pages.append("\n".join(kept))
+    return "\n\n".join(kept_pages), removed
+
+
+def _hard_split(sent: str, max_tokens: int) -> List[str]:
+    """Cut an over-long sentence into word groups (and over-long words into slices) of at most max_tokens."""
+    max_chars = max_tokens * 4  # estimate_tokens' ~4 characters per token
+    pieces, group, size = [], [], 0
+    for word in sent.split():
+        for start in range(0, len(word), max_chars):
+            part = word[start : start + max_chars]
+            if group and size + len(part) + 1 > max_chars:
+                pieces.append(" ".join(group))
+                group, size = [], 0
+            group.append(part)
+            size += len(part) + 1
+    if group:
+        pieces.append(" ".join(group))
+    return pieces
+
+
+def split_passages(text: str, max_tokens: int = MAX_PASSAGE_TOKENS) -> List[str]:
+    """Paragraphs of at most max_tokens, cut at sentence breaks where there are any."""
+    passages = []
+    for para in re.split(r"\n\s*\n", text):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        if estimate_tokens(para) <= max_tokens:
+            passages.append(para)
+            continue
+        group, size = [], 0
+        sentences = []
+        for sent in _SENT_SPLIT.split(para):
+            sentences.extend(_hard_split(sent, max_tokens) if estimate_tokens(sent) > max_tokens else [sent])
+        for sent in sentences:
+            t = estimate_tokens(sent)
+            if group and size + t > max_tokens:
+                passages.append(" ".join(group))
+                group, size = [], 0
+            group.append(sent)
+            size += t
+        if group:
+            passages.append(" ".join(group))
+    return passages
+
+
+def _rank(passages: List[str]):
+    """Yield passage indices in MMR order (central first, redundant ones pushed back)."""
+    try:
+        X = TfidfVectorizer(stop_words="english", sublinear_tf=True).fit_transform(passages)
+    except ValueError:  # only stop words / empty vocabulary
+        yield from range(len(passages))
+        return
+    centroid = np.asarray(X.mean(axis=0)).ravel()
+    norm = np.linalg.norm(centroid)
+    centrality = X @ (centroid / norm) if norm else np.zeros(len(passages))
+
+    max_sim = np.zeros(len(passages))
+    remaining = np.ones(len(passages), dtype=bool)
+    for _ in range(len(passages)):
+        score = MMR_LAMBDA * centrality - (1 - MMR_LAMBDA) * max_sim
+        score[~remaining] = -np.inf
+        best = int(np.argmax(score))
+        yield best
+        remaining[best] = False
+        # rows are L2-normalized, so this is the cosine similarity to every passage
+        max_sim = np.maximum(max_sim, (X @ X[best].T).toarray().ravel())
+
+
+def select_passages(text: str, token_budget: int = PROMPT_TOKEN_BUDGET,
+                    pages: Optional[Sequence[str]] = None) -> Tuple[str, Dict[str, int]]:
+    """
+    Returns (selected_text, stats). stats carries original/selected token counts
+    for monitoring; they are also recorded as histograms in app.services.metrics.
+    `pages`, when the text came from a PDF, are its page texts: headers and footers
+    are stripped from them (and they replace `text`).
+    """
+    original_tokens = estimate_tokens(text)
+    cleaned, removed = strip_boilerplate(pages) if pages else (text or "", 0)
+    passages = split_passages(cleaned)
+
+    if sum(estimate_tokens(p) for p in passages) <= token_budget:
+        chosen = list(range(len(passages)))
+    else:
+        sizes = [estimate_tokens(p) for p in passages]
+        smallest = min(sizes)
+        chosen, used = [], 0
+        for i in _rank(passages):
+            if used + sizes[i] > token_budget:
+                continue
+            chosen.append(i)
+            used += sizes[i]
+            if used + smallest > token_budget:
+                break  # nothing else can fit
+        chosen.sort()  # restore document order
+
+    selected = "\n\n".join(passages[i] for i in chosen)
+    if not selected and passages:  # budget below one passage: never prompt with an empty source text
+        selected = " ".join(cleaned.split())[: max(token_budget, 1) * 4]
+    stats = {
+        "original_tokens": original_tokens,
+        "selected_tokens": estimate_tokens(selected),
+        "passages_total": len(passages),
+        "passages_selected": len(chosen),
+        "boilerplate_lines_removed": removed,
+    }
+    metrics.observe("prompt.original_tokens", stats["original_tokens"], buckets=_TOKEN_BUCKETS)
+    metrics.observe("prompt.selected_tokens", stats["selected_tokens"], buckets=_TOKEN_BUCKETS)
+    logger.info("Passage selection: %s", stats)
+    return selected, stats
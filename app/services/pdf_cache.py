@@ -0,0 +1,148 @@
+# app/services/pdf_cache.py
+"""
+On-disk cache of extracted PDF text, keyed by the upload's SHA-256.
+
+Re-uploading the same PDF (e.g. to ask for a different number of questions)
+skips extraction entirely. Each entry is one JSON file
+`<sha256>.<backend>.json` under PDF_CACHE_DIR holding the text and the
+character offset at which every page starts. Reads touch the file's mtime, and
+writes evict the least recently used entries until the directory fits
+PDF_CACHE_MAX_BYTES. Files are written atomically (temp file + rename), so
+concurrent workers can share the directory.
+"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from app.config import DATA_DIR
+from app.services import metrics
+from app.services.pdf_extract import PDF_BACKEND, extract_pages, get_pool, iter_pages
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_DIR = Path(os.getenv("PDF_CACHE_DIR", Path(DATA_DIR) / "pdf_cache"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+PAGE_SEP = "\n\n"
+
+_evict_lock = threading.Lock()
+
+
+class ExtractedPdf(NamedTuple):
+    text: str
+    page_offsets: Tuple[int, ...]  # page_offsets[i] = start of page i + 1 in text
+
+    def page(self, number: int) -> str:
+        """Text of 1-based page `number`."""
+        start = self.page_offsets[number - 1]
+        end = self.page_offsets[number] - len(PAGE_SEP) if number < len(self.page_offsets) else len(self.text)
+        return self.text[start:end]
+
+    def pages(self) -> List[str]:
+        return [self.page(n) for n in range(1, len(self.page_offsets) + 1)]
+
+
+def _entry(sha256: str, backend: str) -> Path:
+    return PDF_CACHE_DIR / f"{sha256}.{backend}.json"
+
+
+def join_pages(pages: List[str]) -> ExtractedPdf:
+    offsets, pos = [], 0
+    for text in pages:
+        offsets.append(pos)
+        pos += len(text) + len(PAGE_SEP)
+    return ExtractedPdf(PAGE_SEP.join(pages), tuple(offsets))
+
+
+def get(sha256: str, backend: Optional[str] = None) -> Optional[ExtractedPdf]:
+    path = _entry(sha256, backend or PDF_BACKEND)
+    try:
+        with open(path, encoding="utf8") as f:
+            data = json.load(f)
+        os.utime(path)  # mark as recently used
+    except FileNotFoundError:
+        metrics.inc("pdf_cache.misses")
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable PDF cache entry %s: %s", path, e)
+        metrics.inc("pdf_cache.misses")
+        return None
+    metrics.inc("pdf_cache.hits")
+    return ExtractedPdf(data["text"], tuple(data["page_offsets"]))
+
+
+def put(sha256: str, extracted: ExtractedPdf, backend: Optional[str] = None):
+    PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf8") as f:
+            json.dump({"text": extracted.text, "page_offsets": list(extracted.page_offsets)}, f, ensure_ascii=False)
+        os.replace(tmp, _entry(sha256, backend or PDF_BACKEND))
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    evict()
+
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """Delete least recently used entries until the cache fits; returns the number removed."""
+    max_bytes = PDF_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        entries = []
+        for p in PDF_CACHE_DIR.glob("*.json"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:  # evicted by another worker
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, p in sorted(entries, key=lambda e: e[0]):
+            if total <= max_bytes:
+                break
+            try:
+                p.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        if removed:
+            metrics.inc("pdf_cache.evictions", removed)
+        metrics.set_gauge("pdf_cache.bytes", total)
+        return removed
+
+
+def extract_cached(path: str, sha256: str, backend: Optional[str] = None) -> Tuple[ExtractedPdf, bool]:
+    """Text of the PDF at `path` whose content hash is `sha256`. Returns (extracted, cache_hit)."""
+    backend = backend or PDF_BACKEND
+    cached = get(sha256, backend)
+    if cached is not None:
+        return cached, True
+    extracted = join_pages([text for _, text in iter_pages(path, backend=backend)])
+    try:
+        put(sha256, extracted, backend)
+    except OSError as e:  # a full or read-only disk must not fail the request
+        logger.warning("Could not write PDF cache entry: %s", e)
+    return extracted, False
+
+
+async def extract_cached_in_pool(path: str, sha256: str, backend: Optional[str] = None) -> Tuple[ExtractedPdf, bool]:
+    """extract_cached() for batch callers: a miss extracts the whole document in the shared process pool."""
+    backend = backend or PDF_BACKEND
+    cached = get(sha256, backend)
+    if cached is not None:
+        return cached, True
+    pages = await asyncio.wrap_future(get_pool().submit(extract_pages, path, backend))
+    extracted = join_pages(pages)
+    try:
+        await asyncio.to_thread(put, sha256, extracted, backend)
+    except OSError as e:
+        logger.warning("Could not write PDF cache entry: %s", e)
+    return extracted, False
@@ -1,9 +1,154 @@
-import pdfplumber
+# app/services/pdf_extract.py
+"""
+PDF text extraction with a pluggable backend.
+
+- backends: "pymupdf" (default, fastest) and "pdfplumber" (slower, sometimes
+  better on complex layouts); pick with the `backend` argument or PDF_BACKEND
+- iter_pages() yields (page_number, text) in page order, so callers can start
+  chunking before the whole document is read
+- documents with at least PDF_PARALLEL_MIN_PAGES pages are split into page
+  blocks that are extracted in a shared process pool (PDF_WORKERS processes);
+  pages are still yielded in order as soon as their block is done
+- page ranges (first_page/last_page, 1-based, inclusive) and max_pages limit
+  how much of the document is read at all
+
+Benchmark the backends with: python -m tools.bench_pdf_extract
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pymupdf")
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+# pages per pool task: large enough to amortize opening the document in the worker
+PAGE_BLOCK = 16
+
+
+def _pymupdf():
+    try:
+        import pymupdf
+    except ImportError:  # PyMuPDF < 1.24.3 only ships the `fitz` name
+        import fitz as pymupdf
+    return pymupdf
+
+
+def _pymupdf_count(path: str) -> int:
+    with _pymupdf().open(path) as doc:
+        return doc.page_count
+
+
+def _pymupdf_pages(path: str, start: int, stop: int) -> List[str]:
+    with _pymupdf().open(path) as doc:
+        return [doc[i].get_text("text") for i in range(start, stop)]
+
+
+def _pdfplumber_count(path: str) -> int:
+    import pdfplumber
 
-def extract_text_from_pdf(path: str) -> str:
-    text = ""
     with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            text += page_text + "\n"
-    return text.strip()
+        return len(pdf.pages)
+
+
+def _pdfplumber_pages(path: str, start: int, stop: int) -> List[str]:
+    import pdfplumber
+
+    out = []
+    with pdfplumber.open(path) as pdf:
+        for i in range(start, stop):
+            page = pdf.pages[i]
+            out.append(page.extract_text() or "")
+            page.close()  # drop the parsed layout objects of this page
+    return out
+
+
+# name -> (page_count(path), extract pages [start, stop) (0-based))
+BACKENDS: Dict[str, Tuple[Callable[[str], int], Callable[[str, int, int], List[str]]]] = {
+    "pymupdf": (_pymupdf_count, _pymupdf_pages),
+    "pdfplumber": (_pdfplumber_count, _pdfplumber_pages),
+}
+
+
+def _extract_block(backend: str, path: str, start: int, stop: int) -> List[str]:
+    """Pool task (module level so it pickles)."""
+    return BACKENDS[backend][1](path, start, stop)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all extractions in this process, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pool
+
+
+def page_count(path: str, backend: Optional[str] = None) -> int:
+    backend = backend or PDF_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend {backend!r}; choose from {sorted(BACKENDS)}")
+    return BACKENDS[backend][0](path)
+
+
+def iter_pages(
+    path: str,
+    backend: Optional[str] = None,
+    first_page: int = 1,
+    last_page: Optional[int] = None,
+    max_pages: Optional[int] = None,
+    parallel: Optional[bool] = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for the selected pages, in order (page numbers are 1-based).
+    parallel=None decides by page count; True/False forces it.
+    """
+    backend = backend or PDF_BACKEND
+    total = page_count(path, backend)
+    start = max(first_page, 1) - 1
+    stop = total if last_page is None else min(last_page, total)
+    if max_pages is not None:
+        stop = min(stop, start + max_pages)
+    if start >= stop:
+        return
+
+    if parallel is None:
+        parallel = PDF_WORKERS > 1 and stop - start >= PDF_PARALLEL_MIN_PAGES
+    extract = BACKENDS[backend][1]
+
+    if not parallel:
+        for block in range(start, stop, PAGE_BLOCK):
+            for offset, text in enumerate(extract(path, block, min(block + PAGE_BLOCK, stop))):
+                yield block + offset + 1, text
+        return
+
+    pool = get_pool()
+    futures = [
+        (block, pool.submit(_extract_block, backend, path, block, min(block + PAGE_BLOCK, stop)))
+        for block in range(start, stop, PAGE_BLOCK)
+    ]
+    try:
+        for block, fut in futures:
+            for offset, text in enumerate(fut.result()):
+                yield block + offset + 1, text
+    finally:
+        # consumer stopped early (or a block failed): don't extract pages nobody will read
+        for _, fut in futures:
+            fut.cancel()
+
+
+def extract_pages(path: str, backend: Optional[str] = None) -> List[str]:
+    """All page texts, read serially; module level so whole documents can be pool tasks."""
+    return [text for _, text in iter_pages(path, backend=backend, parallel=False)]
+
+
+def extract_text_from_pdf(path: str, backend: Optional[str] = None, **kwargs) -> str:
+    """Whole-document convenience wrapper; kwargs are passed to iter_pages."""
+    return "\n\n".join(text for _, text in iter_pages(path, backend=backend, **kwargs)).strip()
@@ -0,0 +1,244 @@
+# app/services/rate_limiter.py
+"""
+Process-shared token-bucket rate limiter for LLM provider calls.
+
+Bucket state lives in a small SQLite file so every uvicorn worker draws from
+the same request-per-minute and token-per-minute budget. Callers *reserve*
+capacity (the bucket may go negative) and are told how long to wait, so
+concurrent workers queue up behind each other instead of retrying in lockstep.
+
+The database is created on first use, at RATE_LIMIT_DB unless a limiter is
+given its own path.
+
+The effective rate adapts to provider feedback: every observed 429/quota error
+halves it (down to `min_factor`), every success recovers it additively.
+"""
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from app.config import DATA_DIR
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DB = Path(os.getenv("RATE_LIMIT_DB", Path(DATA_DIR) / "ratelimit.db"))
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "15"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+
+try:
+    from google.api_core import exceptions as _google_exceptions
+
+    _RATE_LIMIT_TYPES = (_google_exceptions.ResourceExhausted, _google_exceptions.TooManyRequests)
+except ImportError:  # google-api-core is only installed with the Gemini SDK
+    _RATE_LIMIT_TYPES = ()
+
+# fallback for errors that carry no status: whole tokens only, so e.g. "generateContent" is not "rate"
+_RATE_LIMIT_RE = re.compile(
+    r"\b(?:429|resource[_ ]exhausted|(?:insufficient_)?quota(?:_exceeded)?|rate[ _-]?limit(?:ed|s)?|too many requests)\b",
+    re.I,
+)
+_RETRY_DELAY_RE = re.compile(r"retry[_ ]delay\s*\{\s*seconds:\s*(\d+)", re.I)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for TPM budgeting."""
+    return max(1, len(text or "") // 4)
+
+
+def _http_status(exc: Exception):
+    """HTTP status carried by the exception (google.api_core `.code`, requests/openai `.status_code`), if any."""
+    response = getattr(exc, "response", None)
+    for value in (getattr(exc, "status_code", None), getattr(exc, "code", None),
+                  getattr(response, "status_code", None)):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """429 / quota errors, by type or HTTP status; message text only when neither is available."""
+    if _RATE_LIMIT_TYPES and isinstance(exc, _RATE_LIMIT_TYPES):
+        return True
+    status = _http_status(exc)
+    if status is not None:
+        return status == 429
+    return bool(_RATE_LIMIT_RE.search(str(exc)))
+
+
+def retry_after_from_error(exc: Exception):
+    """Return the provider-suggested retry delay in seconds, if the error carries one."""
+    m = _RETRY_DELAY_RE.search(str(exc))
+    return float(m.group(1)) if m else None
+
+
+class TokenBucketLimiter:
+    def __init__(self, name: str, rpm: float, tpm: float, db_path=None,
+                 min_factor: float = 0.1, recovery_step: float = 0.05):
+        if rpm <= 0 or tpm <= 0:
+            raise ValueError("rpm and tpm must be positive.")
+        self.name = name
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self._db_path = db_path
+        self.min_factor = min_factor
+        self.recovery_step = recovery_step
+        self._ready_path = None
+
+    @property
+    def db_path(self) -> Path:
+        """The given db_path, else RATE_LIMIT_DB as it is now (so importing this module touches no files)."""
+        return Path(self._db_path if self._db_path is not None else RATE_LIMIT_DB)
+
+    def _connect(self):
+        path = self.db_path
+        if self._ready_path != path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        # autocommit mode; we issue BEGIN IMMEDIATE ourselves to serialize workers
+        con = sqlite3.connect(path, timeout=10, isolation_level=None)
+        if self._ready_path != path:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    requests REAL,
+                    tokens REAL,
+                    factor REAL,
+                    throttled_until REAL,
+                    updated REAL
+                )
+            """)
+            self._ready_path = path
+        return con
+
+    def _load(self, cur, now):
+        cur.execute("SELECT requests, tokens, factor, throttled_until, updated FROM buckets WHERE name = ?", (self.name,))
+        row = cur.fetchone()
+        if row is None:
+            return self.rpm, self.tpm, 1.0, 0.0
+        requests, tokens, factor, throttled_until, updated = row
+        # refill for the time elapsed since the last update, at the current adapted rate
+        elapsed = max(0.0, now - updated)
+        req_cap, tok_cap = max(1.0, self.rpm * factor), self.tpm * factor
+        requests = min(req_cap, requests + elapsed * self.rpm * factor / 60.0)
+        tokens = min(tok_cap, tokens + elapsed * self.tpm * factor / 60.0)
+        return requests, tokens, factor, throttled_until
+
+    def _store(self, cur, requests, tokens, factor, throttled_until, now):
+        cur.execute(
+            "INSERT OR REPLACE INTO buckets (name, requests, tokens, factor, throttled_until, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.name, requests, tokens, factor, throttled_until, now),
+        )
+
+    def reserve(self, tokens: int = 1) -> float:
+        """
+        Reserve one request and `tokens` tokens. Returns the number of seconds the
+        caller must wait before sending the request (0.0 if capacity is available).
+        """
+        con = self._connect()
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            requests, avail_tokens, factor, throttled_until = self._load(cur, now)
+            tokens = min(float(tokens), self.tpm * factor)  # a single oversized prompt must not deadlock
+            requests -= 1.0
+            avail_tokens -= tokens
+            wait = max(
+                0.0,
+                -requests * 60.0 / (self.rpm * factor),
+                -avail_tokens * 60.0 / (self.tpm * factor),
+                throttled_until - now,
+            )
+            self._store(cur, requests, avail_tokens, factor, throttled_until, now)
+            cur.execute("COMMIT")
+        except Exception:
+            if con.in_transaction:
+                cur.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+        metrics.inc(f"ratelimit.{self.name}.reserved")
+        metrics.observe(f"ratelimit.{self.name}.wait_seconds", wait)
+        return wait
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Blocking acquire for synchronous callers. Returns the time waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 1) -> float:
+        """Acquire without blocking the event loop. Returns the time waited."""
+        wait = await asyncio.to_thread(self.reserve, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def _adjust(self, fn):
+        con = self._connect()
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            state = fn(*self._load(cur, now), now)
+            self._store(cur, *state, now)
+            cur.execute("COMMIT")
+            return state
+        except Exception:
+            if con.in_transaction:
+                cur.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def record_throttled(self, retry_after: float | None = None):
+        """Provider returned 429/quota: halve the shared rate and pause all workers."""
+        def fn(requests, tokens, factor, throttled_until, now):
+            factor = max(self.min_factor, factor * 0.5)
+            pause = retry_after if retry_after is not None else 60.0 / (self.rpm * factor)
+            return min(requests, 0.0), tokens, factor, max(throttled_until, now + pause)
+
+        _, _, factor, until = self._adjust(fn)
+        metrics.inc(f"ratelimit.{self.name}.throttled")
+        metrics.set_gauge(f"ratelimit.{self.name}.factor", factor)
+        logger.warning("Rate limiter '%s' throttled: factor=%.2f, paused until %.1f", self.name, factor, until)
+
+    def record_success(self):
+        def fn(requests, tokens, factor, throttled_until, now):
+            return requests, tokens, min(1.0, factor + self.recovery_step), throttled_until
+
+        if self.state()["factor"] >= 1.0:
+            return  # common case: nothing to recover, skip the write
+        _, _, factor, _ = self._adjust(fn)
+        metrics.set_gauge(f"ratelimit.{self.name}.factor", factor)
+
+    def state(self) -> dict:
+        con = self._connect()
+        try:
+            now = time.time()
+            requests, tokens, factor, throttled_until = self._load(con.cursor(), now)
+        finally:
+            con.close()
+        return {
+            "name": self.name,
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "factor": round(factor, 4),
+            "effective_rpm": round(self.rpm * factor, 3),
+            "effective_tpm": round(self.tpm * factor, 1),
+            "available_requests": round(requests, 3),
+            "available_tokens": round(tokens, 1),
+            "throttled_for_s": round(max(0.0, throttled_until - now), 3),
+        }
+
+
+# Shared limiter for all Gemini traffic (generate router + llm_openai service)
+gemini_limiter = TokenBucketLimiter("gemini", rpm=GEMINI_RPM, tpm=GEMINI_TPM)
@@ -0,0 +1,120 @@
+# app/services/text_scorers.py
+"""
+Similarity scorers for free-text grading (app/routers/grade.py).
+
+Every scorer takes the whole submission at once, as parallel lists of
+student answers and reference answers, and returns one similarity in [0, 1]
+per pair:
+
+    difflib     difflib.SequenceMatcher ratio on the lowercased strings. This is
+                the original grader and the default: being character-level, it
+                gives partial credit for typos and inflections ("mitochondrion"
+                vs "mitochondria"), but it is quadratic in the worst case.
+    token_set   Dice overlap of the two sets of word tokens, 2|A & B| / (|A| + |B|).
+                Linear in the answer length and insensitive to word order and
+                repetition, but a misspelt word counts as a miss, so it is
+                opt-in for long answers.
+    tfidf       cosine between the difficulty model's TF-IDF vectors
+                (src/train/model_registry.py). All 2n texts go through one
+                transform() call and one vectorized row-wise dot product.
+                Rare, content-bearing words count for more than stopwords.
+
+GRADE_SCORER picks the default (an unknown name falls back to difflib with a
+warning); a request may name another.
+"""
+import difflib
+import logging
+import os
+import re
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _difflib(students: Sequence[str], references: Sequence[str]) -> np.ndarray:
+    return np.array(
+        [difflib.SequenceMatcher(a=s.lower(), b=r.lower()).ratio() for s, r in zip(students, references)],
+        dtype=np.float64,
+    )
+
+
+def _token_set(students: Sequence[str], references: Sequence[str]) -> np.ndarray:
+    out = np.zeros(len(students), dtype=np.float64)
+    for i, (s, r) in enumerate(zip(students, references)):
+        a, b = set(_TOKEN.findall(s.lower())), set(_TOKEN.findall(r.lower()))
+        if a or b:
+            out[i] = 2 * len(a & b) / (len(a) + len(b))
+        else:
+            out[i] = 1.0 if s.strip().lower() == r.strip().lower() else 0.0
+    return out
+
+
+def rowwise_cosine(X, n: int) -> np.ndarray:
+    """
+    cos(X[i], X[n + i]) for i < n, on a CSR-like matrix: a scipy sparse matrix or
+    the compact model's SparseRows. Only indptr/indices/data are used.
+    Rows with no known terms score 0.
+    """
+    n_features = X.shape[1]
+    counts = np.diff(X.indptr)
+    rows = np.repeat(np.arange(X.shape[0]), counts)
+    data = np.asarray(X.data, dtype=np.float64)
+    sq_norms = np.bincount(rows, weights=data * data, minlength=X.shape[0])
+
+    # (pair, term) keys are unique within each half, so the shared terms of each pair
+    # are just the intersection of the two key arrays
+    split = X.indptr[n]
+    key_a = rows[:split].astype(np.int64) * n_features + X.indices[:split]
+    key_b = (rows[split:].astype(np.int64) - n) * n_features + X.indices[split:]
+    _, ia, ib = np.intersect1d(key_a, key_b, assume_unique=True, return_indices=True)
+    dots = np.bincount(rows[ia], weights=data[ia] * data[split + ib], minlength=n)
+
+    denom = np.sqrt(sq_norms[:n] * sq_norms[n:])
+    return np.divide(dots, denom, out=np.zeros(n), where=denom > 0)
+
+
+def _tfidf(students: Sequence[str], references: Sequence[str]) -> np.ndarray:
+    from src.train.model_registry import difficulty_registry
+
+    if not students:
+        return np.zeros(0)
+    vectorizer = difficulty_registry.current().vectorizer
+    X = vectorizer.transform(list(students) + list(references))
+    if hasattr(X, "tocsr"):
+        X = X.tocsr()
+        X.sum_duplicates()
+    return np.clip(rowwise_cosine(X, len(students)), 0.0, 1.0)
+
+
+# name -> batch scorer(students, references) -> similarities in [0, 1]
+SCORERS: Dict[str, Callable[[Sequence[str], Sequence[str]], np.ndarray]] = {
+    "difflib": _difflib,
+    "token_set": _token_set,
+    "tfidf": _tfidf,
+}
+
+
+def _default_scorer(name: str) -> str:
+    if name not in SCORERS:
+        logger.warning("Unknown GRADE_SCORER %r; using difflib (choose from %s)", name, sorted(SCORERS))
+        return "difflib"
+    return name
+
+
+GRADE_SCORER = _default_scorer(os.getenv("GRADE_SCORER", "difflib"))
+
+
+def score_batch(students: Sequence[str], references: Sequence[str], scorer: Optional[str] = None) -> List[float]:
+    """Similarity of each student answer to its reference, with one call to the named scorer."""
+    scorer = scorer or GRADE_SCORER
+    if scorer not in SCORERS:
+        raise ValueError(f"Unknown scorer {scorer!r}; choose from {sorted(SCORERS)}")
+    if len(students) != len(references):
+        raise ValueError(f"{len(students)} answers but {len(references)} references")
+    students = [str(s or "").strip() for s in students]
+    references = [str(r or "").strip() for r in references]
+    return SCORERS[scorer](students, references).tolist()
@@ -0,0 +1,76 @@
+# app/services/uploads.py
+"""
+Upload spooling shared by the file endpoints (/ai/from_pdf, /qgen/from_pdf, /asr/transcribe).
+
+spool_upload() copies an UploadFile to a temp file in UPLOAD_CHUNK_BYTES
+chunks instead of `await file.read()`, so a 100 MB upload never sits in worker
+memory. While copying it enforces the size limit (HTTP 413 as soon as it is
+exceeded) and computes the SHA-256 of the content. The temp file is removed
+when the context exits, whatever happens inside it.
+
+    async with spool_upload(file, suffix=".pdf") as upload:
+        text = extract_text_from_pdf(upload.path)
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None  # None = system temp dir
+
+
+@dataclass(frozen=True)
+class SpooledUpload:
+    path: str
+    size: int
+    sha256: str
+    filename: str
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit.")
+
+
+@asynccontextmanager
+async def spool_upload(
+    file: UploadFile,
+    suffix: Optional[str] = None,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+) -> AsyncIterator[SpooledUpload]:
+    """Stream `file` to a temp file; yields a SpooledUpload and deletes the file afterwards."""
+    # the multipart parser already knows the size: reject before copying anything
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    if suffix is None:
+        suffix = os.path.splitext(file.filename or "")[1]
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_TMP_DIR)
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+        yield SpooledUpload(path=path, size=size, sha256=digest.hexdigest(), filename=file.filename or "")
+    finally:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning("Could not remove upload temp file %s: %s", path, e)
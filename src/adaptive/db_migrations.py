@@ -5,14 +5,18 @@ One-off safe DB migration for Quizierra adaptive features.
 Adds:
  - questions.embedding (TEXT)
  - questions.gemini_difficulty (TEXT)
+ - questions.cluster_id (INTEGER, indexed; see topic_clusters.py)
  - gemini_prob_cache table
  - interactions table
+ - questions.embedding rewritten from JSON list text to the binary format
+   in src/adaptive/embedding_codec.py
 
 Run this script once (or re-run safely).
 """
 
 import sqlite3
 from src.adaptive.engine import get_connection  # reuse your existing DB connector
+from src.adaptive.embedding_codec import encode
 import json
 
 def safe_alter_questions(con):
@@ -32,6 +36,13 @@ def safe_alter_questions(con):
     else:
         print("Column already exists: questions.gemini_difficulty")
 
+    if "cluster_id" not in cols:
+        cur.execute("ALTER TABLE questions ADD COLUMN cluster_id INTEGER")
+        print("Added column: questions.cluster_id")
+    else:
+        print("Column already exists: questions.cluster_id")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_cluster_id ON questions(cluster_id)")
+
     con.commit()
 
 def create_aux_tables(con):
@@ -58,11 +69,36 @@ def create_aux_tables(con):
 
     con.commit()
 
+def migrate_embeddings_to_blobs(con, batch_size=500):
+    """Re-encode legacy JSON-text embeddings as binary blobs, batch_size rows per transaction."""
+    cur = con.cursor()
+    converted, failed, last_id = 0, 0, 0
+    while True:
+        rows = cur.execute(
+            "SELECT id, embedding FROM questions WHERE typeof(embedding) = 'text' AND trim(embedding) != '' AND id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for qid, text in rows:
+            try:
+                updates.append((encode(json.loads(text)), qid))
+            except (ValueError, TypeError):
+                failed += 1  # left as-is; recomputed by tools/compute_embeddings_tfidf.py after clearing
+        cur.executemany("UPDATE questions SET embedding = ? WHERE id = ?", updates)
+        con.commit()
+        converted += len(updates)
+    print(f"Converted {converted} embeddings to binary blobs" + (f" ({failed} unparsable left as text)" if failed else ""))
+    return converted
+
 def run_migrations():
     con = get_connection()
     try:
         safe_alter_questions(con)
         create_aux_tables(con)
+        migrate_embeddings_to_blobs(con)
     finally:
         con.close()
     print("Migrations finished.")
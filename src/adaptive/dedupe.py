@@ -0,0 +1,229 @@
+# src/adaptive/dedupe.py
+"""
+Near-duplicate detection for question stems (64-bit SimHash + banded LSH).
+
+- fingerprint(text): SimHash over word shingles of the normalized stem
+- fingerprints are persisted in the `question_fingerprints` table of the
+  adaptive DB, next to the questions they describe; questions that predate
+  the table are fingerprinted by the first SimHashIndex.refresh()
+- SimHashIndex keeps them in memory, split into 4 bands of 16 bits; two stems
+  within `max_distance` (<= 3) differing bits must share at least one band, so a
+  lookup is 4 dict probes plus a popcount per candidate (well under 1ms)
+
+Used by src/adaptive/question_bank.insert_questions at insert time and by
+tools/dedupe_questions.py for a bulk pass over an existing bank.
+"""
+import hashlib
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.adaptive.engine import get_connection
+
+MAX_DISTANCE = 3
+N_BANDS = 4
+BAND_BITS = 64 // N_BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+SHINGLE = 3
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", (text or "").lower())).strip()
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf8"), digest_size=8).digest(), "little")
+
+
+def fingerprint(text: str) -> int:
+    """64-bit SimHash of the normalized text (unsigned int)."""
+    words = normalize(text).split()
+    if len(words) >= SHINGLE:
+        features = [" ".join(words[i : i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)]
+    else:
+        features = words or [""]
+    weights = [0] * 64
+    for feat in features:
+        h = _hash64(feat)
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    out = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            out |= 1 << bit
+    return out
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# SQLite INTEGER is signed 64-bit
+def _to_db(h: int) -> int:
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def _from_db(v: int) -> int:
+    return v + (1 << 64) if v < 0 else v
+
+
+def ensure_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS question_fingerprints (
+            question_id INTEGER PRIMARY KEY,
+            simhash INTEGER NOT NULL
+        )
+    """)
+
+
+def store_fingerprints(con, pairs: List[Tuple[int, int]]):
+    """Persist (question_id, simhash) pairs; runs inside the caller's transaction."""
+    con.executemany(
+        "INSERT OR REPLACE INTO question_fingerprints (question_id, simhash) VALUES (?, ?)",
+        [(qid, _to_db(h)) for qid, h in pairs],
+    )
+
+
+def backfill_fingerprints(con) -> int:
+    """Fingerprint every question without a question_fingerprints row. Returns how many were added."""
+    missing = con.execute(
+        "SELECT q.id, q.question FROM questions q "
+        "LEFT JOIN question_fingerprints f ON f.question_id = q.id WHERE f.question_id IS NULL"
+    ).fetchall()
+    store_fingerprints(con, [(qid, fingerprint(question or "")) for qid, question in missing])
+    return len(missing)
+
+
+class SimHashIndex:
+    def __init__(self, max_distance: int = MAX_DISTANCE):
+        if max_distance >= N_BANDS:
+            raise ValueError(f"max_distance must be < {N_BANDS} for banded lookup to be exact.")
+        self.max_distance = max_distance
+        self._bands: List[Dict[int, List[Tuple[int, int]]]] = [{} for _ in range(N_BANDS)]
+        self._max_id = 0
+        self._size = 0
+        self._backfilled = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def add(self, question_id: int, h: int):
+        with self._lock:
+            for b in range(N_BANDS):
+                key = (h >> (b * BAND_BITS)) & BAND_MASK
+                self._bands[b].setdefault(key, []).append((question_id, h))
+            self._max_id = max(self._max_id, question_id)
+            self._size += 1
+
+    def query(self, h: int) -> Optional[Tuple[int, int]]:
+        """Closest indexed (question_id, distance) within max_distance, else None."""
+        best = None
+        for b in range(N_BANDS):
+            key = (h >> (b * BAND_BITS)) & BAND_MASK
+            for qid, other in self._bands[b].get(key, ()):
+                d = hamming(h, other)
+                if d <= self.max_distance and (best is None or d < best[1]):
+                    best = (qid, d)
+        return best
+
+    def refresh(self, con):
+        """
+        Pull fingerprints written since the last refresh (e.g. by other worker processes).
+        The first refresh also fingerprints questions that have no row yet (a bank that
+        predates the table), inside the caller's transaction.
+        """
+        ensure_table(con)
+        if not self._backfilled:
+            backfill_fingerprints(con)
+            self._backfilled = True
+        rows = con.execute(
+            "SELECT question_id, simhash FROM question_fingerprints WHERE question_id > ? ORDER BY question_id",
+            (self._max_id,),
+        ).fetchall()
+        for qid, v in rows:
+            self.add(qid, _from_db(v))
+
+
+_index: Optional[SimHashIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SimHashIndex:
+    """Process-wide index, filled lazily from the DB by refresh()."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimHashIndex()
+        return _index
+
+
+def question_exists(con, question_id: int) -> bool:
+    return con.execute("SELECT 1 FROM questions WHERE id = ?", (question_id,)).fetchone() is not None
+
+
+def _table_exists(cur, name: str) -> bool:
+    return cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
+
+
+def dedupe_bank(con=None, apply: bool = False, max_distance: int = MAX_DISTANCE) -> dict:
+    """
+    Bulk pass over the whole bank: keep the oldest question of every near-duplicate
+    group. With apply=True, history, interactions and gemini_prob_cache rows are
+    re-pointed to the kept question, question_stats counts are merged into it, the
+    duplicates are deleted and question_fingerprints is rebuilt.
+    Returns {"scanned": n, "duplicates": [{"id", "duplicate_of", "distance"}, ...]}.
+    """
+    global _index
+    own_con = con is None
+    if own_con:
+        con = get_connection()
+    try:
+        index = SimHashIndex(max_distance)
+        duplicates = []
+        kept = []
+        rows = con.execute("SELECT id, question FROM questions ORDER BY id").fetchall()
+        for qid, question in rows:
+            h = fingerprint(question or "")
+            hit = index.query(h)
+            if hit is not None:
+                duplicates.append({"id": qid, "duplicate_of": hit[0], "distance": hit[1]})
+                continue
+            index.add(qid, h)
+            kept.append((qid, h))
+
+        if apply:
+            ensure_table(con)
+            cur = con.cursor()
+            moves = [(d["duplicate_of"], d["id"]) for d in duplicates]
+            for table in ("history", "interactions", "gemini_prob_cache"):
+                if _table_exists(cur, table):
+                    cur.executemany(f"UPDATE {table} SET question_id = ? WHERE question_id = ?", moves)
+            if _table_exists(cur, "question_stats"):
+                # fold the duplicate's totals into the kept question (history ids are already counted)
+                cur.executemany(
+                    "INSERT INTO question_stats (question_id, attempts, correct, updated_at) "
+                    "SELECT ?, attempts, correct, updated_at FROM question_stats WHERE question_id = ? "
+                    "ON CONFLICT(question_id) DO UPDATE SET attempts = attempts + excluded.attempts, "
+                    "correct = correct + excluded.correct, updated_at = MAX(updated_at, excluded.updated_at)",
+                    moves,
+                )
+                cur.executemany("DELETE FROM question_stats WHERE question_id = ?", [(d["id"],) for d in duplicates])
+            cur.executemany("DELETE FROM questions WHERE id = ?", [(d["id"],) for d in duplicates])
+            cur.execute("DELETE FROM question_fingerprints")
+            store_fingerprints(con, kept)
+            con.commit()
+            # force every later lookup in this process to rebuild from the cleaned table
+            with _index_lock:
+                _index = None
+        return {"scanned": len(rows), "duplicates": duplicates}
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        if own_con:
+            con.close()
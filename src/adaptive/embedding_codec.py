@@ -0,0 +1,168 @@
+# src/adaptive/embedding_codec.py
+"""
+Binary format for questions.embedding.
+
+Every blob starts with an 8-byte header:
+
+    magic   2 bytes  b"QE"
+    version 1 byte   FORMAT_VERSION
+    kind    1 byte   DENSE (0) or SPARSE (1)
+    dim     uint32   vector dimension (little endian)
+
+followed by
+    DENSE:   float32[dim]
+    SPARSE:  int32 indices[nnz] then float32 values[nnz]  (nnz = payload bytes / 8)
+
+A 5000-dim TF-IDF row with a few dozen non-zeros takes a few hundred bytes,
+compared with ~50 KB of JSON text. Decoding is np.frombuffer over the blob,
+so there is no copy and no parsing. encode() picks sparse whenever that is
+smaller. Rows still holding the legacy JSON list text are read by
+decode_any() and rewritten by db_migrations.migrate_embeddings_to_blobs().
+
+The similarity index and the topic clusters hold every vector as a dense
+float32 row, so they only accept dimensions up to MAX_DENSE_DIM
+(EMBEDDING_MAX_DENSE_DIM, default 4096 = 16 KB per row). A 5000-dim TF-IDF
+row is 20 KB dense and a 2**20-feature hashed one 4 MB; embed with the sbert
+backend (384 dims) for those. stored_dim() reads the dimension from the
+header, so oversized rows are rejected before anything is expanded.
+"""
+import json
+import os
+import struct
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+MAGIC = b"QE"
+FORMAT_VERSION = 1
+DENSE, SPARSE = 0, 1
+HEADER = struct.Struct("<2sBBI")
+MAX_DENSE_DIM = int(os.getenv("EMBEDDING_MAX_DENSE_DIM", "4096"))
+
+
+def encode_dense(vec) -> bytes:
+    arr = np.ascontiguousarray(vec, dtype="<f4").ravel()
+    return HEADER.pack(MAGIC, FORMAT_VERSION, DENSE, arr.size) + arr.tobytes()
+
+
+def encode_sparse(indices, values, dim: int) -> bytes:
+    idx = np.ascontiguousarray(indices, dtype="<i4").ravel()
+    val = np.ascontiguousarray(values, dtype="<f4").ravel()
+    if idx.size != val.size:
+        raise ValueError("indices and values must have the same length")
+    return HEADER.pack(MAGIC, FORMAT_VERSION, SPARSE, dim) + idx.tobytes() + val.tobytes()
+
+
+def encode(vec) -> bytes:
+    """Encode a dense 1-d array/list or a 1-row scipy sparse matrix, using whichever layout is smaller."""
+    if hasattr(vec, "tocsr"):
+        row = vec.tocsr()
+        if row.shape[0] != 1:
+            raise ValueError("expected a single sparse row")
+        dim, idx, val = row.shape[1], row.indices, row.data
+    else:
+        dense = np.asarray(vec, dtype=np.float32).ravel()
+        dim = dense.size
+        idx = np.flatnonzero(dense)
+        val = dense[idx]
+    if idx.size * 8 < dim * 4:
+        return encode_sparse(idx, val, dim)
+    if hasattr(vec, "tocsr"):
+        return encode_dense(vec.toarray())
+    return encode_dense(dense)
+
+
+def encode_rows(matrix) -> List[bytes]:
+    """One blob per row of a scipy sparse matrix or 2-d array, without per-row matrix slicing."""
+    if hasattr(matrix, "tocsr"):
+        X = matrix.tocsr()
+        dim = X.shape[1]
+        out = []
+        for i in range(X.shape[0]):
+            a, b = X.indptr[i], X.indptr[i + 1]
+            if (b - a) * 8 < dim * 4:
+                out.append(encode_sparse(X.indices[a:b], X.data[a:b], dim))
+            else:
+                out.append(encode_dense(X[i].toarray()))
+        return out
+    return [encode(row) for row in np.asarray(matrix, dtype=np.float32)]
+
+
+def header(blob: bytes) -> Tuple[int, int, int]:
+    """(version, kind, dim); raises ValueError if blob is not an encoded embedding."""
+    if len(blob) < HEADER.size:
+        raise ValueError("embedding blob too short")
+    magic, version, kind, dim = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("not an encoded embedding")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported embedding format version {version}")
+    return version, kind, dim
+
+
+def stored_dim(value: Union[bytes, str, None]) -> Optional[int]:
+    """Dimension of a stored embedding without decoding the values (None if empty)."""
+    if value is None or value == "" or value == b"":
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return header(bytes(value[: HEADER.size]))[2]
+    return len(json.loads(value))
+
+
+def check_dense_dim(dim: int, what: str) -> int:
+    """Raise ValueError if `dim`-dimensional embeddings are too wide to hold as dense rows."""
+    if dim > MAX_DENSE_DIM:
+        raise ValueError(
+            f"{what}: {dim}-dim embeddings are too wide to store as dense float32 rows "
+            f"(limit {MAX_DENSE_DIM}, EMBEDDING_MAX_DENSE_DIM). Embed the bank with a compact backend "
+            "first: python -m tools.compute_embeddings --backend sbert --recompute"
+        )
+    return dim
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == MAGIC
+
+
+def decode_sparse(blob: bytes) -> Tuple[np.ndarray, np.ndarray, int]:
+    """(indices int32, values float32, dim) as read-only views into blob (dense blobs give all indices)."""
+    _, kind, dim = header(blob)
+    if kind == DENSE:
+        return np.arange(dim, dtype=np.int32), np.frombuffer(blob, "<f4", dim, HEADER.size), dim
+    nnz = (len(blob) - HEADER.size) // 8
+    idx = np.frombuffer(blob, "<i4", nnz, HEADER.size)
+    val = np.frombuffer(blob, "<f4", nnz, HEADER.size + 4 * nnz)
+    return idx, val, dim
+
+
+def decode(blob: bytes) -> np.ndarray:
+    """Dense float32 vector. Zero-copy (read-only view) for dense blobs."""
+    _, kind, dim = header(blob)
+    if kind == DENSE:
+        return np.frombuffer(blob, "<f4", dim, HEADER.size)
+    idx, val, dim = decode_sparse(blob)
+    out = np.zeros(dim, dtype=np.float32)
+    out[idx] = val
+    return out
+
+
+def decode_any(value: Union[bytes, str, None]) -> Optional[np.ndarray]:
+    """Decode a stored embedding in either the binary format or the legacy JSON list text."""
+    if value is None or value == "" or value == b"":
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return decode(bytes(value))
+    return np.asarray(json.loads(value), dtype=np.float32)
+
+
+def decode_matrix(blobs: Sequence[bytes], dim: Optional[int] = None) -> np.ndarray:
+    """Stack encoded embeddings into one (n, dim) float32 matrix (sparse rows are scattered in place)."""
+    if dim is None:
+        dim = header(blobs[0])[2] if blobs else 0
+    out = np.zeros((len(blobs), dim), dtype=np.float32)
+    for i, blob in enumerate(blobs):
+        idx, val, d = decode_sparse(blob)
+        if d != dim:
+            raise ValueError(f"row {i} has dimension {d}, expected {dim}")
+        out[i, idx] = val
+    return out
@@ -128,11 +128,13 @@ def _get_recent_question_ids(user_id: str, limit: int = DEFAULT_EXCLUDE_LAST_N):
     con.close()
     return [r["question_id"] for r in rows if r["question_id"] is not None]
 
-def get_next_question(user_id: str, allowed_ids=None, target_p: float = DEFAULT_TARGET_P, exclude_last_n: int = DEFAULT_EXCLUDE_LAST_N):
+def get_next_question(user_id: str, allowed_ids=None, target_p: float = DEFAULT_TARGET_P, exclude_last_n: int = DEFAULT_EXCLUDE_LAST_N,
+                      cluster_id=None):
     """
     Select the next question for a user:
     - exclude recent questions for that user (last `exclude_last_n`)
     - if allowed_ids provided, restrict to them
+    - if cluster_id provided, restrict to that embedding cluster (topic_clusters.py; indexed lookup)
     - choose the question whose predicted success probability is closest to target_p
     Returns a dict: {question_id, question_text, difficulty, predicted_prob, user_skill}
     """
@@ -142,13 +144,20 @@ def get_next_question(user_id: str, allowed_ids=None, target_p: float = DEFAULT_
     cur = con.cursor()
 
     # Build base query
+    where, params = [], []
     if allowed_ids:
         placeholders = ",".join("?" for _ in allowed_ids)
-        q = f"SELECT id, question, difficulty, metadata FROM questions WHERE id IN ({placeholders})"
-        params = tuple(allowed_ids)
-    else:
-        q = "SELECT id, question, difficulty, metadata FROM questions"
-        params = ()
+        where.append(f"id IN ({placeholders})")
+        params.extend(allowed_ids)
+    if cluster_id is not None:
+        from src.adaptive.topic_clusters import ensure_schema  # imports this module
+
+        ensure_schema(con)  # adds questions.cluster_id on a DB that was never clustered
+        where.append("cluster_id = ?")
+        params.append(cluster_id)
+    q = "SELECT id, question, difficulty, metadata FROM questions"
+    if where:
+        q += " WHERE " + " AND ".join(where)
 
     cur.execute(q, params)
     rows = cur.fetchall()
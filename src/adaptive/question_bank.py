@@ -0,0 +1,155 @@
+# src/adaptive/question_bank.py
+"""
+Bulk write path for the `questions` table.
+
+Used by save_mcqs_to_db (after generation) and by question-bank imports
+(tools/import_questions.py). Difficulty labels are predicted for a whole chunk
+with one vectorizer transform + one predict_proba call, and rows are written
+with executemany inside a single transaction.
+
+Near-duplicate stems are detected with the SimHash index in
+src/adaptive/dedupe.py before anything is written.
+"""
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.adaptive import dedupe
+from src.adaptive.engine import get_connection
+from src.train.predict_difficulty import predict_difficulty_batch
+
+logger = logging.getLogger(__name__)
+
+# bounds the size of the sparse matrix built per predict call during large imports
+PREDICT_CHUNK_SIZE = 2000
+
+DEDUPE_MODES = ("merge", "reject", "off")
+
+INSERT_SQL = (
+    "INSERT INTO questions (question, text, difficulty, answer, distractors, topic, explanation, metadata) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _predict_labels(questions: List[str]) -> List[Optional[str]]:
+    """ML difficulty labels for a chunk; None entries mean 'keep the item's own label'."""
+    try:
+        return [label for label, _ in predict_difficulty_batch(questions)]
+    except Exception as e:
+        logger.warning("Batch difficulty prediction unavailable, keeping provided labels: %s", e)
+        return [None] * len(questions)
+
+
+def _row(item: Dict[str, Any], difficulty: str) -> tuple:
+    return (
+        item["question"],
+        item.get("text", item["question"]),
+        difficulty,
+        item["answer"],
+        json.dumps(item.get("distractors", []), ensure_ascii=False),
+        item.get("topic", "general"),
+        item.get("explanation", ""),
+        json.dumps(item, ensure_ascii=False),
+    )
+
+
+def insert_questions(
+    mcqs: Iterable[Dict[str, Any]],
+    con=None,
+    predict: bool = True,
+    chunk_size: int = PREDICT_CHUNK_SIZE,
+    dedupe_mode: str = "merge",
+) -> List[Dict[str, Any]]:
+    """
+    Insert normalized MCQ dicts (question, answer, distractors, difficulty, explanation, topic).
+
+    - predict=True overrides each item's difficulty with the ML label (falls back
+      to the item's own label, then "medium", if the model is unavailable)
+    - all rows are written in one transaction; on error nothing is inserted
+    - pass an open connection to take part in a caller-managed transaction
+    - dedupe_mode: "merge" returns near-duplicates of existing (or earlier in the
+      batch) questions with the existing id and a 'duplicate_of' key instead of
+      inserting them; "reject" drops them from the result; "off" inserts everything
+
+    Returns the saved items (input order) with their database-assigned 'id'.
+    """
+    if dedupe_mode not in DEDUPE_MODES:
+        raise ValueError(f"dedupe_mode must be one of {DEDUPE_MODES}")
+    items = list(mcqs)
+    if not items:
+        return []
+
+    own_con = con is None
+    if own_con:
+        con = get_connection()
+    cur = con.cursor()
+    saved: List[Dict[str, Any]] = []
+    index = dedupe.get_index() if dedupe_mode != "off" else None
+    # stems inserted by this call, under provisional ids -(position + 1) until their rowid is known
+    batch_index = dedupe.SimHashIndex()
+    real_ids: Dict[int, int] = {}
+    try:
+        if index is not None:
+            # the index only ever learns about committed rows through refresh(), so it
+            # also picks up questions inserted by other worker processes
+            index.refresh(con)
+        else:
+            dedupe.ensure_table(con)
+
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start : start + chunk_size]
+            results: List[Optional[Dict[str, Any]]] = [None] * len(chunk)
+
+            # 1) near-duplicate check against the bank and earlier items of this call
+            fresh = []  # (position in chunk, item, simhash)
+            for pos, it in enumerate(chunk):
+                h = dedupe.fingerprint(it["question"])
+                hit = None
+                if index is not None:
+                    hit = batch_index.query(h)
+                    if hit is None:
+                        hit = index.query(h)
+                        if hit is not None and not dedupe.question_exists(con, hit[0]):
+                            hit = None  # removed by a dedupe pass in another process
+                if hit is not None:
+                    if dedupe_mode == "merge":
+                        results[pos] = {**it, "id": hit[0], "duplicate_of": hit[0]}
+                    continue
+                batch_index.add(-(start + pos + 1), h)
+                fresh.append((pos, it, h))
+
+            if fresh:
+                # 2) one predict call + one executemany for the new questions
+                labels = _predict_labels([it["question"] for _, it, _ in fresh]) if predict else [None] * len(fresh)
+                difficulties = [lbl or it.get("difficulty", "medium") for (_, it, _), lbl in zip(fresh, labels)]
+
+                cur.executemany(INSERT_SQL, [_row(it, d) for (_, it, _), d in zip(fresh, difficulties)])
+                # The open write transaction serializes writers, so rowids of this
+                # executemany are contiguous and end at last_insert_rowid().
+                last_id = cur.execute("SELECT last_insert_rowid()").fetchone()[0]
+                first_id = last_id - len(fresh) + 1
+                fingerprints = []
+                for offset, ((pos, it, h), d) in enumerate(zip(fresh, difficulties)):
+                    qid = first_id + offset
+                    real_ids[-(start + pos + 1)] = qid
+                    results[pos] = {"id": qid, **it, "difficulty": d}
+                    fingerprints.append((qid, h))
+                dedupe.store_fingerprints(con, fingerprints)
+
+            # duplicates of earlier items of this call get the original's real id
+            for res in results:
+                if res is not None and res.get("duplicate_of", 0) < 0:
+                    res["id"] = res["duplicate_of"] = real_ids[res["duplicate_of"]]
+
+            saved.extend(r for r in results if r is not None)
+
+        if own_con:
+            con.commit()
+        return saved
+    except Exception:
+        if own_con:
+            con.rollback()
+        raise
+    finally:
+        if own_con:
+            con.close()
@@ -0,0 +1,392 @@
+# src/adaptive/similarity_index.py
+"""
+Memory-mapped nearest-neighbour index over questions.embedding.
+
+Layout (data/similarity_index/ by default, SIMILARITY_INDEX_DIR):
+
+    vectors.f32   float32 (count, dim), rows L2-normalized, C order
+    ids.i64       int64 question id per row
+    topics.i32    int32 topic code per row (-1 = no topic)
+    meta.json     dim, count, topic names (code = position), backend, built_at
+
+Every process maps the files read-only (np.memmap), so all workers share one
+copy through the page cache. Because rows are normalized, cosine similarity
+is a dot product. Search runs over blocks of SEARCH_BLOCK rows: one matmul
+per block against all queries, then argpartition to keep each query's top k.
+A topic filter masks the block's scores before selection.
+
+Appends are incremental. append_rows()/append_new() write new rows after the
+existing ones under an exclusive lock file and then rewrite meta.json
+atomically. Readers only ever map `count` rows, so they never see a
+partially appended row. Other processes pick up the new count on their next
+refresh(). Re-embedded rows (compute_embeddings --recompute) need a
+`build`, since an append never rewrites an existing row.
+
+Rows are dense, so the index refuses embeddings wider than
+embedding_codec.MAX_DENSE_DIM (build the bank's embeddings with the sbert
+backend rather than wide TF-IDF vectors).
+
+Questions written by question_bank.insert_questions() have no embedding
+yet, so they are not appended there: tools/compute_embeddings.py appends
+each batch it embeds, and `update` catches anything missed.
+
+Run as:
+    python -m src.adaptive.similarity_index build      # full rebuild from the DB
+    python -m src.adaptive.similarity_index update     # append rows not indexed yet
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT))  # allow `python src/adaptive/similarity_index.py`
+
+from src.adaptive.embedding_codec import check_dense_dim, decode_any, stored_dim
+from src.adaptive.engine import get_connection
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+INDEX_DIR = Path(os.getenv("SIMILARITY_INDEX_DIR", ROOT / "data" / "similarity_index"))
+SIMILARITY_REFRESH_INTERVAL = float(os.getenv("SIMILARITY_REFRESH_INTERVAL", "5"))
+SEARCH_BLOCK = 65536  # rows per matmul block
+READ_BATCH = 5000  # DB rows decoded per append step
+
+
+@contextmanager
+def _locked(path: Path):
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _write_meta(index_dir: Path, meta: dict):
+    tmp = index_dir / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta, ensure_ascii=False))
+    os.replace(tmp, index_dir / "meta.json")
+
+
+def normalize_rows(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    norms = np.linalg.norm(X, axis=-1, keepdims=True)
+    return X / np.where(norms > 0, norms, 1.0)
+
+
+class SimilarityIndex:
+    def __init__(self, index_dir: Path = INDEX_DIR, refresh_interval: float = SIMILARITY_REFRESH_INTERVAL):
+        self.index_dir = Path(index_dir)
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._signature = None
+        self._load()
+
+    # ---- loading ----
+    def _load(self):
+        meta_path = self.index_dir / "meta.json"
+        try:
+            self._signature = meta_path.stat().st_mtime_ns
+            meta = json.loads(meta_path.read_text())
+        except FileNotFoundError:
+            self._signature, meta = None, {"dim": 0, "count": 0, "topics": [], "backend": None}
+        self.meta = meta
+        n, dim = meta["count"], meta["dim"]
+        if n:
+            self.vectors = np.memmap(self.index_dir / "vectors.f32", np.float32, "r", shape=(n, dim))
+            self.ids = np.memmap(self.index_dir / "ids.i64", np.int64, "r", shape=(n,))
+            self.topic_codes = np.memmap(self.index_dir / "topics.i32", np.int32, "r", shape=(n,))
+        else:
+            self.vectors = np.zeros((0, dim), np.float32)
+            self.ids = np.zeros(0, np.int64)
+            self.topic_codes = np.zeros(0, np.int32)
+        self._id_order = np.argsort(self.ids, kind="stable")  # for id -> row lookups
+        self._sorted_ids = np.asarray(self.ids)[self._id_order]
+        self._topics = {t: i for i, t in enumerate(meta["topics"])}
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-map if meta.json changed (appends from other processes); checked every refresh_interval."""
+        if not force and time.monotonic() - self._checked_at < self.refresh_interval:
+            return False
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                sig = (self.index_dir / "meta.json").stat().st_mtime_ns
+            except FileNotFoundError:
+                sig = None
+            if sig == self._signature:
+                return False
+            self._load()
+            return True
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.meta["dim"]
+
+    @property
+    def backend(self) -> Optional[str]:
+        return self.meta.get("backend")
+
+    def _lookup(self, question_ids: Iterable[int]):
+        wanted = np.asarray(list(question_ids), dtype=np.int64)
+        if not len(self._sorted_ids) or not len(wanted):
+            return np.zeros(len(wanted), bool), np.zeros(len(wanted), np.int64)
+        pos = np.clip(np.searchsorted(self._sorted_ids, wanted), 0, len(self._sorted_ids) - 1)
+        return self._sorted_ids[pos] == wanted, pos
+
+    def contains(self, question_ids: Iterable[int]) -> np.ndarray:
+        """Boolean mask: which of the given question ids are indexed."""
+        return self._lookup(question_ids)[0]
+
+    def rows_for_ids(self, question_ids: Iterable[int]) -> np.ndarray:
+        """Row positions of the given question ids (ids not in the index are skipped)."""
+        found, pos = self._lookup(question_ids)
+        return self._id_order[pos[found]]
+
+    def vector(self, question_id: int) -> Optional[np.ndarray]:
+        rows = self.rows_for_ids([question_id])
+        return np.array(self.vectors[rows[0]]) if len(rows) else None
+
+    # ---- search ----
+    def search(self, queries: np.ndarray, k: int = 10, topic: Optional[str] = None,
+               exclude_ids: Sequence[int] = ()) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k (question_id, cosine) per query row, best first. `queries` is (dim,) or (m, dim);
+        rows outside `topic` and `exclude_ids` are never returned.
+        """
+        Q = normalize_rows(np.atleast_2d(queries))
+        if Q.shape[1] != self.dim:
+            raise ValueError(f"query dimension {Q.shape[1]} does not match index dimension {self.dim}")
+        m, n = Q.shape[0], len(self)
+        code = None
+        if topic is not None:
+            code = self._topics.get(topic)
+            if code is None:
+                return [[] for _ in range(m)]
+        excluded = self.rows_for_ids(exclude_ids)
+        best_scores = np.full((0, m), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((0, m), dtype=np.int64)
+        QT = np.ascontiguousarray(Q.T)
+        for start in range(0, n, SEARCH_BLOCK):
+            stop = min(start + SEARCH_BLOCK, n)
+            scores = self.vectors[start:stop] @ QT  # (block, m)
+            if code is not None:
+                scores[np.asarray(self.topic_codes[start:stop]) != code] = -np.inf
+            local = excluded[(excluded >= start) & (excluded < stop)]
+            if len(local):
+                scores[local - start] = -np.inf
+            if stop - start > k:
+                top = np.argpartition(-scores, k, axis=0)[:k]
+                scores = np.take_along_axis(scores, top, axis=0)
+                rows = top + start
+            else:
+                rows = np.broadcast_to(np.arange(start, stop)[:, None], scores.shape)
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([best_rows, rows])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k, axis=0)[:k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=0)
+                best_rows = np.take_along_axis(best_rows, keep, axis=0)
+        out = []
+        for j in range(m):
+            order = np.argsort(-best_scores[:, j], kind="stable")
+            out.append([
+                (int(self.ids[best_rows[i, j]]), float(best_scores[i, j]))
+                for i in order if np.isfinite(best_scores[i, j])
+            ])
+        return out
+
+    # ---- incremental updates ----
+    def append_rows(self, rows: Iterable[Tuple[int, Optional[str], object]], backend: Optional[str] = None) -> int:
+        """
+        Append (question_id, topic, stored embedding) rows; ids already indexed and rows whose
+        dimension differs from the index are skipped. Returns the number of rows appended.
+        Raises ValueError if the first row of an empty index is wider than MAX_DENSE_DIM.
+        """
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        appended = 0
+        with _locked(self.index_dir / ".lock"):
+            self._load()  # another process may have appended since we mapped
+            meta = dict(self.meta, topics=list(self.meta["topics"]))
+            topics = {t: i for i, t in enumerate(meta["topics"])}
+            added = set()  # ids appended by this call (the mapped index covers the rest)
+            row_bytes = meta["dim"] * 4
+            paths = [self.index_dir / name for name in ("vectors.f32", "ids.i64", "topics.i32")]
+            # drop any tail left by an append that died before updating meta
+            for path, width in zip(paths, (row_bytes, 8, 4)):
+                if path.exists() and path.stat().st_size != meta["count"] * width:
+                    with open(path, "r+b") as f:
+                        f.truncate(meta["count"] * width)
+            files = [open(p, "ab") for p in paths]
+            try:
+                batch_vecs, batch_ids, batch_topics = [], [], []
+
+                def flush():
+                    if batch_ids:
+                        files[0].write(normalize_rows(np.stack(batch_vecs)).astype("<f4").tobytes())
+                        files[1].write(np.asarray(batch_ids, dtype="<i8").tobytes())
+                        files[2].write(np.asarray(batch_topics, dtype="<i4").tobytes())
+                        for lst in (batch_vecs, batch_ids, batch_topics):
+                            lst.clear()
+
+                for qid, topic, stored in rows:
+                    if qid in added or self.contains([qid])[0]:
+                        continue
+                    try:
+                        dim = stored_dim(stored)  # checked before decoding: sparse rows expand to dim floats
+                    except ValueError:
+                        continue
+                    if dim is None:
+                        continue
+                    if not meta["dim"]:
+                        meta["dim"] = check_dense_dim(dim, "similarity index")
+                        row_bytes = dim * 4
+                    if dim != meta["dim"]:
+                        continue
+                    vec = decode_any(stored)
+                    if topic:
+                        if topic not in topics:
+                            topics[topic] = len(meta["topics"])
+                            meta["topics"].append(topic)
+                        code = topics[topic]
+                    else:
+                        code = -1
+                    batch_vecs.append(vec)
+                    batch_ids.append(qid)
+                    batch_topics.append(code)
+                    added.add(qid)
+                    appended += 1
+                    if len(batch_ids) >= READ_BATCH:
+                        flush()
+                flush()
+            finally:
+                for f in files:
+                    f.close()
+            if appended:
+                meta.update(count=meta["count"] + appended, backend=backend or meta.get("backend"),
+                            updated_at=datetime.now(timezone.utc).isoformat())
+                _write_meta(self.index_dir, meta)  # last: makes the new rows visible
+            self._load()
+        return appended
+
+    def append_new(self, con=None, question_ids: Optional[Sequence[int]] = None,
+                   backend: Optional[str] = None) -> int:
+        """Append embedded questions from the DB: the given ids, or every id above the largest indexed one."""
+        own_con = con is None
+        if own_con:
+            con = get_connection()
+        try:
+            if question_ids is not None:
+                def rows():
+                    ids = list(question_ids)
+                    for i in range(0, len(ids), 900):  # stay under SQLite's parameter limit
+                        chunk = ids[i : i + 900]
+                        yield from con.execute(
+                            f"SELECT id, topic, embedding FROM questions WHERE id IN ({','.join('?' * len(chunk))}) "
+                            "AND embedding IS NOT NULL ORDER BY id",
+                            chunk,
+                        )
+            else:
+                after = int(self.ids.max()) if len(self.ids) else 0
+
+                def rows():
+                    cur = con.execute(
+                        "SELECT id, topic, embedding FROM questions WHERE id > ? AND embedding IS NOT NULL ORDER BY id",
+                        (after,),
+                    )
+                    while True:
+                        batch = cur.fetchmany(READ_BATCH)
+                        if not batch:
+                            return
+                        yield from (tuple(r) for r in batch)
+            return self.append_rows(rows(), backend=backend)
+        finally:
+            if own_con:
+                con.close()
+
+
+def build_index(con=None, index_dir: Path = INDEX_DIR, backend: Optional[str] = None) -> SimilarityIndex:
+    """Rebuild from every embedded question into a fresh directory, then swap it in."""
+    index_dir = Path(index_dir)
+    tmp_dir = index_dir.with_name(index_dir.name + ".building")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    fresh = SimilarityIndex(tmp_dir)
+    try:
+        fresh.append_new(con, backend=backend)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    old_dir = index_dir.with_name(index_dir.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if index_dir.exists():
+        os.replace(index_dir, old_dir)
+    os.replace(tmp_dir, index_dir)
+    # processes still mapping the old files keep them alive until they re-map
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return SimilarityIndex(index_dir)
+
+
+_index: Optional[SimilarityIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SimilarityIndex:
+    """Process-wide index; call refresh() before searching to see other processes' appends."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex()
+        return _index
+
+
+def index_exists(index_dir: Path = INDEX_DIR) -> bool:
+    return (Path(index_dir) / "meta.json").exists()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["build", "update"])
+    ap.add_argument("--dir", default=str(INDEX_DIR))
+    ap.add_argument("--backend", help="embedding backend the stored vectors came from (tfidf / sbert)")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    if args.command == "build":
+        try:
+            index = build_index(index_dir=Path(args.dir), backend=args.backend)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f"Built index: {len(index)} questions, dim {index.dim}, in {time.perf_counter() - t0:.2f}s")
+    else:
+        index = SimilarityIndex(Path(args.dir))
+        n = index.append_new(backend=args.backend)
+        print(f"Appended {n} questions (index now {len(index)}) in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
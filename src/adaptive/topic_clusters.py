@@ -0,0 +1,292 @@
+# src/adaptive/topic_clusters.py
+"""
+Embedding-based topic clusters for the question bank.
+
+The `topic` string is whatever the generator returned (often "general").
+This module groups questions instead by their stored embeddings
+(questions.embedding, see embedding_codec.py):
+
+- fit_clusters(): offline MiniBatchKMeans over the L2-normalized embeddings,
+  which amounts to cosine k-means. Embeddings are streamed from SQLite in
+  chunks into partial_fit, so the bank never has to fit in memory. A second
+  pass writes every question's cluster into the indexed questions.cluster_id
+  column with executemany.
+- topic_clusters table: one row per cluster with its centroid (float32
+  blob), size, most common generator topics and the questions nearest the
+  centroid, so clusters can be labeled and shown.
+- assign(): incremental. It gives new or unassigned questions their nearest
+  centroid without refitting. tools/compute_embeddings.py calls it for every
+  batch it embeds once clusters exist.
+
+engine.get_next_question(cluster_id=...) then filters candidates with an
+index lookup on questions.cluster_id.
+
+Run as:
+    python -m src.adaptive.topic_clusters fit --k 50
+    python -m src.adaptive.topic_clusters assign          # unassigned questions only
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT))  # allow `python src/adaptive/topic_clusters.py`
+
+from src.adaptive.embedding_codec import check_dense_dim, decode, decode_any, encode_dense, stored_dim
+from src.adaptive.engine import get_connection
+
+DEFAULT_K = 50
+CHUNK_SIZE = 4096
+REPRESENTATIVES = 5
+TOP_TOPICS = 5
+INIT_SAMPLE = 4096
+
+
+def ensure_schema(con):
+    """questions.cluster_id (indexed) and the topic_clusters summary table."""
+    cols = [row[1] for row in con.execute("PRAGMA table_info(questions)")]
+    if "cluster_id" not in cols:
+        con.execute("ALTER TABLE questions ADD COLUMN cluster_id INTEGER")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_questions_cluster_id ON questions(cluster_id)")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS topic_clusters (
+            cluster_id INTEGER PRIMARY KEY,
+            size INTEGER NOT NULL DEFAULT 0,
+            centroid BLOB NOT NULL,
+            top_topics TEXT,
+            representative_ids TEXT,
+            label TEXT,
+            fitted_at TEXT
+        )
+    """)
+    con.commit()
+
+
+def _normalize(X: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    return X / np.where(norms > 0, norms, 1.0)
+
+
+def _embedded_chunks(con, dim: Optional[int], chunk_size: int = CHUNK_SIZE,
+                     where: str = "", params: Sequence = ()) -> Iterator[Tuple[List[int], List[str], np.ndarray]]:
+    """
+    (ids, topics, normalized float32 matrix) chunks of embedded questions, in id order.
+    With dim=None the first row sets it; ValueError if that is wider than MAX_DENSE_DIM.
+    """
+    cur = con.execute(
+        f"SELECT id, topic, embedding FROM questions WHERE embedding IS NOT NULL {where} ORDER BY id", params
+    )
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        ids, topics, vecs = [], [], []
+        for qid, topic, stored in rows:
+            try:
+                row_dim = stored_dim(stored)  # before decoding: sparse rows expand to row_dim floats
+            except ValueError:
+                continue
+            if row_dim is None:
+                continue
+            if dim is None:
+                dim = check_dense_dim(row_dim, "topic clusters")
+            if row_dim != dim:
+                continue  # embedded with a different backend
+            ids.append(qid)
+            topics.append(topic)
+            vecs.append(decode_any(stored))
+        if ids:
+            yield ids, topics, _normalize(np.stack(vecs).astype(np.float32))
+
+
+def _sample(con, dim: int, size: int, seed: int) -> np.ndarray:
+    """Up to `size` embeddings, picked uniformly at random across the bank."""
+    rng = np.random.default_rng(seed)
+    ids = [r[0] for r in con.execute("SELECT id FROM questions WHERE embedding IS NOT NULL")]
+    picked = sorted(rng.choice(ids, size=min(size, len(ids)), replace=False).tolist())
+    parts = [X for i in range(0, len(picked), 900)
+             for _, _, X in _embedded_chunks(con, dim, CHUNK_SIZE,
+                                             f"AND id IN ({','.join('?' * len(picked[i:i + 900]))})",
+                                             picked[i : i + 900])]
+    return np.vstack(parts)
+
+
+def _first_dim(con) -> Optional[int]:
+    for _, _, X in _embedded_chunks(con, None, chunk_size=1):
+        return X.shape[1]
+    return None
+
+
+def fit_clusters(con=None, k: int = DEFAULT_K, chunk_size: int = CHUNK_SIZE, epochs: int = 3,
+                 seed: int = 42, verbose: bool = True) -> dict:
+    """Fit MiniBatchKMeans over all embeddings, store centroids + summaries and every question's cluster_id."""
+    from sklearn.cluster import MiniBatchKMeans
+
+    own_con = con is None
+    if own_con:
+        con = get_connection()
+    try:
+        ensure_schema(con)
+        dim = _first_dim(con)
+        if dim is None:
+            raise ValueError("No embedded questions; run tools/compute_embeddings.py first.")
+        n = con.execute("SELECT COUNT(*) FROM questions WHERE embedding IS NOT NULL").fetchone()[0]
+        k = max(1, min(k, n))
+
+        t0 = time.perf_counter()
+        # k-means++ init on a random sample: rows in id order are grouped by generation batch,
+        # so seeding from the first chunk would put every centroid in the same few topics
+        sample = _sample(con, dim, max(INIT_SAMPLE, 3 * k), seed)
+        k = min(k, len(sample))
+        km = MiniBatchKMeans(n_clusters=k, random_state=seed, batch_size=min(chunk_size, 1024), n_init=3)
+        km.partial_fit(sample)
+        for _ in range(epochs):
+            for _, _, X in _embedded_chunks(con, dim, chunk_size):
+                km.partial_fit(X)
+        centroids = _normalize(km.cluster_centers_.astype(np.float32))
+        k = len(centroids)
+
+        # second pass: assignments + summaries (written after the scan, not while its cursor is open)
+        sizes = np.zeros(k, dtype=np.int64)
+        topic_counts: List[Counter] = [Counter() for _ in range(k)]
+        best: List[List[Tuple[float, int]]] = [[] for _ in range(k)]  # (similarity, id), closest first
+        assignments = []
+        for ids, topics, X in _embedded_chunks(con, dim, chunk_size):
+            sims = X @ centroids.T
+            labels = sims.argmax(axis=1)
+            assignments.extend(zip(labels.tolist(), ids))
+            np.add.at(sizes, labels, 1)
+            top_sim = sims[np.arange(len(ids)), labels]
+            for qid, topic, c, s in zip(ids, topics, labels, top_sim):
+                if topic:
+                    topic_counts[c][topic] += 1
+                reps = best[c]
+                if len(reps) < REPRESENTATIVES or s > reps[-1][0]:
+                    reps.append((float(s), qid))
+                    reps.sort(reverse=True)
+                    del reps[REPRESENTATIVES:]
+        fitted_at = datetime.now(timezone.utc).isoformat()
+        with con:
+            con.execute("UPDATE questions SET cluster_id = NULL")
+            con.executemany("UPDATE questions SET cluster_id = ? WHERE id = ?", assignments)
+            con.execute("DELETE FROM topic_clusters")
+            con.executemany(
+                "INSERT INTO topic_clusters (cluster_id, size, centroid, top_topics, representative_ids, label, fitted_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (c, int(sizes[c]), encode_dense(centroids[c]),
+                     json.dumps(topic_counts[c].most_common(TOP_TOPICS), ensure_ascii=False),
+                     json.dumps([qid for _, qid in best[c]]), _label(topic_counts[c]), fitted_at)
+                    for c in range(k)
+                ],
+            )
+        stats = {"questions": int(sizes.sum()), "clusters": k, "dim": dim,
+                 "seconds": round(time.perf_counter() - t0, 3)}
+        if verbose:
+            print(f"Clustered {stats['questions']} questions into {k} clusters in {stats['seconds']}s")
+        return stats
+    finally:
+        if own_con:
+            con.close()
+
+
+def _label(topics: Counter) -> Optional[str]:
+    """Most common generator topic, ignoring the catch-all ones."""
+    for topic, _ in topics.most_common():
+        if topic.strip().lower() not in ("general", "misc", "other", ""):
+            return topic
+    return None
+
+
+def load_centroids(con) -> Optional[np.ndarray]:
+    rows = con.execute("SELECT cluster_id, centroid FROM topic_clusters ORDER BY cluster_id").fetchall()
+    if not rows:
+        return None
+    return np.stack([decode(blob) for _, blob in rows])
+
+
+def assign(con=None, question_ids: Optional[Sequence[int]] = None, centroids: Optional[np.ndarray] = None) -> int:
+    """
+    Nearest-centroid cluster_id for the given questions, or for every embedded question without one.
+    Returns the number of questions assigned (0 if no clusters have been fitted yet).
+    """
+    own_con = con is None
+    if own_con:
+        con = get_connection()
+    try:
+        ensure_schema(con)
+        if centroids is None:
+            centroids = load_centroids(con)
+        if centroids is None:
+            return 0
+        assignments = []
+        added = np.zeros(len(centroids), dtype=np.int64)
+        if question_ids is not None:
+            ids = list(question_ids)
+            chunks = (ids[i : i + 900] for i in range(0, len(ids), 900))
+            selections = [(f"AND id IN ({','.join('?' * len(c))})", c) for c in chunks]
+        else:
+            selections = [("AND cluster_id IS NULL", ())]
+        for where, params in selections:
+            for ids, _, X in _embedded_chunks(con, centroids.shape[1], CHUNK_SIZE, where, params):
+                labels = (X @ centroids.T).argmax(axis=1)
+                assignments.extend(zip(labels.tolist(), ids))
+                np.add.at(added, labels, 1)
+        with con:
+            con.executemany("UPDATE questions SET cluster_id = ? WHERE id = ?", assignments)
+            con.executemany("UPDATE topic_clusters SET size = size + ? WHERE cluster_id = ?",
+                            [(int(n), c) for c, n in enumerate(added) if n])
+        return len(assignments)
+    finally:
+        if own_con:
+            con.close()
+
+
+def cluster_summaries(con=None) -> List[Dict]:
+    own_con = con is None
+    if own_con:
+        con = get_connection()
+    try:
+        ensure_schema(con)
+        rows = con.execute(
+            "SELECT cluster_id, size, top_topics, representative_ids, label, fitted_at FROM topic_clusters "
+            "ORDER BY size DESC"
+        ).fetchall()
+        return [
+            {"cluster_id": r[0], "size": r[1], "label": r[4],
+             "top_topics": [t for t, _ in json.loads(r[2] or "[]")],
+             "representative_ids": json.loads(r[3] or "[]"), "fitted_at": r[5]}
+            for r in rows
+        ]
+    finally:
+        if own_con:
+            con.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["fit", "assign"])
+    ap.add_argument("--k", type=int, default=DEFAULT_K, help="number of clusters (capped at the bank size)")
+    ap.add_argument("--epochs", type=int, default=3, help="passes of partial_fit over the bank")
+    ap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = ap.parse_args()
+    if args.command == "fit":
+        try:
+            fit_clusters(k=args.k, chunk_size=args.chunk_size, epochs=args.epochs)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        for s in cluster_summaries()[:20]:
+            print(f"cluster {s['cluster_id']:>4}  {s['size']:>7} questions  {s['label'] or '-'}  {s['top_topics'][:3]}")
+    else:
+        print(f"Assigned {assign()} questions to their nearest cluster.")
+
+
+if __name__ == "__main__":
+    main()
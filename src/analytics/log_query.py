@@ -0,0 +1,246 @@
+# src/analytics/log_query.py
+"""
+Streaming queries over the JSONL interaction / prediction logs.
+
+Reads the live log plus its rotated siblings (`log.<stamp>.<pid>.jsonl` and
+`.jsonl.gz`, see app/services/log_sink.py). Plain files are memory-mapped
+and split on newlines, and gzipped files are decompressed as a stream, so
+memory stays constant whatever the log size.
+
+Lines are checked with cheap byte tests before json.loads: a user_hash or
+session_id filter must appear verbatim in the line. Time bounds compare the
+ISO `ts` strings directly. Rotated files whose rotation stamp is before
+`since` are skipped without being opened.
+
+Aggregates are computed in one pass and merged across files, so a process
+pool can scan files in parallel:
+    records     matching records
+    by_class    predicted-class counts (batch records add their label_counts)
+    by_time     {bucket: {class: count}}, bucket = hour / day / minute prefix of ts
+    confidence  histogram of the top-class probability per single prediction
+
+Usage (see tools/query_logs.py for the CLI):
+    from src.analytics.log_query import LogFilter, log_files, query
+    agg = query(log_files(), LogFilter(since="2025-11-01", predicted="hard"), jobs=4)
+"""
+import gzip
+import json
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+ROOT = Path(__file__).resolve().parents[2]
+LOG_PATH = Path(os.getenv("LOG_PATH", ROOT / "data" / "interactions" / "log.jsonl"))
+
+CONFIDENCE_BINS = 10
+BUCKETS = {"minute": 16, "hour": 13, "day": 10}  # length of the ts prefix
+_ROTATED_STAMP = re.compile(r"\.(\d{8}T\d{6})\d*\.\d+\.jsonl(?:\.gz)?$")
+
+PathLike = Union[str, Path]
+
+
+def _ts_bound(value: Optional[str]) -> Optional[str]:
+    """'2025-11-29', '2025-11-29 10:00' or full ISO -> comparable with record ts strings."""
+    if not value:
+        return None
+    return value.strip().rstrip("Z").replace(" ", "T")
+
+
+@dataclass
+class LogFilter:
+    since: Optional[str] = None  # inclusive
+    until: Optional[str] = None  # exclusive
+    user_hash: Optional[str] = None
+    session_id: Optional[str] = None
+    predicted: Optional[str] = None
+    event: Optional[str] = None  # "prediction" for single predictions, or an `event` value
+
+    def __post_init__(self):
+        self.since, self.until = _ts_bound(self.since), _ts_bound(self.until)
+        # byte needles that must occur in a matching line (checked before parsing)
+        self._needles = [json.dumps(v, ensure_ascii=False).encode("utf8")
+                         for v in (self.user_hash, self.session_id) if v]
+
+    def line_may_match(self, line: bytes) -> bool:
+        return all(n in line for n in self._needles)
+
+    def matches(self, rec: dict) -> bool:
+        ts = rec.get("ts") or ""
+        if self.since and ts < self.since:
+            return False
+        if self.until and ts >= self.until:
+            return False
+        if self.user_hash and rec.get("user_hash") != self.user_hash:
+            return False
+        if self.session_id and rec.get("session_id") != self.session_id:
+            return False
+        if self.event and rec.get("event", "prediction") != self.event:
+            return False
+        if self.predicted:
+            if "predicted" in rec:
+                return rec["predicted"] == self.predicted
+            return self.predicted in (rec.get("label_counts") or {})
+        return True
+
+    def file_may_match(self, path: Path) -> bool:
+        """Rotated files only hold records older than their rotation stamp."""
+        if not self.since:
+            return True
+        m = _ROTATED_STAMP.search(path.name)
+        if not m:
+            return True
+        s = m.group(1)
+        stamp = f"{s[0:4]}-{s[4:6]}-{s[6:8]}T{s[9:11]}:{s[11:13]}:{s[13:15]}"
+        return stamp >= self.since[:19]
+
+
+@dataclass
+class Aggregate:
+    bucket: str = "hour"
+    records: int = 0
+    bad_lines: int = 0
+    by_class: Dict[str, int] = field(default_factory=dict)
+    by_time: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    confidence: List[int] = field(default_factory=lambda: [0] * CONFIDENCE_BINS)
+
+    def _count(self, bucket: str, label: str, n: int):
+        self.by_class[label] = self.by_class.get(label, 0) + n
+        slot = self.by_time.setdefault(bucket, {})
+        slot[label] = slot.get(label, 0) + n
+
+    def add(self, rec: dict, only_class: Optional[str] = None):
+        self.records += 1
+        bucket = (rec.get("ts") or "")[: BUCKETS[self.bucket]]
+        label = rec.get("predicted")
+        if label is not None:
+            self._count(bucket, str(label), 1)
+            probs = rec.get("probs")
+            if probs:
+                top = max(probs)
+                self.confidence[min(int(top * CONFIDENCE_BINS), CONFIDENCE_BINS - 1)] += 1
+        for label, n in (rec.get("label_counts") or {}).items():
+            if only_class is None or label == only_class:
+                self._count(bucket, label, int(n))
+
+    def merge(self, other: "Aggregate") -> "Aggregate":
+        self.records += other.records
+        self.bad_lines += other.bad_lines
+        for label, n in other.by_class.items():
+            self.by_class[label] = self.by_class.get(label, 0) + n
+        for bucket, counts in other.by_time.items():
+            slot = self.by_time.setdefault(bucket, {})
+            for label, n in counts.items():
+                slot[label] = slot.get(label, 0) + n
+        self.confidence = [a + b for a, b in zip(self.confidence, other.confidence)]
+        return self
+
+    def to_dict(self) -> dict:
+        edges = [round(i / CONFIDENCE_BINS, 2) for i in range(CONFIDENCE_BINS + 1)]
+        return {
+            "records": self.records,
+            "bad_lines": self.bad_lines,
+            "by_class": dict(sorted(self.by_class.items())),
+            "by_time": {b: dict(sorted(c.items())) for b, c in sorted(self.by_time.items())},
+            "confidence": {f"{edges[i]}-{edges[i + 1]}": n for i, n in enumerate(self.confidence)},
+        }
+
+
+def log_files(target: Optional[PathLike] = None) -> List[Path]:
+    """
+    Files to scan, oldest first. A log file path expands to itself plus its
+    rotated siblings; a directory expands to every *.jsonl / *.jsonl.gz in it.
+    """
+    target = Path(target or LOG_PATH)
+    if target.is_dir():
+        files = [p for p in target.iterdir() if p.name.endswith((".jsonl", ".jsonl.gz"))]
+    else:
+        stem, suffix = target.stem, target.suffix
+        files = [p for p in target.parent.glob(f"{stem}.*{suffix}*")
+                 if p.name.endswith((suffix, suffix + ".gz")) and p != target]
+        files = sorted(files, key=lambda p: p.name)
+        return files + ([target] if target.exists() else [])
+    return sorted(files, key=lambda p: p.name)
+
+
+def iter_lines(path: PathLike) -> Iterator[bytes]:
+    """Raw lines (without the newline) of a .jsonl or .jsonl.gz file."""
+    path = Path(path)
+    if path.suffix == ".gz":
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                yield line.rstrip(b"\r\n")
+        return
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, end = 0, len(mm)
+            while start < end:
+                nl = mm.find(b"\n", start)
+                if nl < 0:
+                    nl = end
+                yield mm[start:nl].rstrip(b"\r")
+                start = nl + 1
+
+
+def scan(paths: Iterable[PathLike], flt: Optional[LogFilter] = None) -> Iterator[dict]:
+    """Matching records from `paths`, in file order; unparsable lines are skipped."""
+    flt = flt or LogFilter()
+    for path in paths:
+        path = Path(path)
+        if not flt.file_may_match(path):
+            continue
+        for line in iter_lines(path):
+            if not line or not flt.line_may_match(line):
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(rec, dict) and flt.matches(rec):
+                yield rec
+
+
+def aggregate_file(path: PathLike, flt: Optional[LogFilter] = None, bucket: str = "hour") -> Aggregate:
+    flt = flt or LogFilter()
+    agg = Aggregate(bucket=bucket)
+    path = Path(path)
+    if not flt.file_may_match(path):
+        return agg
+    for line in iter_lines(path):
+        if not line or not flt.line_may_match(line):
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            agg.bad_lines += 1
+            continue
+        if isinstance(rec, dict) and flt.matches(rec):
+            agg.add(rec, only_class=flt.predicted)
+    return agg
+
+
+def _aggregate_task(args) -> Aggregate:
+    return aggregate_file(*args)
+
+
+def query(paths: Sequence[PathLike], flt: Optional[LogFilter] = None, bucket: str = "hour",
+          jobs: int = 1) -> Aggregate:
+    """Aggregate over all files; with jobs > 1 files are scanned in a process pool."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {sorted(BUCKETS)}")
+    flt = flt or LogFilter()
+    tasks = [(Path(p), flt, bucket) for p in paths]
+    total = Aggregate(bucket=bucket)
+    if jobs <= 1 or len(tasks) <= 1:
+        for agg in map(_aggregate_task, tasks):
+            total.merge(agg)
+        return total
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+        for agg in pool.map(_aggregate_task, tasks):
+            total.merge(agg)
+    return total
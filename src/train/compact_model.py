@@ -0,0 +1,191 @@
+# src/train/compact_model.py
+"""
+Dependency-free (NumPy only) export and scorer for the difficulty classifier.
+
+Scoring a question is a TF-IDF transform plus a dot product against coef_, so
+workers don't need sklearn or the joblib pickles at all. The export is a
+directory (models/difficulty_compact/ by default):
+
+    meta.json       classes, version, tokenizer/normalization settings
+    vocab.json      terms, in feature-index order
+    idf.npy         float64 (n_features,)
+    coef.npy        float32 (n_classes or 1, n_features)
+    intercept.npy   float32 (n_classes or 1,)
+
+The .npy arrays are opened memory-mapped, so forked workers share the pages.
+CompactVectorizer reproduces TfidfVectorizer(analyzer="word") tokenization,
+n-grams, tf-idf weighting and l1/l2 normalization; CompactClassifier
+reproduces LogisticRegression.predict_proba (binary, multinomial and OvR).
+tests/test_compact_model.py checks parity against sklearn.
+
+Written by train_difficulty.py after the joblib artifacts; loaded by the
+model registry when DIFFICULTY_MODEL_FORMAT=compact.
+"""
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+class SparseRows:
+    """Minimal CSR matrix (what CompactVectorizer.transform returns)."""
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, n_features: int):
+        self.indptr, self.indices, self.data = indptr, indices, data
+        self.shape = (len(indptr) - 1, n_features)
+
+    def dot(self, weights: np.ndarray) -> np.ndarray:
+        """self @ weights.T for weights of shape (k, n_features) -> (n_rows, k)."""
+        contrib = self.data[:, None] * weights.T[self.indices].astype(np.float64)
+        out = np.zeros((self.shape[0], weights.shape[0]))
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        np.add.at(out, rows, contrib)
+        return out
+
+
+class CompactVectorizer:
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray, meta: dict):
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+        self.lowercase = meta["lowercase"]
+        self.ngram_range = tuple(meta["ngram_range"])
+        self.norm = meta["norm"]
+        self.sublinear_tf = meta["sublinear_tf"]
+        self._token_re = re.compile(meta["token_pattern"])
+
+    def _terms(self, text: str) -> List[str]:
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token_re.findall(text)
+        min_n, max_n = self.ngram_range
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), max_n + 1):
+            terms.extend(" ".join(tokens[i : i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def transform(self, texts: Sequence[str]) -> SparseRows:
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            counts = Counter(self.vocabulary_[t] for t in self._terms(text) if t in self.vocabulary_)
+            idx = np.fromiter(sorted(counts), dtype=np.int64, count=len(counts))
+            tf = np.array([counts[i] for i in idx], dtype=np.float64)
+            if self.sublinear_tf:
+                tf = np.log(tf) + 1
+            row = tf * self.idf_[idx] if self.idf_ is not None else tf
+            if self.norm == "l2":
+                norm = np.sqrt(np.dot(row, row))
+            elif self.norm == "l1":
+                norm = np.abs(row).sum()
+            else:
+                norm = 0.0
+            if norm:
+                row = row / norm
+            indices.append(idx)
+            data.append(row)
+            indptr.append(indptr[-1] + len(idx))
+        return SparseRows(
+            np.array(indptr, dtype=np.int64),
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+            np.concatenate(data) if data else np.zeros(0),
+            len(self.vocabulary_),
+        )
+
+
+class CompactClassifier:
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray, classes: Sequence[str], multinomial: bool):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = np.array(classes)
+        self.multinomial = multinomial
+
+    def decision_function(self, X: SparseRows) -> np.ndarray:
+        return X.dot(self.coef_) + self.intercept_.astype(np.float64)
+
+    def predict_proba(self, X: SparseRows) -> np.ndarray:
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:  # binary: one score for the positive class
+            p = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1 - p, p])
+        if self.multinomial:
+            scores = scores - scores.max(axis=1, keepdims=True)
+            e = np.exp(scores)
+            return e / e.sum(axis=1, keepdims=True)
+        p = 1.0 / (1.0 + np.exp(-scores))  # one-vs-rest, normalized like sklearn
+        return p / p.sum(axis=1, keepdims=True)
+
+    def predict(self, X: SparseRows) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def _is_multinomial(model) -> bool:
+    multi_class = getattr(model, "multi_class", "auto")
+    if multi_class == "ovr":
+        return False
+    # "auto"/"deprecated": multinomial unless liblinear (which only does OvR)
+    return multi_class == "multinomial" or getattr(model, "solver", "lbfgs") != "liblinear"
+
+
+def _save_npy(path: Path, arr: np.ndarray):
+    tmp = path.with_name(path.name + ".tmp.npy")
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+def _save_json(path: Path, obj):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False))
+    os.replace(tmp, path)
+
+
+def export_compact(vectorizer, model, out_dir: Path, version: str = "unknown") -> Path:
+    """Write the compact format for a fitted word TfidfVectorizer + LogisticRegression pair."""
+    if getattr(vectorizer, "analyzer", "word") != "word" or vectorizer.stop_words or vectorizer.strip_accents:
+        raise ValueError("Compact export supports word analyzers without stop words or accent stripping.")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, i in vectorizer.vocabulary_.items():
+        terms[i] = term
+    idf = np.asarray(vectorizer.idf_, dtype=np.float64) if vectorizer.use_idf else np.ones(len(terms))
+    _save_json(out_dir / "vocab.json", terms)
+    _save_npy(out_dir / "idf.npy", idf)
+    _save_npy(out_dir / "coef.npy", np.asarray(model.coef_, dtype=np.float32))
+    _save_npy(out_dir / "intercept.npy", np.asarray(model.intercept_, dtype=np.float32))
+    # meta last: a directory with meta.json is complete
+    _save_json(out_dir / "meta.json", {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "classes": [str(c) for c in model.classes_],
+        "multinomial": _is_multinomial(model),
+        "lowercase": bool(vectorizer.lowercase),
+        "token_pattern": vectorizer.token_pattern,
+        "ngram_range": list(vectorizer.ngram_range),
+        "norm": vectorizer.norm,
+        "sublinear_tf": bool(vectorizer.sublinear_tf),
+    })
+    return out_dir
+
+
+def load_compact(model_dir: Path):
+    """(CompactVectorizer, CompactClassifier, meta) from an export directory; arrays are memory-mapped."""
+    model_dir = Path(model_dir)
+    meta = json.loads((model_dir / "meta.json").read_text())
+    if meta.get("format") != FORMAT_VERSION:
+        raise RuntimeError(f"Unsupported compact model format {meta.get('format')!r} in {model_dir}")
+    terms = json.loads((model_dir / "vocab.json").read_text())
+    vectorizer = CompactVectorizer(
+        {t: i for i, t in enumerate(terms)}, np.load(model_dir / "idf.npy", mmap_mode="r"), meta
+    )
+    classifier = CompactClassifier(
+        np.load(model_dir / "coef.npy", mmap_mode="r"),
+        np.load(model_dir / "intercept.npy", mmap_mode="r"),
+        meta["classes"],
+        meta["multinomial"],
+    )
+    return vectorizer, classifier, meta
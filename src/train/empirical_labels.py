@@ -0,0 +1,177 @@
+# src/train/empirical_labels.py
+"""
+Empirical difficulty labels from answer history.
+
+1. update_stats(): fold interactions added to `history` since the last run
+   into per-question totals (`question_stats`) with one INSERT ... SELECT
+   ... GROUP BY upsert. A watermark (last history.id processed, in
+   `label_watermarks`) makes every run incremental, so a nightly job only
+   touches the new rows.
+2. empirical_labels(): turn totals into easy / medium / hard with NumPy.
+   Questions with fewer than `min_attempts` answers are skipped, and a label
+   is only assigned when the Wilson confidence interval of the correctness
+   rate lies entirely in that band:
+       easy    lower bound >= easy_min      (most people get it right)
+       hard    upper bound <= hard_max      (most people get it wrong)
+       medium  interval within [hard_max, easy_min]
+   Ambiguous questions get no label rather than a noisy one.
+
+train_difficulty.py merges these labels into its training data (they win
+over CSV labels for the same question). Export for the streaming trainer with:
+    python src/train/empirical_labels.py --out data/labeled/empirical.jsonl
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT))  # allow `python src/train/empirical_labels.py`
+
+from src.adaptive.engine import get_connection
+
+MIN_ATTEMPTS = 20
+EASY_MIN = 0.75
+HARD_MAX = 0.40
+Z = 1.96  # 95% Wilson interval
+WATERMARK = "history"
+
+
+def ensure_tables(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS question_stats (
+            question_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS label_watermarks (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    """)
+
+
+def update_stats(con=None) -> dict:
+    """Aggregate history rows newer than the watermark. Returns {"from_id", "to_id", "questions"}."""
+    own_con = con is None
+    if own_con:
+        con = get_connection()
+    try:
+        ensure_tables(con)
+        row = con.execute("SELECT last_id FROM label_watermarks WHERE name = ?", (WATERMARK,)).fetchone()
+        last_id = row[0] if row else 0
+        # fixed upper bound: rows inserted while we run are picked up next time, never twice
+        max_id = con.execute("SELECT COALESCE(MAX(id), 0) FROM history").fetchone()[0]
+        if max_id <= last_id:
+            return {"from_id": last_id, "to_id": last_id, "questions": 0}
+        cur = con.execute(
+            """
+            INSERT INTO question_stats (question_id, attempts, correct, updated_at)
+            SELECT question_id, COUNT(*), SUM(CASE WHEN is_correct THEN 1 ELSE 0 END), datetime('now')
+            FROM history
+            WHERE id > ? AND id <= ? AND question_id IS NOT NULL AND is_correct IS NOT NULL
+            GROUP BY question_id
+            ON CONFLICT(question_id) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                correct = correct + excluded.correct,
+                updated_at = excluded.updated_at
+            """,
+            (last_id, max_id),
+        )
+        touched = cur.rowcount
+        con.execute(
+            "INSERT INTO label_watermarks (name, last_id) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id",
+            (WATERMARK, max_id),
+        )
+        con.commit()
+        return {"from_id": last_id, "to_id": max_id, "questions": touched}
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        if own_con:
+            con.close()
+
+
+def wilson_interval(correct: np.ndarray, attempts: np.ndarray, z: float = Z):
+    n = attempts.astype(np.float64)
+    p = correct / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return center - half, center + half
+
+
+def label_rates(correct: np.ndarray, attempts: np.ndarray, easy_min: float = EASY_MIN,
+                hard_max: float = HARD_MAX, z: float = Z) -> np.ndarray:
+    """Label per question ("easy"/"medium"/"hard", or "" when the interval straddles a threshold)."""
+    lo, hi = wilson_interval(correct, attempts, z)
+    labels = np.full(len(attempts), "", dtype=object)
+    labels[(lo >= hard_max) & (hi <= easy_min)] = "medium"
+    labels[lo >= easy_min] = "easy"
+    labels[hi <= hard_max] = "hard"
+    return labels
+
+
+def empirical_labels(con=None, min_attempts: int = MIN_ATTEMPTS, easy_min: float = EASY_MIN,
+                     hard_max: float = HARD_MAX, z: float = Z, update: bool = True) -> List[dict]:
+    """Confidently labeled questions: [{"question_id", "question", "difficulty", "attempts", "rate"}, ...]."""
+    own_con = con is None
+    if own_con:
+        con = get_connection()
+    try:
+        if update:
+            update_stats(con)
+        else:
+            ensure_tables(con)
+        rows = con.execute(
+            "SELECT s.question_id, q.question, s.attempts, s.correct FROM question_stats s "
+            "JOIN questions q ON q.id = s.question_id WHERE s.attempts >= ? AND q.question IS NOT NULL",
+            (min_attempts,),
+        ).fetchall()
+    finally:
+        if own_con:
+            con.close()
+    if not rows:
+        return []
+    attempts = np.array([r[2] for r in rows], dtype=np.int64)
+    correct = np.array([r[3] for r in rows], dtype=np.int64)
+    labels = label_rates(correct, attempts, easy_min, hard_max, z)
+    return [
+        {"question_id": r[0], "question": r[1], "difficulty": lbl, "attempts": int(n), "rate": round(float(c) / n, 4)}
+        for r, lbl, n, c in zip(rows, labels, attempts, correct)
+        if lbl
+    ]
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", help="write labeled questions as JSONL (question, difficulty, ...)")
+    ap.add_argument("--min-attempts", type=int, default=MIN_ATTEMPTS)
+    ap.add_argument("--easy-min", type=float, default=EASY_MIN)
+    ap.add_argument("--hard-max", type=float, default=HARD_MAX)
+    args = ap.parse_args(argv)
+
+    stats = update_stats()
+    print(f"Aggregated history ids {stats['from_id'] + 1}..{stats['to_id']} into {stats['questions']} questions.")
+    labeled = empirical_labels(min_attempts=args.min_attempts, easy_min=args.easy_min,
+                               hard_max=args.hard_max, update=False)
+    counts = {k: sum(1 for x in labeled if x["difficulty"] == k) for k in ("easy", "medium", "hard")}
+    print(f"Confident labels: {len(labeled)} {counts}")
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf8") as f:
+            for item in labeled:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        print("Wrote", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# src/train/model_registry.py
+"""
+Process-wide registry for the difficulty classifier artifacts.
+
+Every consumer (app DifficultyService, src.train.predict_difficulty, the
+extractive MCQ generator's IDF weights) reads the TF-IDF vectorizer and the
+LogisticRegression model through `difficulty_registry.current()`, so each
+artifact is loaded once per process.
+
+Hot reload: train_difficulty.py writes both artifacts atomically and then a
+version file (difficulty_model.version). current() checks, at most every
+MODEL_RELOAD_INTERVAL seconds, whether the version file (or, without one, the
+artifacts' mtimes) changed and, if so, loads the new pair and swaps it in
+with a single reference assignment. Predictions already running keep using
+the bundle they fetched; if the new files can't be loaded the old bundle stays
+in service.
+
+DIFFICULTY_MODEL_FORMAT=compact serves the NumPy-only export from
+src/train/compact_model.py instead of the pickles (same bundle interface),
+so the prediction path never imports sklearn. A model without a current
+export (train_streaming.py's hashed-feature models, whose version file doesn't
+match meta.json) is served from the joblib pair instead.
+
+Usage:
+    from src.train.model_registry import difficulty_registry
+    m = difficulty_registry.current()
+    probs = m.model.predict_proba(m.vectorizer.transform(texts))
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parents[2]
+MODEL_DIR = Path(os.getenv("MODEL_DIR", ROOT / "models"))
+VEC_PATH = MODEL_DIR / "tfidf_vectorizer.joblib"
+MODEL_PATH = MODEL_DIR / "difficulty_model.joblib"
+VERSION_PATH = MODEL_DIR / "difficulty_model.version"
+COMPACT_DIR = MODEL_DIR / "difficulty_compact"
+
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "5"))
+# "joblib": sklearn pickles; "compact": NumPy-only export (src/train/compact_model.py), no sklearn import
+DIFFICULTY_MODEL_FORMAT = os.getenv("DIFFICULTY_MODEL_FORMAT", "joblib")
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    vectorizer: Any
+    model: Any
+    classes: Tuple[str, ...]
+    version: str
+    loaded_at: str  # ISO timestamp (UTC)
+
+
+def new_version() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+
+
+def write_version_file(path: Path = VERSION_PATH, version: Optional[str] = None) -> str:
+    """Record a new artifact version (atomically). Called by the trainers after saving the artifacts."""
+    version = version or new_version()
+    tmp = path.with_suffix(".version.tmp")
+    tmp.write_text(json.dumps({"version": version, "written_at": datetime.now(timezone.utc).isoformat()}))
+    os.replace(tmp, path)
+    return version
+
+
+def atomic_dump(obj, path: Path):
+    """joblib.dump to a temp file and rename, so readers never see a half-written artifact."""
+    tmp = path.with_name(path.name + ".tmp")
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, vec_path: Path = VEC_PATH, model_path: Path = MODEL_PATH, version_path: Path = VERSION_PATH,
+                 reload_interval: float = MODEL_RELOAD_INTERVAL, model_format: str = DIFFICULTY_MODEL_FORMAT,
+                 compact_dir: Path = COMPACT_DIR):
+        if model_format not in ("joblib", "compact"):
+            raise ValueError("model_format must be 'joblib' or 'compact'")
+        self.vec_path = Path(vec_path)
+        self.model_path = Path(model_path)
+        self.version_path = Path(version_path)
+        self.model_format = model_format
+        self.compact_dir = Path(compact_dir)
+        self.reload_interval = reload_interval
+        self._bundle: Optional[ModelBundle] = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._load_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _current_signature(self):
+        """What identifies the artifacts on disk: the version file if present, else the artifacts' mtimes."""
+        try:
+            return ("version", self.version_path.read_text())
+        except FileNotFoundError:
+            pass
+        try:
+            if self.model_format == "compact" and (self.compact_dir / "meta.json").exists():
+                return ("mtime", (self.compact_dir / "meta.json").stat().st_mtime_ns)
+            return ("mtime", self.vec_path.stat().st_mtime_ns, self.model_path.stat().st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def _load_compact(self, signature) -> Optional[ModelBundle]:
+        """The compact export, or None if there is none for the current version."""
+        from src.train.compact_model import load_compact
+
+        if not (self.compact_dir / "meta.json").exists():
+            return None
+        vectorizer, model, meta = load_compact(self.compact_dir)
+        if signature and signature[0] == "version" and json.loads(signature[1]).get("version") != meta["version"]:
+            return None  # stale export of an older model
+        return ModelBundle(vectorizer, model, tuple(meta["classes"]), meta["version"],
+                           datetime.now(timezone.utc).isoformat())
+
+    def _load(self, signature) -> ModelBundle:
+        if self.model_format == "compact":
+            bundle = self._load_compact(signature)
+            if bundle is not None:
+                return bundle
+            logger.warning("No compact export for the current difficulty model; serving the joblib artifacts.")
+        if not self.vec_path.exists() or not self.model_path.exists():
+            raise FileNotFoundError(
+                f"Model artifacts not found. Expected files:\n - {self.vec_path}\n - {self.model_path}"
+            )
+        vectorizer = joblib.load(self.vec_path)
+        model = joblib.load(self.model_path)
+        if not hasattr(model, "classes_") or not hasattr(model, "predict_proba"):
+            raise RuntimeError("Loaded model does not expose required attributes: classes_ and predict_proba()")
+        if signature and signature[0] == "version":
+            version = json.loads(signature[1]).get("version", "unknown")
+        else:
+            version = "mtime-%d" % int(self.model_path.stat().st_mtime)
+        return ModelBundle(
+            vectorizer=vectorizer,
+            model=model,
+            classes=tuple(str(c) for c in model.classes_),
+            version=version,
+            loaded_at=datetime.now(timezone.utc).isoformat(),
+        )
+
+    def current(self) -> ModelBundle:
+        """The loaded bundle, reloading first if the artifacts changed. Raises if nothing can be loaded."""
+        bundle = self._bundle
+        if bundle is not None and time.monotonic() - self._checked_at < self.reload_interval:
+            return bundle
+        with self._lock:
+            if self._bundle is not None and time.monotonic() - self._checked_at < self.reload_interval:
+                return self._bundle
+            self._checked_at = time.monotonic()
+            signature = self._current_signature()
+            if self._bundle is not None and signature == self._signature:
+                return self._bundle
+            try:
+                new = self._load(signature)
+            except Exception as e:
+                self._load_error = str(e)
+                if self._bundle is None:
+                    raise
+                logger.warning("Keeping difficulty model %s; reload failed: %s", self._bundle.version, e)
+                return self._bundle
+            if self._bundle is not None:
+                logger.info("Difficulty model reloaded: %s -> %s", self._bundle.version, new.version)
+            self._bundle, self._signature, self._load_error = new, signature, None
+            return new
+
+    def state(self) -> dict:
+        """Loaded version and load time for the health endpoint (does not trigger a load)."""
+        bundle = self._bundle
+        return {
+            "format": self.model_format,
+            "version": bundle.version if bundle else None,
+            "loaded_at": bundle.loaded_at if bundle else None,
+            "classes": list(bundle.classes) if bundle else None,
+            "last_error": self._load_error,
+        }
+
+
+difficulty_registry = ModelRegistry()
@@ -9,45 +9,11 @@ Usage:
     from src.train.predict_difficulty import predict_difficulty
     label, (classes, probs) = predict_difficulty("What is 2+2?")
 """
-from pathlib import Path
-from typing import List, Tuple
-import joblib
-import numpy as np
+from typing import List, Sequence, Tuple
 
-ROOT = Path(__file__).resolve().parents[2]
-MODEL_DIR = ROOT / "models"
-VEC_PATH = MODEL_DIR / "tfidf_vectorizer.joblib"
-MODEL_PATH = MODEL_DIR / "difficulty_model.joblib"
-
-# internal cache
-_vectorizer = None
-_model = None
-_classes: List[str] | None = None
-
-
-def _load_artifacts() -> None:
-    """
-    Lazy-load vectorizer and model into module-level vars.
-    Raises FileNotFoundError or RuntimeError on problems.
-    """
-    global _vectorizer, _model, _classes
-
-    if _vectorizer is not None and _model is not None and _classes is not None:
-        return
-
-    if not VEC_PATH.exists() or not MODEL_PATH.exists():
-        raise FileNotFoundError(
-            f"Model artifacts not found. Expected files:\n - {VEC_PATH}\n - {MODEL_PATH}"
-        )
-
-    _vectorizer = joblib.load(VEC_PATH)
-    _model = joblib.load(MODEL_PATH)
-
-    # Validate model
-    if not hasattr(_model, "classes_") or not hasattr(_model, "predict_proba"):
-        raise RuntimeError("Loaded model does not expose required attributes: classes_ and predict_proba()")
-
-    _classes = list(_model.classes_)
+# artifacts are loaded (and hot-reloaded) once per process by the shared registry
+from src.train.model_registry import MODEL_DIR, MODEL_PATH, VEC_PATH  # noqa: F401 (paths re-exported)
+from src.train.prediction_cache import predict_with_cache
 
 
 def predict_difficulty(text: str) -> Tuple[str, Tuple[List[str], List[float]]]:
@@ -64,21 +30,28 @@ def predict_difficulty(text: str) -> Tuple[str, Tuple[List[str], List[float]]]:
     if not isinstance(text, str):
         raise ValueError("Input text must be a string.")
 
-    _load_artifacts()
+    # cached per (model version, normalized text); fresh lists so callers can't mutate the cache
+    (p,) = predict_with_cache([text])
+    return p.label, (list(p.classes), list(p.probs))
 
-    # type: ignore — mypy-unfriendly globals, but runtime-safe after _load_artifacts
-    X = _vectorizer.transform([text])
-    probs = _model.predict_proba(X)[0]  # shape (n_classes,)
 
-    # Ensure ordering matches classes
-    classes = list(_classes)  # snapshot
-    probs_list = [float(x) for x in probs]
+def predict_difficulty_batch(texts: Sequence[str]) -> List[Tuple[str, Tuple[List[str], List[float]]]]:
+    """
+    Vectorized variant of predict_difficulty: one transform() and one
+    predict_proba() call for the texts not already in the prediction cache.
+    Results are in input order.
 
-    # pick label with highest probability
-    max_idx = int(np.argmax(probs))
-    label = classes[max_idx]
+    Example:
+      for label, (classes, probs) in predict_difficulty_batch(["What is 2+2?", "Prove P != NP."]):
+          ...
+    """
+    texts = list(texts)
+    if not all(isinstance(t, str) for t in texts):
+        raise ValueError("All input texts must be strings.")
+    if not texts:
+        return []
 
-    return label, (classes, probs_list)
+    return [(p.label, (list(p.classes), list(p.probs))) for p in predict_with_cache(texts)]
 
 
 if __name__ == "__main__":
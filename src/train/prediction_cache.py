@@ -0,0 +1,111 @@
+# src/train/prediction_cache.py
+"""
+LRU cache of difficulty predictions, shared by predict_difficulty(_batch) and
+the app's DifficultyService.
+
+Keys are (model version, BLAKE2b of the normalized text), so a hot reload in
+the model registry makes old entries unreachable without an explicit flush;
+they simply age out of the LRU. Normalization only removes differences the
+vectorizer ignores anyway (whitespace, and case when it lowercases), so a
+cached answer is exactly what the model would return.
+
+Entries are immutable Prediction tuples; callers get fresh lists/dicts built
+from them and cannot corrupt the cache. Hit/miss counts are in stats() and on
+GET /metrics.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.train.model_registry import ModelBundle, difficulty_registry
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))
+
+
+class Prediction(NamedTuple):
+    label: str
+    classes: Tuple[str, ...]
+    probs: Tuple[float, ...]
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = PREDICTION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[tuple, Prediction]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Prediction]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: Prediction):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+            }
+
+
+prediction_cache = PredictionCache()
+
+
+def cache_key(text: str, bundle: ModelBundle) -> tuple:
+    normalized = " ".join(text.split())
+    if getattr(bundle.vectorizer, "lowercase", False):
+        normalized = normalized.lower()
+    return bundle.version, hashlib.blake2b(normalized.encode("utf8"), digest_size=16).digest()
+
+
+def predict_with_cache(texts: Sequence[str], bundle: Optional[ModelBundle] = None,
+                       cache: PredictionCache = prediction_cache) -> List[Prediction]:
+    """
+    Predictions for `texts` in input order. Cache misses (deduplicated) are scored
+    with one transform + one predict_proba call and then cached.
+    """
+    bundle = bundle or difficulty_registry.current()
+    keys = [cache_key(t, bundle) for t in texts]
+    out: List[Optional[Prediction]] = [cache.get(k) for k in keys]
+
+    missing = {}  # key -> first text with that key
+    for k, t, p in zip(keys, texts, out):
+        if p is None:
+            missing.setdefault(k, t)
+    if missing:
+        probs = bundle.model.predict_proba(bundle.vectorizer.transform(list(missing.values())))
+        best = np.argmax(probs, axis=1)
+        fresh = {}
+        for k, i, row in zip(missing, best, probs):
+            fresh[k] = Prediction(bundle.classes[int(i)], bundle.classes, tuple(float(x) for x in row))
+            cache.put(k, fresh[k])
+        out = [p if p is not None else fresh[k] for k, p in zip(keys, out)]
+    return out
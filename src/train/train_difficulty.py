@@ -7,13 +7,18 @@ Usage:
 
 If data/data/labeled/questions_small.csv exists with columns (question,difficulty)
 it will be used; otherwise a synthetic dataset is created (toy).
-Saves:
+Empirical labels derived from answer history (see empirical_labels.py) are
+merged in and override the CSV label for the same question; they replace the
+toy set entirely. Set USE_EMPIRICAL_LABELS=0 to train on the CSV only.
+Saves (atomically, then bumps the version file so running servers hot-reload):
     models/tfidf_vectorizer.joblib
     models/difficulty_model.joblib
+    models/difficulty_compact/      (NumPy-only export, see compact_model.py)
+    models/difficulty_model.version
 """
 import os
+import sys
 from pathlib import Path
-import joblib
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
@@ -21,9 +26,18 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 
 ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT))  # allow `python src/train/train_difficulty.py`
+
+from src.train.compact_model import export_compact
+from src.train.empirical_labels import MIN_ATTEMPTS, empirical_labels
+from src.train.model_registry import (
+    COMPACT_DIR, MODEL_DIR, MODEL_PATH, VEC_PATH, atomic_dump, new_version, write_version_file,
+)
+
 DATA_DIR = ROOT / "data" / "labeled"
 DATA_PATH = DATA_DIR / "questions_small.csv"
-MODEL_DIR = ROOT / "models"
+USE_EMPIRICAL_LABELS = os.getenv("USE_EMPIRICAL_LABELS", "1") == "1"
+EMPIRICAL_MIN_ATTEMPTS = int(os.getenv("EMPIRICAL_MIN_ATTEMPTS", str(MIN_ATTEMPTS)))
 
 
 def make_toy_dataset():
@@ -35,7 +49,9 @@ def make_toy_dataset():
     d = ["easy"] * 100 + ["medium"] * 100 + ["hard"] * 100
 
     df = pd.DataFrame({"question": q, "difficulty": d})
-    return df.sample(frac=1, random_state=42).reset_index(drop=True)
+    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+    df.attrs["synthetic"] = True
+    return df
 
 
 def load_data():
@@ -58,8 +74,32 @@ def load_data():
         return make_toy_dataset()
 
 
+def add_empirical_labels(df):
+    """Merge history-derived labels into df (they win on duplicate questions; they replace the toy set)."""
+    try:
+        labeled = empirical_labels(min_attempts=EMPIRICAL_MIN_ATTEMPTS)
+    except Exception as e:
+        print("Empirical labels unavailable:", e)
+        return df
+    if not labeled:
+        print("No empirical labels yet (not enough answer history).")
+        return df
+    emp = pd.DataFrame([{"question": x["question"], "difficulty": x["difficulty"]} for x in labeled])
+    print(f"Empirical labels from history: {len(emp)} questions "
+          f"{emp['difficulty'].value_counts().to_dict()}")
+    if df.attrs.get("synthetic"):
+        if emp["difficulty"].value_counts().min() < 2 or emp["difficulty"].nunique() < 2:
+            print("Too few empirical labels per class to replace the synthetic dataset; ignoring them.")
+            return df
+        return emp
+    merged = pd.concat([df[["question", "difficulty"]], emp], ignore_index=True)
+    return merged.drop_duplicates(subset="question", keep="last").reset_index(drop=True)
+
+
 def train():
     df = load_data()
+    if USE_EMPIRICAL_LABELS:
+        df = add_empirical_labels(df)
     MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
     X = df["question"].astype(str)
@@ -83,12 +123,18 @@ def train():
     print(classification_report(y_test, preds))
 
     print("Saving vectorizer...")
-    joblib.dump(vectorizer, MODEL_DIR / "tfidf_vectorizer.joblib")
+    atomic_dump(vectorizer, VEC_PATH)
 
     print("Saving model...")
-    joblib.dump(model, MODEL_DIR / "difficulty_model.joblib")
+    atomic_dump(model, MODEL_PATH)
+
+    version = new_version()
+    print("Exporting compact (NumPy-only) model...")
+    export_compact(vectorizer, model, COMPACT_DIR, version=version)
 
-    print("DONE — Models saved to", MODEL_DIR)
+    # written last: servers only swap once all artifacts are complete
+    write_version_file(version=version)
+    print("DONE — Models saved to", MODEL_DIR, "version", version)
 
 
 if __name__ == "__main__":
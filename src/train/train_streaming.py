@@ -0,0 +1,236 @@
+# src/train/train_streaming.py
+"""
+Out-of-core difficulty training for corpora that don't fit in memory.
+
+Instead of pandas + an in-memory TfidfVectorizer + LogisticRegression, rows are
+streamed in chunks from CSV, JSONL or SQLite, featurized with a stateless
+HashingVectorizer (word 1-2 grams, l2-normalized, no vocabulary to fit) and fed
+to SGDClassifier(loss="log_loss").partial_fit. Memory is bounded by
+--chunk-size (rows held at once) and --n-features (coef is
+n_classes x n_features float64).
+
+- checkpoints (model + position) every --checkpoint-every chunks; --resume
+  continues from the last one after a crash
+- --cv K runs K cross-validation folds in parallel processes (--jobs); rows
+  are assigned to folds by a hash of the question, so every pass over the
+  stream agrees on the split without holding it in memory
+- the final model is written to the same artifact paths the predictor loads
+  (models/tfidf_vectorizer.joblib, models/difficulty_model.joblib) and the
+  version file is bumped, so running servers hot-reload it
+
+Usage:
+    python src/train/train_streaming.py data/labeled/questions.csv
+    python src/train/train_streaming.py questions.jsonl --epochs 3 --chunk-size 20000
+    python src/train/train_streaming.py data/adaptive.db --sql "SELECT question, difficulty FROM questions"
+    python src/train/train_streaming.py questions.csv --cv 5 --jobs 5
+"""
+import argparse
+import csv
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT))  # allow `python src/train/train_streaming.py`
+
+from src.train.model_registry import (
+    COMPACT_DIR, MODEL_DIR, MODEL_PATH, VEC_PATH, VERSION_PATH, atomic_dump, write_version_file,
+)
+
+CHECKPOINT_PATH = MODEL_DIR / "streaming_checkpoint.joblib"
+DEFAULT_CLASSES = ("easy", "medium", "hard")
+DEFAULT_SQL = "SELECT question, difficulty FROM questions WHERE question IS NOT NULL AND difficulty IS NOT NULL"
+
+Chunk = Tuple[List[str], List[str]]
+
+
+def make_vectorizer(n_features: int = 2**20) -> HashingVectorizer:
+    return HashingVectorizer(n_features=n_features, ngram_range=(1, 2), alternate_sign=False, norm="l2")
+
+
+def _rows(source: str, sql: Optional[str]) -> Iterator[Tuple[str, str]]:
+    path = Path(source)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with open(path, newline="", encoding="utf8") as f:
+            for row in csv.DictReader(f):
+                yield row.get("question") or "", row.get("difficulty") or ""
+    elif suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield item.get("question") or "", item.get("difficulty") or ""
+    elif suffix in (".db", ".sqlite", ".sqlite3"):
+        con = sqlite3.connect(path)
+        try:
+            cur = con.execute(sql or DEFAULT_SQL)
+            while True:
+                batch = cur.fetchmany(5000)
+                if not batch:
+                    break
+                for question, label in batch:
+                    yield question or "", label or ""
+        finally:
+            con.close()
+    else:
+        raise ValueError(f"Unsupported input {source!r}: expected .csv, .jsonl or a SQLite .db")
+
+
+def fold_of(text: str, k: int) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf8"), digest_size=8).digest(), "little") % k
+
+
+def iter_chunks(source: str, chunk_size: int, classes: Sequence[str], sql: Optional[str] = None,
+                k: Optional[int] = None, folds: Optional[set] = None) -> Iterator[Chunk]:
+    """(questions, labels) chunks of at most chunk_size valid rows; optionally only rows in `folds`."""
+    wanted = set(classes)
+    texts, labels = [], []
+    for question, label in _rows(source, sql):
+        question, label = question.strip(), label.strip().lower()
+        if not question or label not in wanted:
+            continue
+        if folds is not None and fold_of(question, k) not in folds:
+            continue
+        texts.append(question)
+        labels.append(label)
+        if len(texts) >= chunk_size:
+            yield texts, labels
+            texts, labels = [], []
+    if texts:
+        yield texts, labels
+
+
+def train_stream(source: str, classes: Sequence[str] = DEFAULT_CLASSES, n_features: int = 2**20,
+                 chunk_size: int = 10000, epochs: int = 1, sql: Optional[str] = None,
+                 checkpoint: Optional[Path] = None, checkpoint_every: int = 10, resume: bool = False,
+                 k: Optional[int] = None, folds: Optional[set] = None, seed: int = 42,
+                 verbose: bool = True) -> SGDClassifier:
+    vectorizer = make_vectorizer(n_features)
+    config = {"source": str(source), "classes": list(classes), "n_features": n_features,
+              "chunk_size": chunk_size, "sql": sql, "k": k, "folds": sorted(folds) if folds else None}
+    clf = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=seed)
+    start_epoch, skip_chunks, rows = 0, 0, 0
+
+    if resume and checkpoint and Path(checkpoint).exists():
+        state = joblib.load(checkpoint)
+        if state["config"] != config:
+            raise ValueError("Checkpoint was written for different inputs/settings; remove it or drop --resume.")
+        clf, start_epoch, skip_chunks, rows = state["model"], state["epoch"], state["chunk"], state["rows"]
+        if verbose:
+            print(f"Resuming at epoch {start_epoch + 1}, chunk {skip_chunks + 1} ({rows} rows seen)")
+
+    t0 = time.perf_counter()
+    for epoch in range(start_epoch, epochs):
+        for i, (texts, labels) in enumerate(iter_chunks(source, chunk_size, classes, sql, k, folds)):
+            if epoch == start_epoch and i < skip_chunks:
+                continue
+            # SGD converges better on shuffled rows; seeded per chunk so a resumed run matches
+            order = np.random.default_rng([seed, epoch, i]).permutation(len(texts))
+            X = vectorizer.transform([texts[j] for j in order])
+            clf.partial_fit(X, [labels[j] for j in order], classes=list(classes))
+            rows += len(texts)
+            if checkpoint and (i + 1) % checkpoint_every == 0:
+                atomic_dump({"config": config, "model": clf, "epoch": epoch, "chunk": i + 1, "rows": rows}, Path(checkpoint))
+            if verbose:
+                print(f"epoch {epoch + 1} chunk {i + 1}: {rows} rows, {rows / (time.perf_counter() - t0):.0f} rows/s")
+        skip_chunks = 0
+        if checkpoint:
+            atomic_dump({"config": config, "model": clf, "epoch": epoch + 1, "chunk": 0, "rows": rows}, Path(checkpoint))
+    if not hasattr(clf, "classes_"):
+        raise ValueError(f"No usable rows in {source} (need question + difficulty in {list(classes)}).")
+    return clf
+
+
+def evaluate_stream(clf: SGDClassifier, source: str, n_features: int, chunk_size: int,
+                    classes: Sequence[str], sql: Optional[str] = None, k: Optional[int] = None,
+                    folds: Optional[set] = None) -> dict:
+    vectorizer = make_vectorizer(n_features)
+    index = {c: i for i, c in enumerate(classes)}
+    confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    for texts, labels in iter_chunks(source, chunk_size, classes, sql, k, folds):
+        for truth, pred in zip(labels, clf.predict(vectorizer.transform(texts))):
+            confusion[index[truth], index[pred]] += 1
+    n = int(confusion.sum())
+    tp = np.diag(confusion)
+    precision = tp / np.maximum(confusion.sum(axis=0), 1)
+    recall = tp / np.maximum(confusion.sum(axis=1), 1)
+    f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-12)
+    return {"rows": n, "accuracy": float(tp.sum() / n) if n else None, "macro_f1": float(f1.mean()) if n else None}
+
+
+def _run_fold(args) -> dict:
+    fold, source, k, kwargs = args
+    train_folds = set(range(k)) - {fold}
+    clf = train_stream(source, k=k, folds=train_folds, verbose=False, **kwargs)
+    metrics = evaluate_stream(clf, source, kwargs["n_features"], kwargs["chunk_size"], kwargs["classes"],
+                              kwargs.get("sql"), k, {fold})
+    return {"fold": fold, **metrics}
+
+
+def cross_validate(source: str, k: int = 5, jobs: int = 1, **kwargs) -> List[dict]:
+    """K hash-assigned folds, trained and scored in up to `jobs` processes."""
+    tasks = [(fold, source, k, kwargs) for fold in range(k)]
+    if jobs <= 1:
+        return [_run_fold(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_run_fold, tasks))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("source", help=".csv / .jsonl with question,difficulty, or a SQLite .db")
+    ap.add_argument("--sql", help="query returning (question, difficulty) rows for SQLite input")
+    ap.add_argument("--classes", default=",".join(DEFAULT_CLASSES))
+    ap.add_argument("--chunk-size", type=int, default=10000, help="rows held in memory at once")
+    ap.add_argument("--n-features", type=int, default=2**20, help="hashed feature space size")
+    ap.add_argument("--epochs", type=int, default=1)
+    ap.add_argument("--checkpoint", default=str(CHECKPOINT_PATH))
+    ap.add_argument("--checkpoint-every", type=int, default=10, help="chunks between checkpoints")
+    ap.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    ap.add_argument("--cv", type=int, default=0, help="run K-fold cross-validation instead of training")
+    ap.add_argument("--jobs", type=int, default=1, help="parallel processes for --cv")
+    args = ap.parse_args()
+
+    classes = [c.strip() for c in args.classes.split(",") if c.strip()]
+    common = dict(classes=classes, n_features=args.n_features, chunk_size=args.chunk_size,
+                  epochs=args.epochs, sql=args.sql)
+
+    if args.cv:
+        results = cross_validate(args.source, k=args.cv, jobs=args.jobs, **common)
+        for r in results:
+            print(f"fold {r['fold']}: {r['rows']} rows, accuracy {r['accuracy']:.3f}, macro-F1 {r['macro_f1']:.3f}")
+        scored = [r for r in results if r["rows"]]
+        print(f"mean accuracy {np.mean([r['accuracy'] for r in scored]):.3f}, "
+              f"mean macro-F1 {np.mean([r['macro_f1'] for r in scored]):.3f}")
+        return
+
+    clf = train_stream(args.source, checkpoint=Path(args.checkpoint), checkpoint_every=args.checkpoint_every,
+                       resume=args.resume, **common)
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    atomic_dump(make_vectorizer(args.n_features), VEC_PATH)
+    atomic_dump(clf, MODEL_PATH)
+    # hashed features have no vocabulary, so there is no compact export for this model. The new
+    # version no longer matches the old export's meta.json, so DIFFICULTY_MODEL_FORMAT=compact
+    # servers switch to the joblib pair written above; the stale export is removed as well
+    stale = COMPACT_DIR / "meta.json"
+    if stale.exists():
+        stale.unlink()
+        print("Removed stale compact export (not available for hashed-feature models).")
+    version = write_version_file(VERSION_PATH)
+    Path(args.checkpoint).unlink(missing_ok=True)
+    print("DONE — Models saved to", MODEL_DIR, "version", version)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services import metrics
+from app.services.batching import MicroBatcher
+
+
+def test_concurrent_calls_share_one_batch():
+    calls = []
+
+    def double(items):
+        calls.append(list(items))
+        return [x * 2 for x in items]
+
+    batcher = MicroBatcher(double, max_batch=8, max_wait_ms=50, name="test_share")
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, batcher(i))) for i in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {i: i * 2 for i in range(5)}
+    assert len(calls) < 5 and sorted(x for c in calls for x in c) == list(range(5))
+    assert metrics.snapshot()["histograms"]["test_share.batch_size"]["count"] == len(calls)
+
+
+def test_max_batch_caps_batch_size():
+    sizes = []
+    gate = threading.Event()
+
+    def fn(items):
+        gate.wait(1)
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(fn, max_batch=3, max_wait_ms=20, name="test_cap")
+    futures = [batcher.submit(i) for i in range(7)]
+    gate.set()
+    assert [f.result(2) for f in futures] == list(range(7))
+    assert max(sizes) <= 3
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    fail = [True]
+
+    def flaky(items):
+        if fail[0]:
+            raise ValueError("model missing")
+        return [x * 10 for x in items]
+
+    batcher = MicroBatcher(flaky, max_wait_ms=20, name="test_err")
+    futures = [batcher.submit(i) for i in range(3)]
+    for f in futures:
+        with pytest.raises(ValueError, match="model missing"):
+            f.result(2)
+    # the same worker thread survives the failed batch and serves the next one
+    worker = batcher._thread
+    fail[0] = False
+    assert batcher.submit(4).result(2) == 40
+    assert batcher._thread is worker and worker.is_alive()
+
+
+def test_cancelled_async_caller_does_not_kill_the_worker():
+    started, gate, seen = threading.Event(), threading.Event(), []
+
+    def fn(items):
+        seen.append(list(items))
+        started.set()
+        gate.wait(2)
+        return items
+
+    batcher = MicroBatcher(fn, max_wait_ms=1, name="test_cancel")
+    first = batcher.submit("first")
+    assert started.wait(2)
+
+    async def cancel_while_queued():
+        task = asyncio.ensure_future(batcher.submit_async("abandoned"))
+        await asyncio.sleep(0.01)  # queued behind the running batch
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_queued())
+    gate.set()
+    assert first.result(2) == "first"
+    assert batcher.submit("next").result(2) == "next"
+    assert batcher._thread.is_alive()
+    assert ["abandoned"] not in seen
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from src.train.compact_model import export_compact, load_compact
+
+TRAIN = [
+    "What is 2 + 2?", "What is the capital of France?", "Name the largest planet.",
+    "Explain how photosynthesis works in plants.", "Describe the water cycle and its stages.",
+    "Compare mitosis and meiosis.", "Derive the backpropagation gradient for a neural network.",
+    "Prove that the square root of 2 is irrational.", "Analyse the time complexity of quicksort.",
+]
+LABELS = ["easy"] * 3 + ["medium"] * 3 + ["hard"] * 3
+PROBES = TRAIN + [
+    "", "???", "WHAT IS THE GRADIENT of 2+2", "Unseen words only: zebra quokka",
+    "Explain   explain EXPLAIN the gradient, the gradient!", "Ünïcödé café naïve résumé",
+]
+
+
+def _assert_parity(vec, model, tmp_path):
+    export_compact(vec, model, tmp_path / "compact", version="t1")
+    cvec, cmodel, meta = load_compact(tmp_path / "compact")
+    assert meta["classes"] == [str(c) for c in model.classes_]
+    np.testing.assert_allclose(cmodel.predict_proba(cvec.transform(PROBES)), model.predict_proba(vec.transform(PROBES)), atol=1e-6)
+    assert list(cmodel.predict(cvec.transform(PROBES))) == list(model.predict(vec.transform(PROBES)))
+
+
+@pytest.mark.parametrize("vec_kwargs", [
+    {"max_features": 5000, "ngram_range": (1, 2)},  # the production configuration
+    {"ngram_range": (1, 3), "sublinear_tf": True, "norm": "l1"},
+])
+def test_multinomial_parity(tmp_path, vec_kwargs):
+    vec = TfidfVectorizer(**vec_kwargs)
+    model = LogisticRegression(max_iter=2000, class_weight="balanced").fit(vec.fit_transform(TRAIN), LABELS)
+    _assert_parity(vec, model, tmp_path)
+
+
+def test_binary_parity(tmp_path):
+    vec = TfidfVectorizer(ngram_range=(1, 2))
+    model = LogisticRegression().fit(vec.fit_transform(TRAIN), ["easy"] * 3 + ["hard"] * 6)
+    _assert_parity(vec, model, tmp_path)
+
+
+def test_shipped_model_parity(tmp_path):
+    joblib = pytest.importorskip("joblib")
+    from src.train.model_registry import MODEL_PATH, VEC_PATH
+
+    if not (VEC_PATH.exists() and MODEL_PATH.exists()):
+        pytest.skip("no trained artifacts")
+    _assert_parity(joblib.load(VEC_PATH), joblib.load(MODEL_PATH), tmp_path)
+
+
+def test_arrays_are_memory_mapped(tmp_path):
+    vec = TfidfVectorizer().fit(TRAIN)
+    export_compact(vec, LogisticRegression().fit(vec.transform(TRAIN), LABELS), tmp_path)
+    _, cmodel, _ = load_compact(tmp_path)
+    assert isinstance(cmodel.coef_, np.memmap) and cmodel.coef_.dtype == np.float32
+
+
+def test_registry_serves_compact_format(tmp_path):
+    from src.train.model_registry import ModelRegistry
+
+    vec = TfidfVectorizer(ngram_range=(1, 2))
+    model = LogisticRegression().fit(vec.fit_transform(TRAIN), LABELS)
+    export_compact(vec, model, tmp_path / "compact", version="v7")
+    registry = ModelRegistry(version_path=tmp_path / "none.version", model_format="compact", compact_dir=tmp_path / "compact")
+    bundle = registry.current()
+    assert bundle.version == "v7"
+    np.testing.assert_allclose(bundle.model.predict_proba(bundle.vectorizer.transform(PROBES)), model.predict_proba(vec.transform(PROBES)), atol=1e-6)
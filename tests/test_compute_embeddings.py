@@ -0,0 +1,89 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.adaptive import embedding_codec as codec
+from tools import compute_embeddings as job
+
+
+def _bank(tmp_path, n=25):
+    path = tmp_path / "bank.db"
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE questions (id INTEGER PRIMARY KEY, question TEXT, topic TEXT, embedding TEXT)")
+    con.executemany("INSERT INTO questions (id, question) VALUES (?, ?)", [(i, f"question {i}") for i in range(1, n + 1)])
+    con.commit()
+    con.close()
+    return path
+
+
+def _embeddings(path):
+    con = sqlite3.connect(path)
+    rows = dict(con.execute("SELECT id, embedding FROM questions"))
+    con.close()
+    return rows
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    calls = []
+
+    def factory():
+        def embed(texts):
+            calls.append(len(texts))
+            return codec.encode_rows(np.array([[float(t.split()[1]), 1.0] for t in texts]))
+        return embed
+
+    monkeypatch.setitem(job.BACKENDS, "fake", factory)
+    return calls
+
+
+def test_embeds_missing_rows_in_batches(tmp_path, fake_backend):
+    path = _bank(tmp_path)
+    con = sqlite3.connect(path)
+    con.execute("UPDATE questions SET embedding = ? WHERE id = 3", (codec.encode([0.0, 9.0]),))
+    con.commit()
+    stats = job.run("fake", batch_size=10, db_path=path, verbose=False)
+    assert stats["questions"] == 24 and fake_backend == [10, 10, 4]
+    rows = _embeddings(path)
+    np.testing.assert_array_equal(codec.decode(rows[7]), [7.0, 1.0])
+    np.testing.assert_array_equal(codec.decode(rows[3]), [0.0, 9.0])  # untouched
+    assert job.run("fake", db_path=path, verbose=False)["questions"] == 0
+    assert job.run("fake", db_path=path, recompute=True, verbose=False)["questions"] == 25
+
+
+def test_interrupted_run_resumes_after_last_committed_batch(tmp_path, fake_backend, monkeypatch):
+    path = _bank(tmp_path)
+    real = job.BACKENDS["fake"]
+
+    def crashing():
+        embed = real()
+        def wrapped(texts):
+            if len(fake_backend) == 2:
+                raise KeyboardInterrupt
+            return embed(texts)
+        return wrapped
+
+    monkeypatch.setitem(job.BACKENDS, "fake", crashing)
+    with pytest.raises(KeyboardInterrupt):
+        job.run("fake", batch_size=5, recompute=True, db_path=path, verbose=False)
+    assert sum(v is not None for v in _embeddings(path).values()) == 10
+
+    monkeypatch.setitem(job.BACKENDS, "fake", real)
+    fake_backend.clear()
+    stats = job.run("fake", batch_size=5, recompute=True, db_path=path, verbose=False)
+    assert stats["resumed_from"] == 10 and stats["questions"] == 15
+    assert all(v is not None for v in _embeddings(path).values())
+    con = sqlite3.connect(path)
+    assert con.execute("SELECT COUNT(*) FROM embedding_checkpoints").fetchone()[0] == 0
+
+
+def test_parallel_workers_write_in_order(tmp_path):
+    path = _bank(tmp_path, n=40)
+    stats = job.run("tfidf", batch_size=7, workers=2, db_path=path, verbose=False)
+    assert stats["questions"] == 40
+    rows = _embeddings(path)
+    (tmp_path / "serial").mkdir()
+    serial_path = _bank(tmp_path / "serial", n=40)
+    job.run("tfidf", batch_size=40, db_path=serial_path, verbose=False)
+    assert rows == _embeddings(serial_path)
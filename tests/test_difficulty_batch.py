@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import difficulty
+from app.services import log_sink
+
+QUESTIONS = ["What is 2 + 2?", "Derive the backpropagation gradient.", "Explain how photosynthesis works."]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(difficulty, "LOG_PATH", str(tmp_path / "log.jsonl"))
+    app = FastAPI()
+    app.include_router(difficulty.router)
+    return TestClient(app)
+
+
+def _log_lines(tmp_path):
+    log_sink.flush_all()
+    return [json.loads(line) for line in open(tmp_path / "log.jsonl")]
+
+
+def test_json_batch_matches_single_predictions_and_logs_once(client, tmp_path):
+    r = client.post("/difficulty/batch", json={"questions": QUESTIONS, "session_id": "s1"})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [x["difficulty"] for x in results] == [difficulty.svc.predict(q)["difficulty"] for q in QUESTIONS]
+    assert all(abs(sum(x["probs"]) - 1) < 1e-6 for x in results)
+    logs = [e for e in _log_lines(tmp_path) if e.get("event") == "difficulty_batch"]
+    assert len(logs) == 1 and logs[0]["count"] == 3 and logs[0]["session_id"] == "s1"
+
+
+def test_bare_list_is_accepted(client):
+    assert client.post("/difficulty/batch", json=QUESTIONS).json()["count"] == 3
+
+
+def test_ndjson_streams_results_in_order(client, tmp_path):
+    body = "\n".join([json.dumps(QUESTIONS[0]), json.dumps({"question": QUESTIONS[1]}), "", "{oops", json.dumps(QUESTIONS[2])])
+    r = client.post("/difficulty/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    ok = [x for x in lines if "difficulty" in x]
+    assert [x["line"] for x in ok] == [1, 2, 5]
+    assert [x["line"] for x in lines if "error" in x] == [4]
+    (log,) = _log_lines(tmp_path)
+    assert (log["count"], log["errors"]) == (3, 1)
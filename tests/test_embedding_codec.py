@@ -0,0 +1,55 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from src.adaptive import db_migrations
+from src.adaptive import embedding_codec as codec
+
+
+def test_dense_roundtrip_is_zero_copy():
+    vec = np.random.default_rng(0).standard_normal(384).astype(np.float32)
+    blob = codec.encode(vec)
+    assert len(blob) == codec.HEADER.size + 384 * 4
+    out = codec.decode(blob)
+    np.testing.assert_array_equal(out, vec)
+    assert out.base is not None and not out.flags.writeable  # a view over the blob
+
+
+def test_sparse_rows_are_stored_sparse():
+    dense = np.zeros(5000, dtype=np.float32)
+    dense[[3, 77, 4999]] = [0.5, 0.25, 1.0]
+    for vec in (dense, sparse.csr_matrix(dense)):
+        blob = codec.encode(vec)
+        assert len(blob) == codec.HEADER.size + 3 * 8
+        assert codec.header(blob) == (codec.FORMAT_VERSION, codec.SPARSE, 5000)
+        np.testing.assert_array_equal(codec.decode(blob), dense)
+    idx, val, dim = codec.decode_sparse(blob)
+    assert list(idx) == [3, 77, 4999] and dim == 5000
+
+
+def test_decode_any_reads_legacy_json_and_matrix_stacks():
+    assert codec.decode_any(None) is None
+    np.testing.assert_array_equal(codec.decode_any("[0.0, 1.5]"), [0.0, 1.5])
+    m = codec.decode_matrix([codec.encode([1.0, 2.0, 3.0]), codec.encode([0.0, 0.0, 7.0])])
+    np.testing.assert_array_equal(m, [[1, 2, 3], [0, 0, 7]])
+    with pytest.raises(ValueError):
+        codec.decode(b"QE\x09\x00\x01\x00\x00\x00")  # unknown version
+
+
+def test_migration_rewrites_json_rows(tmp_path):
+    con = sqlite3.connect(tmp_path / "bank.db")
+    con.execute("CREATE TABLE questions (id INTEGER PRIMARY KEY, question TEXT, embedding TEXT)")
+    legacy = [0.0] * 4998 + [0.3, 0.0]
+    con.executemany("INSERT INTO questions (id, question, embedding) VALUES (?, ?, ?)", [
+        (1, "a", json.dumps(legacy)), (2, "b", None), (3, "c", ""), (4, "d", json.dumps([1.0, 2.0])),
+    ])
+    assert db_migrations.migrate_embeddings_to_blobs(con, batch_size=1) == 2
+    rows = dict(con.execute("SELECT id, embedding FROM questions"))
+    assert codec.is_encoded(rows[1]) and len(rows[1]) == codec.HEADER.size + 8
+    np.testing.assert_allclose(codec.decode(rows[1]), legacy)
+    np.testing.assert_array_equal(codec.decode(rows[4]), [1.0, 2.0])
+    assert rows[2] is None and rows[3] == ""
+    assert db_migrations.migrate_embeddings_to_blobs(con) == 0  # idempotent
@@ -0,0 +1,76 @@
+import threading
+
+import numpy as np
+
+from app.services import embeddings_service as es
+from app.services import metrics
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+        self.progress = []
+
+    def encode(self, texts, show_progress_bar=False):
+        self.calls.append(list(texts))
+        self.progress.append(show_progress_bar)
+        return np.array([[len(t), t.count("a"), 1.0] for t in texts], dtype=np.float32)
+
+
+def _service(tmp_path, **kwargs):
+    svc = es.EmbeddingService(cache=es.EmbeddingCache(tmp_path / "cache.db"), **kwargs)
+    svc._model = FakeModel()
+    return svc
+
+
+def test_model_is_loaded_lazily(tmp_path):
+    svc = es.EmbeddingService(cache=es.EmbeddingCache(tmp_path / "cache.db"))
+    assert svc._model is None and svc.stats()["loaded"] is False
+
+
+def test_disk_cache_skips_reencoding_across_instances(tmp_path):
+    svc = _service(tmp_path)
+    out = svc.encode(["a", "banana", "a"])
+    np.testing.assert_array_equal(out, [[1, 1, 1], [6, 3, 1], [1, 1, 1]])
+    assert sorted(sum(svc._model.calls, [])) == ["a", "banana"]  # duplicate encoded once
+
+    again = _service(tmp_path)  # e.g. after a restart
+    np.testing.assert_array_equal(again.encode(["banana", "cherry"]), [[6, 3, 1], [6, 0, 1]])
+    assert again._model.calls == [["cherry"]]
+    assert again.stats()["hits"] == 1 and again.stats()["hit_rate"] == 0.5
+    np.testing.assert_array_equal(again.encode("banana"), [6, 3, 1])
+
+    other_model = _service(tmp_path, model_name="other")
+    other_model.encode(["banana"])
+    assert other_model._model.calls == [["banana"]]  # cache is keyed by model name
+
+
+def test_concurrent_callers_share_batches(tmp_path):
+    before = metrics.snapshot()["histograms"].get("embeddings.batch_size", {}).get("count", 0)
+    svc = _service(tmp_path, batch_size=32, max_wait_ms=50)
+    barrier = threading.Barrier(8)
+    results = {}
+
+    def call(i):
+        barrier.wait()
+        results[i] = svc.encode([f"text {i}"])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(svc._model.calls) < 8
+    assert sorted(sum(svc._model.calls, [])) == sorted(f"text {i}" for i in range(8))
+    snap = metrics.snapshot()
+    assert snap["histograms"]["embeddings.batch_size"]["count"] - before == len(svc._model.calls)
+    assert "embeddings.queue_wait_seconds" in snap["histograms"]
+
+
+def test_show_progress_reaches_the_encoder(tmp_path):
+    svc = _service(tmp_path)
+    svc.encode(["one", "two", "one"], show_progress=True)
+    assert svc._model.calls == [["one", "two"]] and svc._model.progress == [True]
+    svc.encode(["three"])
+    assert svc._model.progress == [True, False]
+    assert svc.stats()["hits"] == 0 and svc.stats()["misses"] == 4
@@ -0,0 +1,66 @@
+import sqlite3
+
+import numpy as np
+
+from src.train import empirical_labels as el
+
+
+def _db(tmp_path):
+    con = sqlite3.connect(tmp_path / "adaptive.db")
+    con.execute("CREATE TABLE questions (id INTEGER PRIMARY KEY, question TEXT, difficulty TEXT)")
+    con.execute("CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, "
+                "question_id INTEGER, is_correct INTEGER, ts TEXT)")
+    con.executemany("INSERT INTO questions (id, question) VALUES (?, ?)",
+                    [(1, "easy one"), (2, "hard one"), (3, "middling"), (4, "rarely seen")])
+    return con
+
+
+def _answer(con, qid, correct, wrong):
+    rows = [("u", qid, 1)] * correct + [("u", qid, 0)] * wrong
+    con.executemany("INSERT INTO history (user_id, question_id, is_correct) VALUES (?, ?, ?)", rows)
+    con.commit()
+
+
+def test_update_stats_is_incremental(tmp_path):
+    con = _db(tmp_path)
+    _answer(con, 1, 3, 1)
+    assert el.update_stats(con) == {"from_id": 0, "to_id": 4, "questions": 1}
+    assert el.update_stats(con)["questions"] == 0  # nothing new
+    _answer(con, 1, 1, 0)
+    _answer(con, 2, 0, 2)
+    stats = el.update_stats(con)
+    assert (stats["from_id"], stats["to_id"]) == (4, 7)
+    got = dict((r[0], (r[1], r[2])) for r in con.execute("SELECT question_id, attempts, correct FROM question_stats"))
+    assert got == {1: (5, 4), 2: (2, 0)}
+
+
+def test_labels_need_confidence_and_min_attempts(tmp_path):
+    con = _db(tmp_path)
+    _answer(con, 1, 95, 5)
+    _answer(con, 2, 10, 90)
+    _answer(con, 3, 110, 90)
+    _answer(con, 4, 5, 0)  # too few attempts
+    labeled = {x["question"]: x["difficulty"] for x in el.empirical_labels(con, min_attempts=20)}
+    assert labeled == {"easy one": "easy", "hard one": "hard", "middling": "medium"}
+
+
+def test_ambiguous_rates_get_no_label():
+    # 22/30 correct: rate 0.73 but the interval straddles easy_min
+    labels = el.label_rates(np.array([22, 240]), np.array([30, 400]))
+    assert list(labels) == ["", "medium"]
+
+
+def test_train_merges_empirical_labels(monkeypatch):
+    import pandas as pd
+
+    from src.train import train_difficulty as td
+
+    monkeypatch.setattr(td, "empirical_labels", lambda min_attempts: [
+        {"question": "q1", "difficulty": "hard"}, {"question": "q3", "difficulty": "easy"},
+    ])
+    df = pd.DataFrame({"question": ["q1", "q2"], "difficulty": ["easy", "medium"]})
+    merged = td.add_empirical_labels(df)
+    assert dict(zip(merged["question"], merged["difficulty"])) == {"q1": "hard", "q2": "medium", "q3": "easy"}
+    # two labels can't replace the synthetic set (stratified split needs >= 2 per class)
+    toy = td.make_toy_dataset()
+    assert td.add_empirical_labels(toy) is toy
@@ -0,0 +1,41 @@
+from app.services.extractive_mcq import generate_extractive_mcqs
+
+SOURCE = """
+Photosynthesis is the process by which green plants convert light energy into chemical energy stored in glucose.
+The process takes place mainly in the chloroplasts of leaf cells. Chlorophyll is a green pigment that absorbs
+light most strongly in the blue and red wavelengths.
+
+The light-dependent reactions occur in the thylakoid membranes and produce ATP and NADPH. The Calvin cycle uses
+ATP and NADPH to fix carbon dioxide into sugars in the stroma. Rubisco is the enzyme that catalyzes the first
+major step of carbon fixation. In 1771 Joseph Priestley showed that plants restore air injured by burning candles.
+"""
+
+
+def test_generates_well_formed_mcqs_offline():
+    mcqs = generate_extractive_mcqs(SOURCE, num_questions=4, use_bank=False)
+    assert 1 <= len(mcqs) <= 4
+    for item in mcqs:
+        assert set(item) >= {"question", "answer", "distractors", "explanation", "difficulty", "topic"}
+        assert len(item["distractors"]) == 3
+        assert item["answer"] not in item["distractors"]
+        assert len({d.lower() for d in item["distractors"]}) == 3
+    # answers are distinct across questions
+    assert len({m["answer"].lower() for m in mcqs}) == len(mcqs)
+
+
+def test_definition_sentence_becomes_definition_question():
+    mcqs = generate_extractive_mcqs(SOURCE, num_questions=6, use_bank=False)
+    definition = next(m for m in mcqs if m["answer"] == "Photosynthesis")
+    assert definition["question"].startswith("Which term is described as")
+    assert "Photosynthesis" not in definition["question"]
+
+
+def test_cloze_question_blanks_the_answer():
+    mcqs = generate_extractive_mcqs(SOURCE, num_questions=6, use_bank=False)
+    cloze = [m for m in mcqs if m["question"].startswith("Fill in the blank")]
+    assert cloze
+    assert all("_____" in m["question"] for m in cloze)
+
+
+def test_empty_text_returns_nothing():
+    assert generate_extractive_mcqs("", 3, use_bank=False) == []
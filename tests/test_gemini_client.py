@@ -0,0 +1,182 @@
+import asyncio
+import time
+
+import pytest
+
+import app.services.gemini_client as gc
+from app.services.rate_limiter import TokenBucketLimiter
+
+
+class FakeModel:
+    delays = {}
+    fail = set()
+    created = []
+    running = 0
+    peak = 0
+    replies = {}
+    configs = []
+
+    def __init__(self, name):
+        self.name = name
+        FakeModel.created.append(name)
+
+    def generate_content(self, prompt, generation_config=None):
+        FakeModel.configs.append(generation_config)
+        FakeModel.running += 1
+        FakeModel.peak = max(FakeModel.peak, FakeModel.running)
+        try:
+            time.sleep(self.delays.get(self.name, 0.0))
+        finally:
+            FakeModel.running -= 1
+        if self.name in self.fail:
+            raise RuntimeError("500 internal error")
+        return self.replies.get(self.name, self.name)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    FakeModel.delays, FakeModel.fail, FakeModel.created = {}, set(), []
+    FakeModel.replies, FakeModel.configs = {}, []
+    FakeModel.running = FakeModel.peak = 0
+    monkeypatch.setattr(gc.genai, "GenerativeModel", FakeModel)
+    limiter = TokenBucketLimiter("t", rpm=10000, tpm=10_000_000, db_path=tmp_path / "rl.db")
+    return gc.GeminiClientManager(quality_model="pro", fast_model="flash", fast_max_tokens=100, limiter=limiter)
+
+
+def test_model_handles_are_reused_and_routed_by_size(client):
+    assert client.generate("short prompt") == "flash"
+    assert client.generate("x" * 4000) == "pro"
+    assert client.generate("another short one") == "flash"
+    assert sorted(FakeModel.created) == ["flash", "pro"]
+
+
+def test_breaker_opens_after_consecutive_failures(client):
+    FakeModel.fail = {"pro"}
+    for _ in range(gc.GEMINI_BREAKER_FAILURES):
+        with pytest.raises(RuntimeError, match="500"):
+            client.generate("x", model_name="pro")
+    with pytest.raises(gc.CircuitOpenError):
+        client.generate("x", model_name="pro")
+    assert client.state()["breaker"] == "open"
+
+
+def test_hedged_request_takes_faster_backup(client):
+    for _ in range(gc.MIN_LATENCY_SAMPLES):
+        client._tracker("flash").record(0.01)
+    FakeModel.delays = {"flash": 0.5}
+
+    async def timed():
+        t0 = time.perf_counter()
+        result = await client.generate_async("short", hedge=True)
+        return result, time.perf_counter() - t0
+
+    # asyncio.run also waits for the abandoned primary thread, so time inside the loop
+    result, elapsed = asyncio.run(timed())
+    assert result == "pro"
+    assert elapsed < 0.4
+
+
+def _open_then_cool_down(client):
+    FakeModel.fail = {"pro"}
+    for _ in range(gc.GEMINI_BREAKER_FAILURES):
+        with pytest.raises(RuntimeError):
+            client.generate("x", model_name="pro")
+    client.breaker._opened_at -= client.breaker.cooldown  # skip the cooldown: half-open
+    FakeModel.fail = set()
+    assert client.breaker.state == "half_open"
+
+
+def test_cancelled_trial_does_not_wedge_the_breaker(client, monkeypatch):
+    _open_then_cool_down(client)
+    acquire_async = client.limiter.acquire_async
+
+    async def slow_acquire(tokens=1):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(client.limiter, "acquire_async", slow_acquire)
+
+    async def cancelled_trial():
+        task = asyncio.ensure_future(client.generate_async("x", model_name="pro"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancelled_trial())
+    monkeypatch.setattr(client.limiter, "acquire_async", acquire_async)
+    assert asyncio.run(client.generate_async("x", model_name="pro")) == "pro"
+    _open_then_cool_down(client)
+
+    def failing_acquire(tokens=1):
+        raise OSError("limiter db unavailable")
+
+    monkeypatch.setattr(client.limiter, "acquire", failing_acquire)
+    with pytest.raises(OSError):
+        client.generate("x", model_name="pro")
+    monkeypatch.setattr(client.limiter, "acquire", lambda tokens=1: 0.0)
+    assert client.generate("x", model_name="pro") == "pro"  # the trial slot was released both times
+    assert client.breaker.state == "closed"
+
+
+def test_no_backup_when_primary_finishes_during_limiter_wait(client, monkeypatch):
+    for _ in range(gc.MIN_LATENCY_SAMPLES):
+        client._tracker("flash").record(0.01)
+    FakeModel.delays = {"flash": 0.1}
+    acquire = client.limiter.acquire_async
+    calls = []
+
+    async def slow_second_acquire(tokens=1):
+        calls.append(tokens)
+        if len(calls) == 2:
+            await asyncio.sleep(0.3)  # the primary answers meanwhile
+        return await acquire(tokens)
+
+    monkeypatch.setattr(client.limiter, "acquire_async", slow_second_acquire)
+    assert asyncio.run(client.generate_async("short", hedge=True)) == "flash"
+    assert len(calls) == 2 and "pro" not in FakeModel.created
+
+
+def test_fan_out_waits_on_the_loop_not_in_executor_threads(client):
+    client = gc.GeminiClientManager(quality_model="pro", fast_model="flash", fast_max_tokens=100,
+                                    limiter=client.limiter, max_concurrency=2)
+    FakeModel.delays = {"flash": 0.2}
+
+    async def fan_out():
+        calls = asyncio.gather(*(client.generate_async("short") for _ in range(12)))
+        await asyncio.sleep(0.05)
+        t0 = time.perf_counter()
+        await asyncio.to_thread(lambda: None)  # other to_thread work still gets a thread
+        waited = time.perf_counter() - t0
+        return await calls, waited
+
+    results, waited = asyncio.run(fan_out())
+    assert results == ["flash"] * 12
+    assert FakeModel.peak == 2
+    assert waited < 0.1
+
+
+def test_structured_from_text_goes_through_the_manager(client, monkeypatch, tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.routers import generate
+    from app.services import log_sink
+
+    async def no_fallback(*args, **kwargs):
+        raise AssertionError("structured output should have been used")
+
+    monkeypatch.setattr(generate, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(generate, "gemini_client", client)
+    monkeypatch.setattr(generate, "generate_mcqs", no_fallback)
+    monkeypatch.setattr(generate, "save_mcqs_to_db", lambda mcqs: [{**m, "id": i} for i, m in enumerate(mcqs, 1)])
+    monkeypatch.setattr(log_sink, "LOG_PATH", str(tmp_path / "log.jsonl"))
+    FakeModel.replies = dict.fromkeys(["pro", "flash"], '[{"question": "What makes ATP?", "answer": "Mitochondria", '
+                                                         '"distractors": ["Ribosome", "Nucleus", "Golgi"]}]')
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/ai")
+    r = TestClient(app).post("/ai/from_text", json={"text": "Mitochondria make ATP.", "num_questions": 1,
+                                                     "use_structured": True})
+    assert r.status_code == 200
+    assert r.json()["generated"][0]["answer"] == "Mitochondria"
+    assert FakeModel.configs == [{"response_mime_type": "application/json"}]
+    assert client.limiter.state()["available_requests"] < client.limiter.rpm  # the shared limiter was charged
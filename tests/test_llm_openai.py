@@ -0,0 +1,39 @@
+import pytest
+from fastapi import HTTPException
+from google.api_core import exceptions as google_exceptions
+
+from app.services import llm_openai
+
+
+@pytest.fixture
+def failing_gemini(monkeypatch):
+    monkeypatch.setattr(llm_openai, "GEMINI_API_KEY", "test-key")
+
+    def fail_with(exc):
+        def generate(prompt):
+            raise exc
+
+        monkeypatch.setattr(llm_openai.gemini_client, "generate", generate)
+
+    return fail_with
+
+
+def _detail(text="Mitochondria produce ATP."):
+    with pytest.raises(HTTPException) as info:
+        llm_openai.generate_mcq_from_text(text, num_questions=1, max_retries=1, allow_fallback=False)
+    assert info.value.status_code == 503
+    return info.value.detail
+
+
+def test_unsupported_model_is_not_reported_as_a_rate_limit(failing_gemini):
+    failing_gemini(google_exceptions.NotFound("models/gemini-x is not supported for generateContent"))
+    detail = _detail()
+    assert "rate limit" not in detail and "quota" not in detail
+    assert "generateContent" in detail
+
+
+def test_rate_limit_and_quota_errors_keep_their_messages(failing_gemini):
+    failing_gemini(google_exceptions.TooManyRequests("slow down"))
+    assert _detail() == "Gemini rate limit exceeded. Try again later."
+    failing_gemini(google_exceptions.ResourceExhausted("Quota exceeded for generate_content_requests"))
+    assert _detail().startswith("Gemini quota exhausted")
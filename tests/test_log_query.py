@@ -0,0 +1,72 @@
+import gzip
+import json
+
+from src.analytics.log_query import LogFilter, iter_lines, log_files, query, scan
+
+
+def _rec(ts, predicted, probs, user="u1", session="s1"):
+    return {"question_preview": "q", "predicted": predicted, "probs": probs, "classes": ["easy", "hard", "medium"],
+            "user_hash": user, "session_id": session, "ts": ts}
+
+
+def _write(path, records, gz=False):
+    data = "".join(json.dumps(r) + "\n" for r in records)
+    if gz:
+        with gzip.open(path, "wt") as f:
+            f.write(data)
+    else:
+        path.write_text(data)
+
+
+def _logs(tmp_path):
+    _write(tmp_path / "log.20251101T000000000000.123.jsonl.gz", [
+        _rec("2025-10-31T10:00:00.000000Z", "easy", [0.95, 0.03, 0.02]),
+        _rec("2025-10-31T11:30:00.000000Z", "hard", [0.1, 0.55, 0.35], user="u2"),
+    ], gz=True)
+    _write(tmp_path / "log.jsonl", [
+        _rec("2025-11-02T09:00:00.000000Z", "hard", [0.05, 0.9, 0.05]),
+        {"event": "difficulty_batch", "label_counts": {"easy": 3, "hard": 1}, "ts": "2025-11-02T09:10:00.000000Z",
+         "user_hash": "u1", "session_id": "s2"},
+    ])
+    (tmp_path / "log.jsonl").open("a").write("not json\n")
+    return tmp_path / "log.jsonl"
+
+
+def test_log_files_include_rotated_oldest_first(tmp_path):
+    files = log_files(_logs(tmp_path))
+    assert [p.name for p in files] == ["log.20251101T000000000000.123.jsonl.gz", "log.jsonl"]
+    assert log_files(tmp_path) == files
+
+
+def test_iter_lines_mmap_handles_missing_trailing_newline(tmp_path):
+    p = tmp_path / "x.jsonl"
+    p.write_bytes(b'{"a": 1}\r\n{"a": 2}')
+    assert list(iter_lines(p)) == [b'{"a": 1}', b'{"a": 2}']
+    (tmp_path / "empty.jsonl").write_bytes(b"")
+    assert list(iter_lines(tmp_path / "empty.jsonl")) == []
+
+
+def test_aggregates_across_plain_and_gzip_files(tmp_path):
+    agg = query(log_files(_logs(tmp_path)), bucket="day").to_dict()
+    assert agg["records"] == 4 and agg["bad_lines"] == 1
+    assert agg["by_class"] == {"easy": 4, "hard": 3}
+    assert agg["by_time"] == {"2025-10-31": {"easy": 1, "hard": 1}, "2025-11-02": {"easy": 3, "hard": 2}}
+    assert agg["confidence"]["0.9-1.0"] == 2 and agg["confidence"]["0.5-0.6"] == 1
+
+
+def test_filters(tmp_path):
+    files = log_files(_logs(tmp_path))
+    assert [r["ts"][:10] for r in scan(files, LogFilter(since="2025-11-01"))] == ["2025-11-02", "2025-11-02"]
+    assert [r["predicted"] for r in scan(files, LogFilter(user_hash="u2"))] == ["hard"]
+    assert len(list(scan(files, LogFilter(session_id="s2")))) == 1
+    assert len(list(scan(files, LogFilter(event="prediction")))) == 3
+    hard = query(files, LogFilter(predicted="hard")).to_dict()
+    assert hard["by_class"] == {"hard": 3}
+    assert query(files, LogFilter(until="2025-10-31T11:00")).records == 1
+
+
+def test_since_skips_older_rotated_files_and_parallel_matches_serial(tmp_path):
+    files = log_files(_logs(tmp_path))
+    assert not LogFilter(since="2025-11-02").file_may_match(files[0])
+    assert LogFilter(since="2025-10-31").file_may_match(files[0])
+    assert query(files, jobs=2).to_dict() == query(files).to_dict()
@@ -0,0 +1,81 @@
+import gzip
+import json
+import multiprocessing
+import os
+import time
+
+from app.services.log_sink import JsonlSink
+
+
+def _records(path):
+    return [json.loads(line) for line in open(path, encoding="utf8")]
+
+
+def test_emit_is_queued_and_flushed_in_order(tmp_path):
+    sink = JsonlSink(tmp_path / "log.jsonl", flush_ms=10)
+    for i in range(500):
+        assert sink.emit({"i": i})
+    assert sink.flush()
+    got = _records(tmp_path / "log.jsonl")
+    assert [r["i"] for r in got] == list(range(500))
+    assert all(r["ts"].endswith("Z") for r in got)
+    sink.close()
+    assert not sink.emit({"i": -1})
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    sink = JsonlSink(tmp_path / "log.jsonl", max_queue=1)
+    sink._ensure_worker = lambda: None  # no writer: the queue stays full
+    assert sink.emit({"i": 0})
+    assert not sink.emit({"i": 1})
+
+
+def test_size_rotation_gzips_and_prunes(tmp_path):
+    sink = JsonlSink(tmp_path / "log.jsonl", rotate_bytes=200, rotate_seconds=0, keep_rotated=2, flush_ms=1)
+    for i in range(20):
+        sink.emit({"i": i, "pad": "x" * 80})
+        sink.flush()
+    sink.close()
+    rotated = sink.rotated_files()
+    assert len(rotated) == 2 and all(p.name.endswith(".jsonl.gz") for p in rotated)
+    with gzip.open(rotated[-1], "rt", encoding="utf8") as f:
+        assert all("pad" in json.loads(line) for line in f)
+    assert os.path.getsize(tmp_path / "log.jsonl") < 400
+
+
+def test_time_rotation_uses_first_record_age(tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text(json.dumps({"ts": "2000-01-01T00:00:00.000000Z"}) + "\n")
+    sink = JsonlSink(path, rotate_seconds=3600, flush_ms=1)
+    sink.emit({"i": 1})
+    sink.flush()
+    sink.close()
+    assert [r["i"] for r in _records(path)] == [1]
+    (old,) = sink.rotated_files()
+    with gzip.open(old, "rt") as f:
+        assert json.loads(f.readline())["ts"].startswith("2000")
+
+
+def _writer(path, worker):
+    sink = JsonlSink(path, rotate_bytes=4000, rotate_seconds=0, keep_rotated=0, flush_ms=1)
+    for i in range(200):
+        sink.emit({"w": worker, "i": i})
+        if i % 20 == 0:
+            time.sleep(0.001)
+    sink.flush()
+    sink.close()
+
+
+def test_processes_share_a_file_without_losing_lines(tmp_path):
+    path = tmp_path / "log.jsonl"
+    procs = [multiprocessing.Process(target=_writer, args=(path, w)) for w in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+    seen = _records(path)
+    for rotated in JsonlSink(path).rotated_files():
+        opener = gzip.open if rotated.suffix == ".gz" else open
+        with opener(rotated, "rt", encoding="utf8") as f:
+            seen += [json.loads(line) for line in f]
+    assert sorted((r["w"], r["i"]) for r in seen) == [(w, i) for w in range(3) for i in range(200)]
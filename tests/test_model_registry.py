@@ -0,0 +1,50 @@
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from src.train.model_registry import ModelRegistry, atomic_dump, write_version_file
+
+
+def _train(tmp_path, labels):
+    texts = ["what is two plus two", "derive the gradient of the loss", "explain photosynthesis in plants"]
+    vec = TfidfVectorizer().fit(texts)
+    model = LogisticRegression().fit(vec.transform(texts), labels)
+    atomic_dump(vec, tmp_path / "vec.joblib")
+    atomic_dump(model, tmp_path / "model.joblib")
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(tmp_path / "vec.joblib", tmp_path / "model.joblib", tmp_path / "model.version", reload_interval=0)
+
+
+def test_loads_once_and_swaps_on_new_version(tmp_path, registry):
+    _train(tmp_path, ["easy", "hard", "medium"])
+    write_version_file(tmp_path / "model.version", "v1")
+    first = registry.current()
+    assert first.version == "v1"
+    assert registry.current() is first  # unchanged files: no reload
+
+    _train(tmp_path, ["a", "b", "c"])
+    write_version_file(tmp_path / "model.version", "v2")
+    second = registry.current()
+    assert second.version == "v2" and second.classes == ("a", "b", "c")
+    # a prediction that grabbed the old bundle keeps a consistent vectorizer/model pair
+    assert first.classes == ("easy", "hard", "medium")
+    assert registry.state()["version"] == "v2"
+
+
+def test_failed_reload_keeps_serving_old_model(tmp_path, registry):
+    _train(tmp_path, ["easy", "hard", "medium"])
+    write_version_file(tmp_path / "model.version", "v1")
+    registry.current()
+    (tmp_path / "model.joblib").write_bytes(b"garbage")
+    write_version_file(tmp_path / "model.version", "v2")
+    assert registry.current().version == "v1"
+    assert registry.state()["last_error"]
+
+
+def test_missing_artifacts_raise(registry):
+    with pytest.raises(FileNotFoundError):
+        registry.current()
+    assert registry.state()["version"] is None
@@ -0,0 +1,61 @@
+from app.services.passage_select import select_passages, strip_boilerplate
+
+PAGE = """Intro to Cell Biology - Chapter 3
+Mitochondria produce ATP through oxidative phosphorylation along the inner membrane ({n}).
+
+Page {n} of 40
+"""
+
+
+def test_strip_boilerplate_removes_headers_and_page_numbers():
+    cleaned, removed = strip_boilerplate([PAGE.format(n=i) for i in range(1, 6)])
+    assert "Chapter 3" not in cleaned
+    assert "Page" not in cleaned
+    assert removed == 10
+    assert cleaned.count("oxidative phosphorylation") == 5
+
+
+def test_numbered_headings_in_content_are_kept():
+    steps = "\n\n".join(f"Step {i}\nMix the reagents and record the temperature every minute." for i in range(1, 6))
+    selected, stats = select_passages(steps, token_budget=1000)
+    assert stats["boilerplate_lines_removed"] == 0
+    assert all(f"Step {i}" in selected for i in range(1, 6))
+
+    # in a PDF, only page edges are candidates: "Example n" inside pages survives, the footer doesn't
+    pages = [f"Lab manual\nTitration {i} uses {i}0 ml of acid.\nExample {i}\nRecord the volume.\n"
+             f"Repeat it {i} times.\nLab manual - page {i}" for i in range(1, 5)]
+    cleaned, removed = strip_boilerplate(pages)
+    assert removed == 8
+    assert all(f"Example {i}" in cleaned for i in range(1, 5)) and "Lab manual" not in cleaned
+
+
+def test_short_text_is_kept_whole():
+    text = "Enzymes lower activation energy.\n\nThey are not consumed by the reaction."
+    selected, stats = select_passages(text, token_budget=1000)
+    assert selected == "Enzymes lower activation energy.\n\nThey are not consumed by the reaction."
+    assert stats["passages_selected"] == stats["passages_total"] == 2
+
+
+def test_selection_respects_budget_and_document_order():
+    topics = ["enzyme kinetics and the michaelis constant", "photosynthesis in chloroplasts",
+              "dna replication forks", "protein folding chaperones"]
+    paragraphs = [f"Section {i}: this paragraph discusses {topics[i % 4]} in detail, with examples." for i in range(200)]
+    selected, stats = select_passages("\n\n".join(paragraphs), token_budget=200)
+
+    assert stats["selected_tokens"] <= 200 < stats["original_tokens"]
+    kept = selected.split("\n\n")
+    positions = [paragraphs.index(p) for p in kept]
+    assert positions == sorted(positions)
+    # MMR keeps the selection diverse: every topic is represented
+    assert all(any(t in p for p in kept) for t in topics)
+
+
+def test_unpunctuated_text_is_cut_to_the_budget_not_dropped():
+    words = " ".join(f"term{i % 997} cell membrane transport" for i in range(8000))  # ~200 KB, one "sentence"
+    selected, stats = select_passages(words, token_budget=1000)
+    assert stats["passages_selected"] > 0
+    assert 0 < stats["selected_tokens"] <= 1000
+    assert selected.split()[0] in words.split()
+
+    selected, stats = select_passages("x" * 50_000, token_budget=10)  # a single huge "word", tiny budget
+    assert selected and stats["selected_tokens"] <= 10
@@ -0,0 +1,61 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import generate
+from app.services import log_sink, pdf_cache, pdf_extract, rate_limiter
+
+pymupdf = pdf_extract._pymupdf()
+
+
+def _pdf_bytes(text: str) -> bytes:
+    doc = pymupdf.open()
+    doc.new_page().insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "PDF_CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(log_sink, "LOG_PATH", str(tmp_path / "log.jsonl"))
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_DB", tmp_path / "ratelimit.db")
+
+    async def fake_generate(text, num_questions, generator="auto", pages=None):
+        if "broken" in text:
+            raise RuntimeError("LLM generation error: bad output")
+        return [{"question": text.strip(), "answer": "a", "distractors": ["b", "c", "d"]}] * num_questions, "llm"
+
+    ids = iter(range(1, 1000))
+    monkeypatch.setattr(generate, "generate_mcqs", fake_generate)
+    monkeypatch.setattr(generate, "save_mcqs_to_db", lambda mcqs: [{**m, "id": next(ids)} for m in mcqs])
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/ai")
+    return TestClient(app)
+
+
+def test_one_bad_file_does_not_fail_the_batch(client):
+    files = [
+        ("files", ("week1.pdf", _pdf_bytes("Week one notes"), "application/pdf")),
+        ("files", ("notes.txt", b"plain text", "text/plain")),
+        ("files", ("week2.pdf", _pdf_bytes("broken lecture"), "application/pdf")),
+        ("files", ("corrupt.pdf", b"not a pdf at all", "application/pdf")),
+    ]
+    r = client.post("/ai/from_pdf_batch?num_questions=2", files=files)
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["succeeded"], body["failed"]) == (1, 3)
+    by_name = {f["filename"]: f for f in body["files"]}
+    assert by_name["week1.pdf"]["status"] == "ok"
+    assert len(by_name["week1.pdf"]["question_ids"]) == 2
+    assert by_name["notes.txt"]["error"] == "Only PDF files allowed."
+    assert "bad output" in by_name["week2.pdf"]["error"]
+    assert by_name["corrupt.pdf"]["status"] == "error"
+
+
+def test_repeat_file_uses_extraction_cache(client):
+    files = [("files", ("week1.pdf", _pdf_bytes("Week one notes"), "application/pdf"))]
+    first = client.post("/ai/from_pdf_batch", files=files).json()["files"][0]
+    second = client.post("/ai/from_pdf_batch", files=files).json()["files"][0]
+    assert (first["extraction_cached"], second["extraction_cached"]) == (False, True)
@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+
+from app.services import pdf_cache, pdf_extract
+
+pymupdf = pdf_extract._pymupdf()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "PDF_CACHE_DIR", tmp_path / "cache")
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "doc.pdf"
+    doc = pymupdf.open()
+    for n in range(1, 4):
+        doc.new_page().insert_text((72, 72), f"Contents of page {n}.")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_repeat_upload_skips_extraction(pdf_path, monkeypatch):
+    first, hit = pdf_cache.extract_cached(pdf_path, "abc")
+    assert not hit
+    assert first.page(2).strip() == "Contents of page 2."
+    assert first.page(3).strip() == "Contents of page 3."
+
+    def boom(*a, **k):
+        raise AssertionError("extraction should be skipped")
+
+    monkeypatch.setattr(pdf_cache, "iter_pages", boom)
+    again, hit = pdf_cache.extract_cached(pdf_path, "abc")
+    assert hit and again == first
+
+
+def test_lru_eviction_by_total_bytes(cache_dir):
+    entry = pdf_cache.join_pages(["x" * 1000])
+    for key in ("a", "b", "c"):
+        pdf_cache.put(key, entry)
+    # make "a" the oldest, then use it so "b" becomes least recently used
+    old = time.time() - 100
+    for i, key in enumerate(("a", "b", "c")):
+        os.utime(pdf_cache._entry(key, pdf_cache.PDF_BACKEND), (old + i, old + i))
+    assert pdf_cache.get("a") is not None
+
+    size = pdf_cache._entry("a", pdf_cache.PDF_BACKEND).stat().st_size
+    assert pdf_cache.evict(max_bytes=2 * size) == 1
+    assert pdf_cache.get("b") is None
+    assert pdf_cache.get("a") is not None and pdf_cache.get("c") is not None
@@ -0,0 +1,41 @@
+import pytest
+
+from app.services import pdf_extract
+
+pymupdf = pdf_extract._pymupdf()
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "doc.pdf"
+    doc = pymupdf.open()
+    for n in range(1, 41):
+        doc.new_page().insert_text((72, 72), f"This is page number {n}.")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.mark.parametrize("backend", sorted(pdf_extract.BACKENDS))
+def test_pages_in_order_with_range_and_limit(pdf_path, backend):
+    pages = list(pdf_extract.iter_pages(pdf_path, backend=backend, first_page=5, last_page=30, max_pages=20))
+    assert [n for n, _ in pages] == list(range(5, 25))
+    assert all(f"page number {n}." in text for n, text in pages)
+
+
+def test_parallel_matches_serial(pdf_path):
+    serial = pdf_extract.extract_text_from_pdf(pdf_path, parallel=False)
+    assert pdf_extract.extract_text_from_pdf(pdf_path, parallel=True) == serial
+    assert serial.startswith("This is page number 1.")
+    assert serial.rstrip().endswith("page number 40.")
+
+
+def test_generator_can_stop_early(pdf_path):
+    it = pdf_extract.iter_pages(pdf_path, parallel=True)
+    assert next(it)[0] == 1
+    it.close()
+
+
+def test_unknown_backend(pdf_path):
+    with pytest.raises(ValueError):
+        pdf_extract.extract_text_from_pdf(pdf_path, backend="nope")
@@ -0,0 +1,54 @@
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from src.train.model_registry import ModelBundle
+from src.train.prediction_cache import PredictionCache, predict_with_cache
+
+TEXTS = ["what is two plus two", "derive the gradient of the loss", "explain photosynthesis in plants"]
+
+
+class CountingModel:
+    def __init__(self, model):
+        self.model, self.rows = model, 0
+
+    def predict_proba(self, X):
+        self.rows += X.shape[0]
+        return self.model.predict_proba(X)
+
+
+def _bundle(version="v1"):
+    vec = TfidfVectorizer().fit(TEXTS)
+    model = CountingModel(LogisticRegression().fit(vec.transform(TEXTS), ["easy", "hard", "medium"]))
+    return ModelBundle(vec, model, ("easy", "hard", "medium"), version, "now")
+
+
+def test_hits_skip_the_model_and_normalize_whitespace_and_case():
+    cache, bundle = PredictionCache(100), _bundle()
+    first = predict_with_cache(TEXTS, bundle, cache)
+    again = predict_with_cache(["  What is TWO plus\ntwo "] + TEXTS[1:], bundle, cache)
+    assert again == first
+    assert bundle.model.rows == 3
+    assert cache.stats()["hits"] == 3
+
+
+def test_new_model_version_misses():
+    cache, old = PredictionCache(100), _bundle("v1")
+    predict_with_cache(TEXTS[:1], old, cache)
+    new = _bundle("v2")
+    predict_with_cache(TEXTS[:1], new, cache)
+    assert new.model.rows == 1
+
+
+def test_lru_bound_and_duplicates_in_one_batch():
+    cache, bundle = PredictionCache(2), _bundle()
+    predict_with_cache(TEXTS + [TEXTS[0]], bundle, cache)
+    assert bundle.model.rows == 3  # the repeated text was scored once
+    assert cache.stats()["entries"] == 2
+
+
+def test_cached_values_are_immutable():
+    cache, bundle = PredictionCache(100), _bundle()
+    (p,) = predict_with_cache(TEXTS[:1], bundle, cache)
+    with pytest.raises((AttributeError, TypeError)):
+        p.probs[0] = 1.0
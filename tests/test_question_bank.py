@@ -0,0 +1,121 @@
+import json
+import sqlite3
+
+import pytest
+
+import src.adaptive.question_bank as qb
+from src.adaptive import dedupe
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = tmp_path / "bank.db"
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE questions (id INTEGER PRIMARY KEY AUTOINCREMENT, question TEXT, difficulty TEXT, metadata TEXT, "
+        "text TEXT, answer TEXT, distractors TEXT, topic TEXT, explanation TEXT)"
+    )
+    con.execute("INSERT INTO questions (question, difficulty) VALUES ('existing', 'easy')")
+    con.commit()
+    con.close()
+
+    def connect():
+        c = sqlite3.connect(path)
+        c.row_factory = sqlite3.Row
+        return c
+
+    monkeypatch.setattr(qb, "get_connection", connect)
+    monkeypatch.setattr(dedupe, "_index", None)
+    return connect
+
+
+def _mcq(i):
+    return {"question": f"Question {i}?", "answer": "a", "distractors": ["b", "c", "d"], "difficulty": "hard"}
+
+
+def test_insert_questions_assigns_ids_in_order(db, monkeypatch):
+    calls = []
+
+    def fake_batch(texts):
+        calls.append(list(texts))
+        return [("easy", (["easy"], [1.0])) for _ in texts]
+
+    monkeypatch.setattr(qb, "predict_difficulty_batch", fake_batch)
+    saved = qb.insert_questions([_mcq(i) for i in range(5)], chunk_size=2)
+
+    assert [s["id"] for s in saved] == [2, 3, 4, 5, 6]
+    assert [len(c) for c in calls] == [2, 2, 1]  # one predict call per chunk, not per item
+    rows = db().execute("SELECT id, question, difficulty, distractors FROM questions WHERE id > 1 ORDER BY id").fetchall()
+    assert [(r["id"], r["question"]) for r in rows] == [(s["id"], s["question"]) for s in saved]
+    assert all(r["difficulty"] == "easy" for r in rows)
+    assert json.loads(rows[0]["distractors"]) == ["b", "c", "d"]
+
+
+def test_insert_questions_keeps_labels_when_model_missing(db, monkeypatch):
+    def broken(texts):
+        raise FileNotFoundError("no artifacts")
+
+    monkeypatch.setattr(qb, "predict_difficulty_batch", broken)
+    saved = qb.insert_questions([_mcq(0)])
+    assert saved[0]["difficulty"] == "hard"
+
+
+def test_insert_questions_rolls_back_on_error(db, monkeypatch):
+    monkeypatch.setattr(qb, "predict_difficulty_batch", lambda texts: [("easy", ([], [])) for _ in texts])
+    with pytest.raises(KeyError):
+        qb.insert_questions([_mcq(0), {"question": "no answer"}])
+    assert db().execute("SELECT COUNT(*) FROM questions").fetchone()[0] == 1
+
+
+def test_fingerprint_is_stable_under_formatting_changes():
+    a = dedupe.fingerprint("Which organelle is known as the powerhouse of the cell?")
+    b = dedupe.fingerprint("  which organelle is known as the POWERHOUSE of the cell ")
+    c = dedupe.fingerprint("Explain how the Krebs cycle produces NADH in mitochondria.")
+    assert dedupe.hamming(a, b) == 0
+    assert dedupe.hamming(a, c) > dedupe.MAX_DISTANCE
+
+
+def test_insert_questions_merges_near_duplicates(db, monkeypatch):
+    monkeypatch.setattr(qb, "predict_difficulty_batch", lambda texts: [("medium", ([], [])) for _ in texts])
+    stem = "Which organelle is known as the powerhouse of the cell?"
+    first = qb.insert_questions([{**_mcq(0), "question": stem}])
+    again = qb.insert_questions([
+        {**_mcq(1), "question": stem.upper()},
+        {**_mcq(2), "question": "Explain how the Krebs cycle produces NADH in mitochondria."},
+        {**_mcq(3), "question": "explain how the krebs cycle produces NADH in mitochondria"},
+    ])
+    assert again[0]["id"] == again[0]["duplicate_of"] == first[0]["id"]
+    assert "duplicate_of" not in again[1]
+    assert again[2]["duplicate_of"] == again[1]["id"]
+    assert db().execute("SELECT COUNT(*) FROM questions").fetchone()[0] == 3
+
+    rejected = qb.insert_questions([{**_mcq(4), "question": stem}], dedupe_mode="reject")
+    assert rejected == []
+
+
+def test_questions_from_before_fingerprinting_are_deduplicated(db, monkeypatch):
+    monkeypatch.setattr(qb, "predict_difficulty_batch", lambda texts: [("medium", ([], [])) for _ in texts])
+    out = qb.insert_questions([{**_mcq(0), "question": "Existing."}, _mcq(1)])  # 'existing' has no fingerprint row
+    assert out[0]["duplicate_of"] == 1 and "duplicate_of" not in out[1]
+    assert qb.insert_questions([{**_mcq(2), "question": "EXISTING"}], dedupe_mode="reject") == []
+    con = db()
+    assert con.execute("SELECT COUNT(*) FROM question_fingerprints").fetchone()[0] == 2
+
+
+def test_dedupe_bank_removes_existing_duplicates(db):
+    con = db()
+    con.executemany("INSERT INTO questions (question, difficulty) VALUES (?, 'easy')", [("Existing!",), ("other",)])
+    con.execute("CREATE TABLE history (id INTEGER PRIMARY KEY, user_id TEXT, question_id INTEGER, is_correct INTEGER)")
+    con.execute("INSERT INTO history (user_id, question_id, is_correct) VALUES ('u', 2, 1)")
+    con.execute("CREATE TABLE interactions (user_id TEXT, question_id INTEGER, is_correct INTEGER)")
+    con.execute("INSERT INTO interactions VALUES ('u', 2, 0)")
+    con.execute("CREATE TABLE question_stats (question_id INTEGER PRIMARY KEY, attempts INTEGER, correct INTEGER, updated_at TEXT)")
+    con.executemany("INSERT INTO question_stats VALUES (?, ?, ?, ?)", [(1, 10, 7, "a"), (2, 5, 1, "b"), (3, 2, 2, "a")])
+    con.commit()
+
+    report = dedupe.dedupe_bank(con, apply=True)
+    assert report["duplicates"] == [{"id": 2, "duplicate_of": 1, "distance": 0}]
+    assert [r[0] for r in con.execute("SELECT id FROM questions ORDER BY id")] == [1, 3]
+    assert con.execute("SELECT question_id FROM history").fetchone()[0] == 1
+    assert con.execute("SELECT question_id FROM interactions").fetchone()[0] == 1
+    assert [tuple(r) for r in con.execute("SELECT * FROM question_stats ORDER BY question_id")] == [(1, 15, 8, "b"), (3, 2, 2, "a")]
@@ -0,0 +1,66 @@
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import TokenBucketLimiter, is_rate_limit_error, retry_after_from_error
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    return TokenBucketLimiter("test", rpm=60, tpm=6000, db_path=tmp_path / "rl.db")
+
+
+def test_burst_within_capacity_does_not_wait(limiter):
+    assert all(limiter.reserve(10) == 0.0 for _ in range(5))
+
+
+def test_exhausted_bucket_returns_wait(limiter):
+    for _ in range(60):
+        limiter.reserve(1)
+    # 61st request: one request/second refill rate -> ~1s wait
+    assert limiter.reserve(1) == pytest.approx(1.0, abs=0.1)
+
+
+def test_token_budget_is_shared_between_instances(tmp_path):
+    a = TokenBucketLimiter("shared", rpm=1000, tpm=600, db_path=tmp_path / "rl.db")
+    b = TokenBucketLimiter("shared", rpm=1000, tpm=600, db_path=tmp_path / "rl.db")
+    assert a.reserve(600) == 0.0
+    # bucket drained by `a`; `b` must wait for 300 tokens at 10 tokens/s
+    assert b.reserve(300) == pytest.approx(30.0, abs=0.5)
+
+
+def test_throttle_halves_rate_and_success_recovers(limiter):
+    limiter.record_throttled(retry_after=5)
+    state = limiter.state()
+    assert state["factor"] == 0.5
+    assert state["throttled_for_s"] > 4
+    assert limiter.reserve(1) >= 4
+    limiter.record_success()
+    assert limiter.state()["factor"] == pytest.approx(0.55)
+
+
+def test_rate_limit_error_helpers():
+    err = Exception("429 Resource has been exhausted. retry_delay { seconds: 17 }")
+    assert is_rate_limit_error(err)
+    assert retry_after_from_error(err) == 17.0
+    assert not is_rate_limit_error(Exception("invalid argument"))
+    assert is_rate_limit_error(Exception("Quota exceeded for quota metric 'Generate requests'"))
+    assert is_rate_limit_error(Exception("openai: Rate limit reached for requests"))
+
+
+def test_not_found_model_is_not_a_rate_limit():
+    msg = "models/gemini-1.5-pro is not found for API version v1beta, or is not supported for generateContent."
+    assert not is_rate_limit_error(Exception(msg))
+    google_exceptions = pytest.importorskip("google.api_core.exceptions")
+    assert not is_rate_limit_error(google_exceptions.NotFound(msg))
+    # status/type win over the message text
+    assert is_rate_limit_error(google_exceptions.ResourceExhausted("Resource has been exhausted"))
+    assert is_rate_limit_error(google_exceptions.TooManyRequests("slow down"))
+    assert not is_rate_limit_error(google_exceptions.InvalidArgument("429 tokens is over the quota"))
+
+
+def test_database_is_created_on_first_use(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_DB", tmp_path / "state" / "rl.db")
+    limiter = TokenBucketLimiter("lazy", rpm=60, tpm=6000)
+    assert not (tmp_path / "state").exists()
+    assert limiter.reserve(1) == 0.0
+    assert (tmp_path / "state" / "rl.db").exists()
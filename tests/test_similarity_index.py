@@ -0,0 +1,116 @@
+import sqlite3
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.adaptive import similarity_index as si
+from src.adaptive.embedding_codec import encode, encode_sparse
+
+
+def _bank(tmp_path, vectors, topics):
+    con = sqlite3.connect(tmp_path / "bank.db", check_same_thread=False)
+    con.execute("CREATE TABLE questions (id INTEGER PRIMARY KEY, question TEXT, topic TEXT, difficulty TEXT, embedding BLOB)")
+    con.executemany(
+        "INSERT INTO questions (id, question, topic, difficulty, embedding) VALUES (?, ?, ?, 'easy', ?)",
+        [(i + 1, f"q{i + 1}", t, encode(v)) for i, (v, t) in enumerate(zip(vectors, topics))],
+    )
+    con.commit()
+    return con
+
+
+def _brute(V, q, k, mask=None):
+    Vn = V / np.linalg.norm(V, axis=1, keepdims=True)
+    s = Vn @ (q / np.linalg.norm(q))
+    if mask is not None:
+        s[~mask] = -np.inf
+    order = np.argsort(-s)[:k]
+    return [int(i) + 1 for i in order if np.isfinite(s[i])]
+
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    monkeypatch.setattr(si, "SEARCH_BLOCK", 16)  # exercise the block merge
+    rng = np.random.default_rng(1)
+    V = rng.standard_normal((100, 8)).astype(np.float32)
+    topics = ["math" if i % 3 == 0 else ("bio" if i % 3 == 1 else None) for i in range(100)]
+    con = _bank(tmp_path, V, topics)
+    index = si.build_index(con, tmp_path / "index", backend="tfidf")
+    return con, index, V, topics, rng
+
+
+def test_search_matches_brute_force(data):
+    _, index, V, topics, rng = data
+    assert len(index) == 100 and index.dim == 8
+    Q = rng.standard_normal((3, 8)).astype(np.float32)
+    results = index.search(Q, k=5)
+    for q, hits in zip(Q, results):
+        assert [qid for qid, _ in hits] == _brute(V, q, 5)
+        assert all(a[1] >= b[1] for a, b in zip(hits, hits[1:]))
+    math = np.array([t == "math" for t in topics])
+    (hits,) = index.search(Q[0], k=50, topic="math", exclude_ids=[1])
+    assert [qid for qid, _ in hits] == [i for i in _brute(V, Q[0], 50, math & (np.arange(100) != 0))]
+    assert index.search(Q[0], k=5, topic="history") == [[]]
+    with pytest.raises(ValueError):
+        index.search(np.ones(3), k=5)
+
+
+def test_incremental_append_is_seen_by_other_readers(data, tmp_path):
+    con, index, V, _, _ = data
+    reader = si.SimilarityIndex(tmp_path / "index", refresh_interval=0)
+    new = np.zeros(8, np.float32)
+    new[0] = 1.0
+    con.execute("INSERT INTO questions (id, question, topic, embedding) VALUES (101, 'new', 'chem', ?)", (encode(new),))
+    con.execute("INSERT INTO questions (id, question, embedding) VALUES (102, 'wrong dim', ?)", (encode(np.ones(4)),))
+    con.commit()
+    assert index.append_new(con) == 1
+    assert index.append_new(con, question_ids=[5, 101]) == 0  # already indexed
+    assert reader.refresh()
+    assert len(reader) == 101
+    (hits,) = reader.search(new, k=1, topic="chem")
+    assert hits[0][0] == 101 and hits[0][1] == pytest.approx(1.0)
+    np.testing.assert_allclose(reader.vector(3), V[2] / np.linalg.norm(V[2]), rtol=1e-6)
+
+
+def test_wide_sparse_embeddings_are_rejected(tmp_path):
+    con = sqlite3.connect(tmp_path / "bank.db")
+    con.execute("CREATE TABLE questions (id INTEGER PRIMARY KEY, question TEXT, topic TEXT, embedding BLOB)")
+    hashed = encode_sparse([3, 70000], [0.6, 0.8], 2**20)  # 4 MB per row once dense
+    con.executemany("INSERT INTO questions (id, question, embedding) VALUES (?, 'q', ?)", [(1, hashed), (2, hashed)])
+    with pytest.raises(ValueError, match="too wide"):
+        si.build_index(con, tmp_path / "index")
+    assert not si.index_exists(tmp_path / "index")
+    assert not (tmp_path / "index.building").exists()
+
+
+def test_similar_endpoint(data, monkeypatch):
+    con, index, V, _, _ = data
+    from app.routers import questions
+
+    monkeypatch.setattr(questions, "get_index", lambda: index)
+    monkeypatch.setattr(questions, "get_connection", lambda: _Shared(con))
+    app = FastAPI()
+    app.include_router(questions.router)
+    client = TestClient(app)
+
+    r = client.get("/questions/similar", params={"question_id": 1, "k": 3})
+    assert r.status_code == 200
+    body = r.json()
+    assert [x["question_id"] for x in body["results"]] == _brute(V, V[0], 4)[1:]
+    assert body["results"][0]["question"].startswith("q") and body["indexed"] == 100
+    assert client.get("/questions/similar", params={"question_id": 999}).status_code == 404
+    assert client.get("/questions/similar").status_code == 400
+
+
+class _Shared:
+    """The test connection, minus close() (the router closes what get_connection returns)."""
+
+    def __init__(self, con):
+        self.con = con
+
+    def execute(self, *args):
+        return self.con.execute(*args)
+
+    def close(self):
+        pass
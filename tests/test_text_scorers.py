@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app.routers import grade
+from app.services import log_sink, text_scorers
+from src.train.compact_model import export_compact, load_compact
+
+REFERENCE = "Photosynthesis converts light energy into chemical energy stored in glucose inside the chloroplast."
+STUDENTS = [
+    REFERENCE,
+    "inside the chloroplast, light energy is converted into chemical energy stored in glucose (photosynthesis)",
+    "The French Revolution began in 1789 with the meeting of the Estates General.",
+    "",
+]
+
+
+def test_scorers_rank_paraphrase_above_unrelated():
+    for name in text_scorers.SCORERS:
+        if name == "tfidf":
+            continue  # needs the difficulty model; covered below
+        same, para, other, empty = text_scorers.score_batch(STUDENTS, [REFERENCE] * 4, name)
+        assert same == pytest.approx(1.0)
+        assert para > other and empty == 0.0
+    # token_set ignores word order, difflib does not
+    (para_tokens,) = text_scorers.score_batch(STUDENTS[1:2], [REFERENCE], "token_set")
+    (para_chars,) = text_scorers.score_batch(STUDENTS[1:2], [REFERENCE], "difflib")
+    assert para_tokens > para_chars
+    assert text_scorers.score_batch([], [], "tfidf") == []
+    with pytest.raises(ValueError):
+        text_scorers.score_batch(["a"], ["a"], "levenshtein")
+
+
+def test_default_scorer_keeps_partial_credit_on_short_answers():
+    assert text_scorers.GRADE_SCORER == "difflib"
+    graded = grade._score_text_answers(
+        ["photosynthsis", "mitochondrion", "The mitochondria"],
+        ["photosynthesis", "mitochondria", "mitochondria"],
+        None,
+    )
+    assert [score for score, _ in graded] == [9.63, 8.8, 8.57]
+
+
+def test_unknown_default_scorer_falls_back_to_difflib(caplog):
+    assert text_scorers._default_scorer("token_set") == "token_set"
+    assert text_scorers._default_scorer("levenshtein") == "difflib"
+    assert "levenshtein" in caplog.text
+
+
+def test_rowwise_cosine_matches_sklearn_for_both_vectorizers(tmp_path):
+    texts = STUDENTS + [REFERENCE, "light energy", "energy energy energy", "zebra quokka"]
+    vec = TfidfVectorizer(max_features=5000, ngram_range=(1, 2)).fit(texts)
+    model = LogisticRegression().fit(vec.transform(texts), [0, 1] * 4)
+    export_compact(vec, model, tmp_path / "compact")
+    compact_vec, _, _ = load_compact(tmp_path / "compact")
+
+    a, b = texts[:4], texts[4:]
+    X = vec.transform(a + b)
+    want = np.array([cosine_similarity(X[i], X[4 + i])[0, 0] for i in range(4)])
+    np.testing.assert_allclose(text_scorers.rowwise_cosine(X, 4), want, atol=1e-9)
+    np.testing.assert_allclose(text_scorers.rowwise_cosine(compact_vec.transform(a + b), 4), want, atol=1e-6)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_sink, "LOG_PATH", str(tmp_path / "log.jsonl"))
+    calls = []
+
+    def counting(students, references):
+        calls.append(len(students))
+        return text_scorers._token_set(students, references)
+
+    monkeypatch.setitem(text_scorers.SCORERS, "counting", counting)
+    app = FastAPI()
+    app.include_router(grade.router)
+    return TestClient(app), calls
+
+
+def _answers():
+    long_ref = "Light energy is converted into chemical energy stored in glucose."
+    return [
+        {"questionId": "1", "questionContent": "2+2?", "answer": "4", "correctAnswer": "4"},
+        {"questionId": "2", "questionContent": "Define photosynthesis.", "answer": long_ref, "correctAnswer": long_ref},
+        {"questionId": "3", "questionContent": "Define photosynthesis.", "answer": "no idea", "correctAnswer": long_ref},
+        {"questionId": "4", "questionContent": "Pick all", "answer": ["a", "b"], "correctAnswer": "b"},
+    ]
+
+
+def test_free_text_answers_are_scored_in_one_batch(client):
+    client, calls = client
+    r = client.post("/grade", json={"answers": _answers(), "scorer": "counting"})
+    assert r.status_code == 200
+    graded = r.json()["gradedAnswers"]
+    assert calls == [2]
+    assert [g["questionId"] for g in graded] == ["1", "2", "3", "4"]
+    assert [g["isCorrect"] for g in graded] == [True, True, False, True]
+    assert graded[1]["score"] == 10.0 and graded[2]["score"] == 0.0
+    assert r.json()["finalScore"] == 30.0
+
+
+def test_scorer_is_selectable_per_request(client):
+    client, calls = client
+    baseline = client.post("/grade", json={"answers": _answers(), "scorer": "difflib"}).json()
+    assert baseline["gradedAnswers"][1]["score"] == 10.0 and calls == []
+    r = client.post("/grade", json={"answers": _answers(), "scorer": "nope"})
+    assert r.status_code == 400
@@ -0,0 +1,118 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.adaptive import engine, topic_clusters as tc
+from src.adaptive.embedding_codec import encode, encode_sparse
+
+DIM = 16
+
+
+def _blobs(rng, centers, n_per):
+    """n_per noisy vectors around each center, with the center's index as topic."""
+    rows = []
+    for c, center in enumerate(centers):
+        for _ in range(n_per):
+            rows.append((encode(center + 0.05 * rng.standard_normal(DIM).astype(np.float32)), f"topic{c}"))
+    return rows
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "DB_PATH", tmp_path / "adaptive.db")
+    engine.create_tables()
+    con = sqlite3.connect(engine.DB_PATH)
+    con.execute("ALTER TABLE questions ADD COLUMN topic TEXT")
+    con.execute("ALTER TABLE questions ADD COLUMN embedding BLOB")
+    rng = np.random.default_rng(0)
+    centers = np.eye(DIM, dtype=np.float32)[:4] * 3  # four orthogonal, well separated directions
+    rows = _blobs(rng, centers, 30)
+    con.executemany(
+        "INSERT INTO questions (question, difficulty, topic, embedding) VALUES (?, 'medium', ?, ?)",
+        [(f"q{i}", topic, blob) for i, (blob, topic) in enumerate(rows)],
+    )
+    con.commit()
+    yield con, centers, rng
+    con.close()
+
+
+def _clusters_by_topic(con):
+    out = {}
+    for topic, cid in con.execute("SELECT topic, cluster_id FROM questions WHERE embedding IS NOT NULL"):
+        out.setdefault(topic, set()).add(cid)
+    return out
+
+
+def test_fit_recovers_separated_groups(bank):
+    con, _, _ = bank
+    stats = tc.fit_clusters(con, k=4, chunk_size=25, verbose=False)  # several partial_fit chunks
+    assert stats == {**stats, "questions": 120, "clusters": 4, "dim": DIM}
+    by_topic = _clusters_by_topic(con)
+    assert all(len(cids) == 1 for cids in by_topic.values())
+    assert len({next(iter(c)) for c in by_topic.values()}) == 4
+
+    summaries = tc.cluster_summaries(con)
+    assert sorted(s["size"] for s in summaries) == [30] * 4
+    for s in summaries:
+        assert s["label"] == s["top_topics"][0]
+        assert len(s["representative_ids"]) == tc.REPRESENTATIVES
+    assert tc.load_centroids(con).shape == (4, DIM)
+
+    # refitting replaces, not duplicates
+    tc.fit_clusters(con, k=4, verbose=False)
+    assert con.execute("SELECT COUNT(*) FROM topic_clusters").fetchone()[0] == 4
+
+
+def test_new_questions_are_assigned_incrementally(bank):
+    con, centers, rng = bank
+    tc.fit_clusters(con, k=4, verbose=False)
+    cluster_of = {t: next(iter(c)) for t, c in _clusters_by_topic(con).items()}
+
+    new = _blobs(rng, centers[[2]], 3)
+    con.executemany(
+        "INSERT INTO questions (question, difficulty, topic, embedding) VALUES ('new', 'medium', ?, ?)",
+        [(topic, blob) for blob, topic in new],
+    )
+    con.commit()
+    new_ids = [r[0] for r in con.execute("SELECT id FROM questions WHERE question = 'new'")]
+    assert tc.assign(con) == 3  # only the unassigned ones
+    got = {r[0] for r in con.execute(
+        f"SELECT cluster_id FROM questions WHERE id IN ({','.join('?' * len(new_ids))})", new_ids)}
+    assert got == {cluster_of["topic2"]}
+    sizes = {s["cluster_id"]: s["size"] for s in tc.cluster_summaries(con)}
+    assert sizes[cluster_of["topic2"]] == 33
+    assert tc.assign(con) == 0
+
+
+def test_next_question_filters_by_cluster(bank):
+    con, _, _ = bank
+    assert tc.assign(con) == 0  # nothing fitted yet
+    tc.fit_clusters(con, k=4, verbose=False)
+    cid = next(iter(_clusters_by_topic(con)["topic1"]))
+    members = {r[0] for r in con.execute("SELECT id FROM questions WHERE cluster_id = ?", (cid,))}
+
+    out = engine.get_next_question("u1", cluster_id=cid)
+    assert out["question_id"] in members
+    some = sorted(members)[:2]
+    out = engine.get_next_question("u1", allowed_ids=some + [next(iter(set(range(1, 121)) - members))], cluster_id=cid)
+    assert out["question_id"] in some
+    assert engine.get_next_question("u1", cluster_id=999) is None
+
+
+def test_fit_rejects_wide_sparse_embeddings(bank):
+    con, _, _ = bank
+    con.execute("UPDATE questions SET embedding = ?", (encode_sparse([1, 9], [1.0, 1.0], 2**20),))
+    with pytest.raises(ValueError, match="too wide"):
+        tc.fit_clusters(con, k=4, verbose=False)
+
+
+def test_cluster_filter_on_a_db_without_clusters(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "DB_PATH", tmp_path / "fresh.db")
+    engine.create_tables()
+    con = sqlite3.connect(engine.DB_PATH)
+    con.execute("INSERT INTO questions (question, difficulty) VALUES ('q', 'easy')")
+    con.commit()
+    con.close()
+    assert engine.get_next_question("u1", cluster_id=3) is None
+    assert engine.get_next_question("u1")["question"] == "q"
@@ -0,0 +1,115 @@
+import csv
+import json
+import sqlite3
+
+import joblib
+import numpy as np
+import pytest
+
+from src.train import train_streaming as ts
+
+TEMPLATES = {
+    "easy": "What is {a} plus {b}?",
+    "medium": "Explain how the {a} cycle affects {b} ecosystems.",
+    "hard": "Derive the gradient of the {a} loss with respect to layer {b} weights.",
+}
+
+
+def _rows(n=300):
+    return [(TEMPLATES[lbl].format(a=i, b=i * 7 % 13), lbl) for i in range(n) for lbl in TEMPLATES]
+
+
+@pytest.fixture(params=["csv", "jsonl", "db"])
+def source(request, tmp_path):
+    rows = _rows()
+    path = tmp_path / f"q.{request.param}"
+    if request.param == "csv":
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["question", "difficulty"])
+            w.writerows(rows)
+    elif request.param == "jsonl":
+        path.write_text("".join(json.dumps({"question": q, "difficulty": d}) + "\n" for q, d in rows))
+    else:
+        con = sqlite3.connect(path)
+        con.execute("CREATE TABLE questions (question TEXT, difficulty TEXT)")
+        con.executemany("INSERT INTO questions VALUES (?, ?)", rows)
+        con.commit()
+        con.close()
+    return str(path)
+
+
+def test_streaming_training_learns_from_every_format(source):
+    clf = ts.train_stream(source, n_features=2**12, chunk_size=100, epochs=2, verbose=False)
+    vec = ts.make_vectorizer(2**12)
+    assert list(clf.predict(vec.transform(["What is 3 plus 4?", "Derive the gradient of the hinge loss"]))) == ["easy", "hard"]
+    assert clf.predict_proba(vec.transform(["x"])).shape == (1, 3)
+
+
+def test_resume_from_checkpoint_matches_uninterrupted_run(tmp_path, monkeypatch):
+    path = tmp_path / "q.jsonl"
+    path.write_text("".join(json.dumps({"question": q, "difficulty": d}) + "\n" for q, d in _rows()))
+    kwargs = dict(n_features=2**12, chunk_size=100, epochs=2, verbose=False)
+    full = ts.train_stream(str(path), **kwargs)
+
+    real_iter = ts.iter_chunks
+
+    def crashing(*a, **k):
+        for i, chunk in enumerate(real_iter(*a, **k)):
+            if i == 5:
+                raise KeyboardInterrupt
+            yield chunk
+
+    ckpt = tmp_path / "ckpt.joblib"
+    monkeypatch.setattr(ts, "iter_chunks", crashing)
+    with pytest.raises(KeyboardInterrupt):
+        ts.train_stream(str(path), checkpoint=ckpt, checkpoint_every=2, **kwargs)
+    assert joblib.load(ckpt)["chunk"] == 4
+
+    monkeypatch.setattr(ts, "iter_chunks", real_iter)
+    resumed = ts.train_stream(str(path), checkpoint=ckpt, checkpoint_every=2, resume=True, **kwargs)
+    np.testing.assert_allclose(resumed.coef_, full.coef_)
+
+    with pytest.raises(ValueError, match="different inputs"):
+        ts.train_stream(str(path), checkpoint=ckpt, resume=True, **{**kwargs, "chunk_size": 50})
+
+
+def test_cross_validation_in_parallel(tmp_path):
+    path = tmp_path / "q.jsonl"
+    path.write_text("".join(json.dumps({"question": q, "difficulty": d}) + "\n" for q, d in _rows()))
+    results = ts.cross_validate(str(path), k=3, jobs=2, n_features=2**12, chunk_size=200, epochs=2,
+                                classes=list(ts.DEFAULT_CLASSES))
+    assert [r["fold"] for r in results] == [0, 1, 2]
+    assert sum(r["rows"] for r in results) == 900
+    assert all(r["accuracy"] > 0.9 for r in results)
+
+
+def test_running_compact_registry_picks_up_streamed_model(tmp_path, monkeypatch):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    from src.train import model_registry as mr
+    from src.train.compact_model import export_compact
+
+    paths = {"MODEL_DIR": tmp_path, "VEC_PATH": tmp_path / "vec.joblib", "MODEL_PATH": tmp_path / "model.joblib",
+             "VERSION_PATH": tmp_path / "model.version", "COMPACT_DIR": tmp_path / "compact"}
+    for name, value in paths.items():
+        monkeypatch.setattr(ts, name, value)
+    texts, labels = zip(*_rows(20))
+    vec = TfidfVectorizer().fit(texts)
+    export_compact(vec, LogisticRegression().fit(vec.transform(texts), labels), paths["COMPACT_DIR"], version="old")
+    mr.write_version_file(paths["VERSION_PATH"], version="old")
+    registry = mr.ModelRegistry(paths["VEC_PATH"], paths["MODEL_PATH"], paths["VERSION_PATH"], reload_interval=0,
+                                model_format="compact", compact_dir=paths["COMPACT_DIR"])
+    assert registry.current().version == "old"
+
+    data = tmp_path / "q.jsonl"
+    data.write_text("".join(json.dumps({"question": q, "difficulty": d}) + "\n" for q, d in _rows(50)))
+    monkeypatch.setattr("sys.argv", ["train_streaming", str(data), "--n-features", "4096",
+                                     "--checkpoint", str(tmp_path / "ckpt.joblib")])
+    ts.main()
+
+    bundle = registry.current()
+    assert bundle.version not in ("old", None)
+    assert type(bundle.model).__name__ == "SGDClassifier"
+    assert list(bundle.model.predict(bundle.vectorizer.transform(["What is 3 plus 4?"]))) == ["easy"]
@@ -0,0 +1,65 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.services import uploads
+
+
+def _upload(data: bytes, size=None) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=size, filename="lecture.pdf")
+
+
+def test_spools_in_chunks_with_hash_and_cleanup(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_BYTES", 1000)
+    data = os.urandom(4500)
+
+    async def run():
+        async with uploads.spool_upload(_upload(data)) as up:
+            assert open(up.path, "rb").read() == data
+            assert up.path.endswith(".pdf")
+            return up
+
+    up = asyncio.run(run())
+    assert (up.size, up.sha256) == (len(data), hashlib.sha256(data).hexdigest())
+    assert not os.path.exists(up.path)
+
+
+def test_limit_checked_while_streaming_and_temp_removed(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_BYTES", 100)
+    monkeypatch.setattr(uploads, "UPLOAD_TMP_DIR", str(tmp_path))
+
+    async def run():
+        async with uploads.spool_upload(_upload(b"x" * 1000), max_bytes=500):
+            pass
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(run())
+    assert exc.value.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_known_size_rejected_before_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_TMP_DIR", str(tmp_path))
+
+    async def run():
+        async with uploads.spool_upload(_upload(b"", size=10_000), max_bytes=500):
+            pass
+
+    with pytest.raises(HTTPException):
+        asyncio.run(run())
+
+
+def test_cleanup_when_body_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_TMP_DIR", str(tmp_path))
+
+    async def run():
+        async with uploads.spool_upload(_upload(b"%PDF-1.4")):
+            raise RuntimeError("extraction failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,70 @@
+# tools/bench_pdf_extract.py
+"""
+Compare PDF extraction backends (serial and process-pool) on a synthetic PDF.
+
+Builds a text-only PDF of --pages pages (default 300) unless --pdf is given,
+then times app.services.pdf_extract.extract_text_from_pdf for every backend.
+Run as: python -m tools.bench_pdf_extract [--pages 300] [--pdf file.pdf] [--repeat 3]
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# ensure project root is importable when run as module
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.services import pdf_extract
+
+LOREM = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "The light-dependent reactions take place in the thylakoid membranes, while the "
+    "Calvin cycle fixes carbon dioxide in the stroma of the chloroplast. "
+)
+
+
+def build_pdf(path: str, pages: int):
+    pymupdf = pdf_extract._pymupdf()
+    doc = pymupdf.open()
+    for n in range(pages):
+        page = doc.new_page()
+        body = f"Chapter {n // 20 + 1}, page {n + 1}\n\n" + (LOREM * 12)
+        page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), body, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=300, help="pages of the synthetic PDF")
+    ap.add_argument("--pdf", help="benchmark this PDF instead of a synthetic one")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if not path:
+            path = str(Path(tmp) / "bench.pdf")
+            build_pdf(path, args.pages)
+        pages = pdf_extract.page_count(path)
+        print(f"{path}: {pages} pages, {pdf_extract.PDF_WORKERS} workers")
+
+        pdf_extract.get_pool().submit(int).result()  # start workers outside the timings
+        for backend in pdf_extract.BACKENDS:
+            for parallel in (False, True):
+                times = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    text = pdf_extract.extract_text_from_pdf(path, backend=backend, parallel=parallel)
+                    times.append(time.perf_counter() - t0)
+                mode = "parallel" if parallel else "serial"
+                med = statistics.median(times)
+                print(f"{backend:>10} {mode:>8}: {med:7.3f}s median ({pages / med:7.0f} pages/s, {len(text)} chars)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# tools/bench_text_scorers.py
+"""
+Compare the free-text grading scorers (app/services/text_scorers.py) against
+the difflib baseline on a synthetic submission.
+
+Builds --answers reference/student pairs of --words words each. Half the
+student answers are reordered, partly rewritten copies of their reference
+and half are about another subject. The tool times score_batch() for every scorer and
+reports how well each one separates the two halves.
+Run as: python -m tools.bench_text_scorers [--answers 50] [--words 150] [--repeat 3]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# ensure project root is importable when run as module
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.services.text_scorers import SCORERS, score_batch
+
+SUBJECTS = [
+    "photosynthesis converts light energy into chemical energy stored in glucose the light dependent reactions "
+    "take place in the thylakoid membranes while the calvin cycle fixes carbon dioxide in the chloroplast stroma",
+    "newton's second law states that the net force on a body equals its mass times its acceleration momentum "
+    "is conserved in collisions and kinetic energy depends on the square of the velocity of the object",
+    "the french revolution began in 1789 when the estates general met at versailles the monarchy was abolished "
+    "and the republic faced war with european powers before napoleon seized power in a coup",
+    "backpropagation computes the gradient of the loss with respect to every weight of a neural network by "
+    "applying the chain rule layer by layer from the output back to the input during training",
+]
+POOLS = [s.split() for s in SUBJECTS]
+
+
+def build_submission(n: int, words: int, seed: int = 0):
+    """Half the answers are rewrites of their reference, half are about another subject."""
+    rng = random.Random(seed)
+    students, references = [], []
+    for i in range(n):
+        pool = POOLS[i % len(POOLS)]
+        ref = [rng.choice(pool) for _ in range(words)]
+        if i % 2:
+            other = POOLS[(i + 1) % len(POOLS)]
+            stud = [rng.choice(other) for _ in range(words)]
+        else:
+            stud = [w if rng.random() > 0.3 else rng.choice(pool) for w in ref]  # rewrite ~30% of the words
+            cut = rng.randrange(len(stud))  # and move a chunk around
+            stud = stud[cut:] + stud[:cut]
+        references.append(" ".join(ref))
+        students.append(" ".join(stud))
+    return students, references
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--answers", type=int, default=50, help="free-text answers per submission")
+    ap.add_argument("--words", type=int, default=150, help="words per answer")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    students, references = build_submission(args.answers, args.words)
+    print(f"{args.answers} answers of {args.words} words")
+    base_time = None
+    for name in ["difflib"] + [s for s in SCORERS if s != "difflib"]:
+        times = []
+        try:
+            score_batch(students[:1], references[:1], name)  # load models outside the timings
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                scores = np.array(score_batch(students, references, name))
+                times.append(time.perf_counter() - t0)
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"{name:>10}: skipped ({e})")
+            continue
+        med = statistics.median(times)
+        if base_time is None:
+            base_time = med
+        related, unrelated = scores[0::2], scores[1::2]
+        print(f"{name:>10}: {med * 1000:9.2f}ms median  ({base_time / med:6.1f}x difflib)  "
+              f"mean similarity {related.mean():.2f} related / {unrelated.mean():.2f} unrelated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# tools/compute_embeddings.py
+"""
+Batched, resumable embedding job for the question bank.
+
+Rows are read in id order, --batch-size at a time. Each batch is embedded
+with a single call (TfidfVectorizer.transform or SentenceTransformer.encode),
+and the blobs (src/adaptive/embedding_codec.py) are written with one
+executemany. The batch's last id goes into the embedding_checkpoints table in
+the same transaction, so an interrupted run resumes right after the last
+committed batch. A completed run clears its checkpoint.
+
+With --workers N the embedding calls run in N processes, each loading the
+backend once, while the main process keeps reading and writing in id order.
+
+If a similarity index exists (src/adaptive/similarity_index.py), each
+committed batch is appended to it. After --recompute, rebuild the index.
+Likewise, once topic clusters are fitted (src/adaptive/topic_clusters.py),
+each batch is assigned to its nearest cluster centroid.
+
+Backends:
+    tfidf   the difficulty model's TF-IDF vectorizer (models/tfidf_vectorizer.joblib)
+    sbert   app.services.embeddings_service.EmbeddingService (all-MiniLM-L6-v2, disk-cached)
+
+Run as:
+    python -m tools.compute_embeddings --backend tfidf
+    python -m tools.compute_embeddings --backend sbert --batch-size 256 --workers 2
+    python -m tools.compute_embeddings --recompute   # re-embed every row, not only missing ones
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+# ensure project root is importable when run as module
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from src.adaptive.embedding_codec import encode_rows
+from src.adaptive.engine import DB_PATH
+from src.adaptive.similarity_index import INDEX_DIR, SimilarityIndex, index_exists
+from src.adaptive import topic_clusters
+
+MAX_TEXT_CHARS = 2000
+
+
+def _tfidf_backend() -> Callable[[List[str]], List[bytes]]:
+    import joblib
+
+    from src.train.model_registry import VEC_PATH
+
+    if not VEC_PATH.exists():
+        raise FileNotFoundError(f"Vectorizer not found at {VEC_PATH}. Run training first.")
+    vec = joblib.load(VEC_PATH)
+    return lambda texts: encode_rows(vec.transform(texts))
+
+
+def _sbert_backend() -> Callable[[List[str]], List[bytes]]:
+    from app.services.embeddings_service import EmbeddingService
+
+    # one model call per job batch; texts already in the embedding cache are not re-encoded
+    svc = EmbeddingService(batch_size=1 << 20)
+    return lambda texts: encode_rows(svc.encode(texts))
+
+
+# name -> factory returning embed(texts) -> one blob per text
+BACKENDS: Dict[str, Callable[[], Callable[[List[str]], List[bytes]]]] = {
+    "tfidf": _tfidf_backend,
+    "sbert": _sbert_backend,
+}
+
+_worker_embed = None
+
+
+def _init_worker(backend: str):
+    global _worker_embed
+    _worker_embed = BACKENDS[backend]()
+
+
+def _embed_in_worker(texts: List[str]) -> List[bytes]:
+    return _worker_embed(texts)
+
+
+def _ensure_checkpoint_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_checkpoints (
+            job TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            updated_at TEXT
+        )
+    """)
+    con.commit()
+
+
+def _read_batch(con, after_id: int, batch_size: int, recompute: bool) -> Sequence[tuple]:
+    missing = "" if recompute else "AND (embedding IS NULL OR embedding = '' OR embedding = x'')"
+    return con.execute(
+        f"SELECT id, question, topic FROM questions WHERE id > ? {missing} ORDER BY id LIMIT ?",
+        (after_id, batch_size),
+    ).fetchall()
+
+
+def _load_centroids(con):
+    """Fitted cluster centroids, or None if topic_clusters.py has not been run on this DB."""
+    if not con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'topic_clusters'").fetchone():
+        return None
+    return topic_clusters.load_centroids(con)
+
+
+def run(backend: str = "tfidf", batch_size: int = 512, workers: int = 1, recompute: bool = False,
+        db_path: Path = DB_PATH, index_dir: Path = INDEX_DIR, verbose: bool = True) -> dict:
+    """Embed the bank; returns {"questions", "seconds", "per_second", "resumed_from"}."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; choose from {sorted(BACKENDS)}")
+    job = f"{backend}:{'all' if recompute else 'missing'}"
+    con = sqlite3.connect(db_path, timeout=30)
+    _ensure_checkpoint_table(con)
+    row = con.execute("SELECT last_id FROM embedding_checkpoints WHERE job = ?", (job,)).fetchone()
+    resumed_from = last_id = row[0] if row else 0
+    if verbose and resumed_from:
+        print(f"Resuming {job} after question id {resumed_from}")
+
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(backend,)) if workers > 1 else None
+    embed = None if pool else BACKENDS[backend]()
+    index = SimilarityIndex(index_dir) if index_exists(index_dir) else None
+    centroids = _load_centroids(con)
+    pending = deque()  # (ids, topics, future-or-blobs) in id order
+    done, t0 = 0, time.perf_counter()
+
+    def write(ids, topics, blobs):
+        nonlocal done
+        if len(blobs) != len(ids):
+            raise RuntimeError(f"backend returned {len(blobs)} embeddings for {len(ids)} questions")
+        with con:  # one transaction: rows + checkpoint
+            con.executemany("UPDATE questions SET embedding = ? WHERE id = ?", zip(blobs, ids))
+            con.execute(
+                "INSERT INTO embedding_checkpoints (job, last_id, updated_at) VALUES (?, ?, datetime('now')) "
+                "ON CONFLICT(job) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at",
+                (job, ids[-1]),
+            )
+        if index is not None:
+            index.append_rows(zip(ids, topics, blobs), backend=backend)
+        if centroids is not None:
+            topic_clusters.assign(con, ids, centroids=centroids)
+        done += len(ids)
+        if verbose:
+            elapsed = time.perf_counter() - t0
+            print(f"{done} questions embedded (up to id {ids[-1]}), {done / max(elapsed, 1e-9):.1f} q/s")
+
+    try:
+        while True:
+            rows = _read_batch(con, last_id, batch_size, recompute)
+            if rows:
+                last_id = rows[-1][0]
+                ids = [r[0] for r in rows]
+                topics = [r[2] for r in rows]
+                texts = [(r[1] or "")[:MAX_TEXT_CHARS] for r in rows]
+                pending.append((ids, topics, pool.submit(_embed_in_worker, texts) if pool else embed(texts)))
+            # keep up to 2 batches per worker in flight; always drain at the end
+            while pending and (not rows or not pool or len(pending) >= 2 * workers):
+                ids, topics, result = pending.popleft()
+                write(ids, topics, result.result() if pool else result)
+            if not rows:
+                break
+        con.execute("DELETE FROM embedding_checkpoints WHERE job = ?", (job,))
+        con.commit()
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        con.close()
+
+    elapsed = time.perf_counter() - t0
+    stats = {"questions": done, "seconds": round(elapsed, 3),
+             "per_second": round(done / elapsed, 1) if elapsed else None, "resumed_from": resumed_from}
+    if verbose and index is not None and recompute:
+        print("Existing rows were re-embedded: rebuild the similarity index "
+              "(python -m src.adaptive.similarity_index build).")
+    if verbose and centroids is not None and recompute:
+        print("Existing rows were re-embedded: refit the topic clusters (python -m src.adaptive.topic_clusters fit).")
+    if verbose:
+        print(f"Embedding complete ({backend}): {done} questions in {elapsed:.2f}s, {stats['per_second']} q/s")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--backend", choices=sorted(BACKENDS), default="tfidf")
+    ap.add_argument("--batch-size", type=int, default=512)
+    ap.add_argument("--workers", type=int, default=1, help="processes computing embeddings")
+    ap.add_argument("--recompute", action="store_true", help="re-embed all rows, not only those without one")
+    ap.add_argument("--db", default=str(DB_PATH))
+    args = ap.parse_args(argv)
+    run(args.backend, batch_size=args.batch_size, workers=args.workers, recompute=args.recompute,
+        db_path=Path(args.db))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,14 @@
 # tools/compute_embeddings_tfidf.py
 """
 Compute "embeddings" for each question using the saved TF-IDF vectorizer
-and store them into the questions.embedding column (JSON text).
+and store them into the questions.embedding column (binary blob, see
+src/adaptive/embedding_codec.py; sparse rows are stored as index/value arrays).
 Safe to run multiple times (skips rows that already have embeddings).
+Kept for existing scripts: this is tools/compute_embeddings.py with --backend tfidf
+(batched, resumable; extra arguments such as --batch-size are passed through).
 Run as: python -m tools.compute_embeddings_tfidf
 """
 
-import os
-import json
 import sys
 from pathlib import Path
 
@@ -15,44 +16,11 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(ROOT))
 
-from src.adaptive.engine import get_connection
-import joblib
-import numpy as np
+from tools.compute_embeddings import main as compute_embeddings_main
 
-VEC_PATH = Path("models/tfidf_vectorizer.joblib")
-
-def load_vectorizer():
-    if not VEC_PATH.exists():
-        raise FileNotFoundError(f"Vectorizer not found at {VEC_PATH}. Run training first.")
-    vec = joblib.load(VEC_PATH)
-    return vec
 
 def main():
-    vec = load_vectorizer()
-    con = get_connection()
-    cur = con.cursor()
-    cur.execute("SELECT rowid, question, embedding FROM questions")
-    rows = cur.fetchall()
-    print(f"Found {len(rows)} question rows.")
-    updated = 0
-    for rowid, question, emb_field in rows:
-        # skip if embedding already exists and is non-empty
-        if emb_field is not None and str(emb_field).strip() != "":
-            continue
-        text = (question or "")[:2000]
-        try:
-            X = vec.transform([text])  # sparse matrix (1 x D)
-            arr = X.toarray()[0].astype(float).tolist()  # dense list
-            cur.execute("UPDATE questions SET embedding = ? WHERE rowid = ?", (json.dumps(arr, ensure_ascii=False), rowid))
-            updated += 1
-            if updated % 10 == 0:
-                con.commit()
-                print(f"Committed {updated} embeddings...")
-        except Exception as e:
-            print("Failed embedding for rowid", rowid, ":", e)
-    con.commit()
-    con.close()
-    print("TF-IDF embedding complete. Updated:", updated)
+    compute_embeddings_main(["--backend", "tfidf", *sys.argv[1:]])
 
 if __name__ == "__main__":
     main()
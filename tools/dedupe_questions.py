@@ -0,0 +1,36 @@
+# tools/dedupe_questions.py
+"""
+Find (and optionally remove) near-duplicate questions in the bank.
+
+Keeps the oldest question of every near-duplicate group, re-points history
+and interaction rows to it, merges its question_stats and rebuilds the question_fingerprints table used by the insert-time
+duplicate check. Dry run by default.
+Run as: python -m tools.dedupe_questions [--apply] [--max-distance 3]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# ensure project root is importable when run as module
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from src.adaptive.dedupe import MAX_DISTANCE, dedupe_bank
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--apply", action="store_true", help="delete duplicates instead of only reporting them")
+    ap.add_argument("--max-distance", type=int, default=MAX_DISTANCE, help="max SimHash bit distance (0-3)")
+    args = ap.parse_args()
+
+    report = dedupe_bank(apply=args.apply, max_distance=args.max_distance)
+    for d in report["duplicates"]:
+        print(f"question {d['id']} duplicates {d['duplicate_of']} (distance {d['distance']})")
+    action = "Removed" if args.apply else "Found"
+    print(f"Scanned {report['scanned']} questions. {action} {len(report['duplicates'])} near-duplicates.")
+
+
+if __name__ == "__main__":
+    main()
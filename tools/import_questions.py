@@ -0,0 +1,82 @@
+# tools/import_questions.py
+"""
+Bulk-import a question bank from JSONL or CSV into the questions table.
+
+Each record needs: question, answer, distractors (JSON list, or a
+"|"-separated string in CSV), and optionally difficulty, explanation, topic.
+Records are inserted in batches through src/adaptive/question_bank.insert_questions
+(one batched difficulty prediction + one executemany per batch).
+
+Run as: python -m tools.import_questions path/to/bank.jsonl [--batch-size 5000] [--no-predict]
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+# ensure project root is importable when run as module
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from src.adaptive.question_bank import insert_questions
+
+
+def _normalize(rec: dict) -> dict:
+    distractors = rec.get("distractors") or []
+    if isinstance(distractors, str):
+        try:
+            distractors = json.loads(distractors)
+        except ValueError:
+            distractors = [d.strip() for d in distractors.split("|") if d.strip()]
+    return {
+        "question": str(rec["question"]).strip(),
+        "answer": str(rec.get("answer") or "").strip(),
+        "distractors": [str(d) for d in distractors][:3],
+        "difficulty": rec.get("difficulty") or "medium",
+        "explanation": rec.get("explanation") or "",
+        "topic": rec.get("topic") or "general",
+    }
+
+
+def read_records(path: Path):
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf8") as f:
+            for rec in csv.DictReader(f):
+                yield _normalize(rec)
+    else:
+        with open(path, encoding="utf8") as f:
+            for line in f:
+                if line.strip():
+                    yield _normalize(json.loads(line))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", type=Path)
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--no-predict", action="store_true", help="keep the difficulty labels from the file")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    total = 0
+    batch = []
+    for rec in read_records(args.path):
+        if not rec["question"]:
+            continue
+        batch.append(rec)
+        if len(batch) >= args.batch_size:
+            total += len(insert_questions(batch, predict=not args.no_predict))
+            batch = []
+            print(f"Imported {total} questions...")
+    if batch:
+        total += len(insert_questions(batch, predict=not args.no_predict))
+
+    elapsed = time.perf_counter() - t0
+    print(f"Import complete: {total} questions in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} q/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# tools/query_logs.py
+"""
+Query the interaction / prediction JSONL logs (live file + rotated .gz files).
+
+Prints a JSON aggregate (class counts, class distribution over time,
+confidence histogram) or, with --records, the matching records as JSONL.
+Run as:
+    python -m tools.query_logs --since 2025-11-01 --predicted hard
+    python -m tools.query_logs data/interactions --bucket day --jobs 4
+    python -m tools.query_logs --session-id s1 --records --limit 20
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+
+# ensure project root is importable when run as module
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from src.analytics.log_query import BUCKETS, LOG_PATH, LogFilter, log_files, query, scan
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("target", nargs="?", default=str(LOG_PATH),
+                    help="log file (rotated siblings included) or a directory of logs")
+    ap.add_argument("--since", help="inclusive lower bound on ts, e.g. 2025-11-01 or 2025-11-01T12:00")
+    ap.add_argument("--until", help="exclusive upper bound on ts")
+    ap.add_argument("--user-hash")
+    ap.add_argument("--session-id")
+    ap.add_argument("--predicted", help="predicted class, e.g. hard")
+    ap.add_argument("--event", help='"prediction" for single predictions, or an event name (e.g. difficulty_batch)')
+    ap.add_argument("--bucket", choices=sorted(BUCKETS), default="hour")
+    ap.add_argument("--jobs", type=int, default=1, help="processes scanning files in parallel")
+    ap.add_argument("--records", action="store_true", help="print matching records instead of aggregates")
+    ap.add_argument("--limit", type=int, default=0, help="max records with --records (0 = all)")
+    args = ap.parse_args()
+
+    files = log_files(args.target)
+    if not files:
+        print(f"No log files found for {args.target}", file=sys.stderr)
+        return 1
+    flt = LogFilter(since=args.since, until=args.until, user_hash=args.user_hash,
+                    session_id=args.session_id, predicted=args.predicted, event=args.event)
+
+    if args.records:
+        records = scan(files, flt)
+        if args.limit:
+            records = itertools.islice(records, args.limit)
+        for rec in records:
+            sys.stdout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        return 0
+
+    t0 = time.perf_counter()
+    agg = query(files, flt, bucket=args.bucket, jobs=args.jobs)
+    out = {"files": len(files), **agg.to_dict(), "seconds": round(time.perf_counter() - t0, 3)}
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())